@@ -2,9 +2,10 @@
 # -*- coding:utf-8 -*-
 import os
 import re
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Iterable, Iterator, List, Tuple, Any
 import json
 from machamp.crossval.scorer import *
+from machamp.crossval.result_index import CrossvalResultIndex
 import difflib
 import pprint
 import math
@@ -12,6 +13,7 @@ import sys
 import shutil
 import pandas as pd
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 
 MODEL_FILE_REGEX = r"model(_[0-9]+)*.pt" #e.g. model.pt, model_1.pt, model_2.pt
@@ -713,8 +715,8 @@ def _load_gold_dataset_files(gold_base_dir: str, dataset_directory_name: str) ->
         dataset_directory_name (str): The name of the dataset directory. E.g. pate_single
 
     Returns:
-        Tuple[List[str], List[str], List[str]]: A tuple with the gold directories, gold val filecontents 
-                and gold test filecontents.
+        Tuple[List[str], List[Tuple[str, BioFileRecords]], List[Tuple[str, BioFileRecords]]]: A tuple with the
+                gold directories, gold val files and gold test files.
     """
     gold_directories = [f"{dataset_directory_name}/folds/fold_{i}" for i in range(0, 10)]
     gold_directories = [os.path.join(gold_base_dir, g) for g in gold_directories]
@@ -726,13 +728,9 @@ def _load_gold_dataset_files(gold_base_dir: str, dataset_directory_name: str) ->
         gold_val_filepaths.append(os.path.join(gold_directory, f"{dataset_name}-val.bio"))
         gold_test_filepaths.append(os.path.join(gold_directory, f"{dataset_name}-test.bio"))
 
-    gold_val_files = []
-    gold_test_files = []
-    for val, test in zip(gold_val_filepaths, gold_test_filepaths):
-        with open(val, "r") as f:
-            gold_val_files.append((val, f.read()))
-        with open(test, "r") as f:
-            gold_test_files.append((test, f.read()))
+    #The files are read lazily, see BioFileRecords
+    gold_val_files = [(val, BioFileRecords(val)) for val in gold_val_filepaths]
+    gold_test_files = [(test, BioFileRecords(test)) for test in gold_test_filepaths]
 
     return gold_directories, gold_val_files, gold_test_files
 
@@ -774,11 +772,9 @@ def _load_model_predictions(model_directory_paths: List[str]):
         for file in files:
             filepath = os.path.join(model_directory_path, file)
             if file.endswith(VAL_RESULT_FILE_SUFFIX):
-                with open(filepath, "r") as f:
-                    val_predictions.append((filepath, f.read()))
+                val_predictions.append((filepath, BioFileRecords(filepath)))
             elif re.search(TEST_RESULT_FILE_SUFFIX, file) is not None:
-                with open(filepath, "r") as f:
-                    test_predictions.append((filepath, f.read()))
+                test_predictions.append((filepath, BioFileRecords(filepath)))
     return val_predictions, test_predictions
 
 
@@ -788,9 +784,9 @@ def _generate_negative_cases_analysis(gold_dataset, predict_dataset, negative_ca
     Generates the negative cases analysis.
 
     Args:
-        gold_dataset (List[dict]): List of gold entries.
-        predict_records (List[Record]): List of predicted records.
-        negative_cases_indexes (List[int]): List of indexes of negative cases.
+        gold_dataset (Iterable[dict]): Gold entries.
+        predict_dataset (Iterable[dict]): Predicted records.
+        negative_cases_indexes (Dict[str, Set[int]]): Indexes of negative cases per error class.
 
     Returns:
         List[dict]: List of negative cases.
@@ -798,6 +794,20 @@ def _generate_negative_cases_analysis(gold_dataset, predict_dataset, negative_ca
     error_groups = ["total", "time", "date", "set", "duration", "tempexp"]
     evaluation_types = ["strict_typespan", "strict_span", "relaxed_typespan", "relaxed_span"]
     error_classes = [f"{evaluation_type}_{error_group}" for error_group in error_groups for evaluation_type in evaluation_types]
+
+    #Keep only the entries of the negative cases, the datasets can be streamed from disk
+    needed_indexes = set()
+    for error_class in error_classes:
+        needed_indexes.update(negative_cases_indexes[error_class])
+    selected_gold_dataset = dict()
+    selected_predict_dataset = dict()
+    for index, (gold_entry, predict_entry) in enumerate(zip(gold_dataset, predict_dataset)):
+        if index in needed_indexes:
+            selected_gold_dataset[index] = gold_entry
+            selected_predict_dataset[index] = predict_entry
+    gold_dataset = selected_gold_dataset
+    predict_dataset = selected_predict_dataset
+
     negative_cases = dict()
     for error_class in error_classes:
         negative_cases_for_class = list()
@@ -890,63 +900,119 @@ def _label_tokens(tokens, offsets):
 
 
 
+def _evaluate(gold_entries, predict_records) -> dict:
+    """
+    Evaluates the predictions against the gold entries line by line.
+
+    Args:
+        gold_entries (Iterable[dict]): Gold entries.
+        predict_records (Iterable[dict]): Predicted records.
+
+    Returns:
+        dict: Dictionary containing the results of the evaluation.
+    """
+    scorer = TemporalTypeScorer()
+
+    #Format gold and pred to match in structure, one entry at a time
+    gold_instance_list = (x["entity"] for x in gold_entries)
+    pred_instance_list = (x["entity"] for x in predict_records)
+
+    gold_instance_list_restructured = scorer.iter_gold_list(gold_instance_list)
+    pred_instance_list_restructured = scorer.iter_gold_list(pred_instance_list)
+
+    sub_results, negative_case_indexes = scorer.eval_instance_list(
+        gold_instance_list=gold_instance_list_restructured,
+        pred_instance_list=pred_instance_list_restructured
+    )
+    return sub_results, negative_case_indexes
+
+
+
+def _evaluate_fold(fold: str, record: Tuple, full_model_name: str, cached: Tuple = (None, None)) -> Tuple[tuple, tuple, dict, dict, dict, dict]:
+    """
+    Scores the val and test predictions of one fold and generates their negative cases analysis.
+    Runs in the worker processes of _get_all_model_results.
+
+    Args:
+        fold (str): Name of the fold, e.g. "fold_0".
+        record (Tuple): The (filepath, json) tuples of the gold val, pred val, gold test and pred test files.
+        full_model_name (str): Full name of the model.
+        cached (Tuple): The (sub_results, negative_case_indexes) of the val and test predictions from the
+            result index, None if they have to be scored.
+
+    Returns:
+        Tuple[tuple, tuple, dict, dict, dict, dict]: The val and test results, the val and test negative cases
+            and the val and test negative case indexes.
+    """
+    _, gold_val_file_json = record[0]
+    pred_val_filepath, pred_val_file_json = record[1]
+    _, gold_test_file_json = record[2]
+    pred_test_filepath, pred_test_file_json = record[3]
+    cached_val, cached_test = cached
+
+    def _evaluate_or_cached(gold_entries, predict_records, cached_results):
+        if cached_results is None:
+            return _evaluate(gold_entries, predict_records)
+        sub_results, negative_case_indexes = cached_results
+        #Adding the ascending indexes like the scorer gives the same set (iteration) order
+        return sub_results, {key: set(value) for key, value in negative_case_indexes.items()}
+
+    val_results, negative_val_cases_indexes = _evaluate_or_cached(gold_val_file_json, pred_val_file_json, cached_val)
+    test_results, negative_test_cases_indexes = _evaluate_or_cached(gold_test_file_json, pred_test_file_json, cached_test)
+
+    val_negative_cases = _generate_negative_cases_analysis(gold_val_file_json, pred_val_file_json, negative_val_cases_indexes)
+    test_negative_cases = _generate_negative_cases_analysis(gold_test_file_json, pred_test_file_json, negative_test_cases_indexes)
+
+    model_val_results = (full_model_name, fold, pred_val_filepath, val_results, pred_val_file_json, None)
+    model_test_results = (full_model_name, fold, pred_test_filepath, test_results, pred_test_file_json, None)
+    return model_val_results, model_test_results, val_negative_cases, test_negative_cases, negative_val_cases_indexes, negative_test_cases_indexes
+
+
+
 def _get_all_model_results(
         gold_val_files: Tuple,
         gold_test_files: Tuple,
         pred_val_files: Tuple,
         pred_test_files: Tuple,
         full_model_name: str,
-        debug: bool = False
+        debug: bool = False,
+        num_workers: int = 1,
+        result_index: CrossvalResultIndex = None
 ) -> Tuple[List[Tuple[str, str, str, dict, list, list]], List[Tuple[str, str, str, dict, list, list]]]:
-    
+    """
+    Scores the predictions of each fold. With num_workers > 1 the folds are scored
+    in a process pool, the results are still merged in fold order.
+    With a result index, only the prediction files that are new or changed (or whose gold
+    file changed) are scored, and the returned results are read from the index.
+    """
     model_directory_val_results = list()
     model_directory_val_negative_cases = list()
     model_directory_test_results = list()
     model_directory_test_negative_cases = list()
 
-    for i, record in enumerate(zip(gold_val_files, pred_val_files, gold_test_files, pred_test_files)):
-        fold = f"fold_{i}"
-        _, gold_val_file_json = record[0]
-        pred_val_filepath, pred_val_file_json = record[1]
-        _, gold_test_file_json = record[2]
-        pred_test_filepath, pred_test_file_json = record[3]
-
-        def _evaluate(gold_entries, predict_records) -> dict:
-            """
-            Evaluates the predictions against the gold entries line by line.
-
-            Args:
-                gold_entries (List[dict]): List of gold entries.
-                predict_records (List[Record]): List of predicted records.
-
-            Returns:
-                dict: Dictionary containing the results of the evaluation.
-            """
-            scorer = TemporalTypeScorer()
-
-            #Format gold and pred to match in structure
-            gold_instance_list = [x["entity"] for x in gold_entries]
-            pred_instance_list = [x["entity"] for x in predict_records]
-
-            gold_instance_list_restructured = scorer.load_gold_list(gold_instance_list)
-            pred_instance_list_restructured = scorer.load_gold_list(pred_instance_list)
-
-            sub_results, negative_case_indexes = scorer.eval_instance_list(
-                gold_instance_list=gold_instance_list_restructured,
-                pred_instance_list=pred_instance_list_restructured
-            )
-            return sub_results, negative_case_indexes
-
-
-        val_results, negative_val_cases_indexes = _evaluate(gold_val_file_json, pred_val_file_json)
-        test_results, negative_test_cases_indexes = _evaluate(gold_test_file_json, pred_test_file_json)
-        
-        val_negative_cases = _generate_negative_cases_analysis(gold_val_file_json, pred_val_file_json, negative_val_cases_indexes)
-        test_negative_cases = _generate_negative_cases_analysis(gold_test_file_json, pred_test_file_json, negative_test_cases_indexes)
-
-        model_val_results = (full_model_name, fold, pred_val_filepath, val_results, pred_val_file_json, None)
-        model_test_results = (full_model_name, fold, pred_test_filepath, test_results, pred_test_file_json, None)
-        
+    records = list(zip(gold_val_files, pred_val_files, gold_test_files, pred_test_files))
+    folds = [f"fold_{i}" for i in range(len(records))]
+    cached = [(None, None)] * len(records)
+    if result_index is not None:
+        cached = [(result_index.lookup(record[1][0], record[0][0]), result_index.lookup(record[3][0], record[2][0])) for record in records]
+        num_cached = sum((val is not None) + (test is not None) for val, test in cached)
+        print(f"Found {num_cached} of {2 * len(records)} prediction files in the result index {result_index.path}")
+
+    arguments = (folds, records, [full_model_name] * len(records), cached)
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            fold_results = list(executor.map(_evaluate_fold, *arguments))
+    else:
+        fold_results = map(_evaluate_fold, *arguments)
+
+    for fold, record, (cached_val, cached_test), fold_result in zip(folds, records, cached, fold_results):
+        model_val_results, model_test_results, val_negative_cases, test_negative_cases, \
+        negative_val_cases_indexes, negative_test_cases_indexes = fold_result
+        if result_index is not None:
+            if cached_val is None:
+                result_index.store(record[1][0], record[0][0], full_model_name, fold, model_val_results[3], negative_val_cases_indexes)
+            if cached_test is None:
+                result_index.store(record[3][0], record[2][0], full_model_name, fold, model_test_results[3], negative_test_cases_indexes)
         if debug:
             print()
             print(f"Results for model {full_model_name}_{fold} (val):")
@@ -961,10 +1027,133 @@ def _get_all_model_results(
         model_directory_val_negative_cases += [val_negative_cases]
         model_directory_test_negative_cases += [test_negative_cases]
 
+    if result_index is not None:
+        #The reports are created from the index
+        model_directory_val_results = [
+            model_results + (record[1][1], None)
+            for model_results, record in zip(result_index.model_results([record[1][0] for record in records]), records)
+        ]
+        model_directory_test_results = [
+            model_results + (record[3][1], None)
+            for model_results, record in zip(result_index.model_results([record[3][0] for record in records]), records)
+        ]
+
     return model_directory_val_results, model_directory_test_results, model_directory_val_negative_cases, model_directory_test_negative_cases
     
 
 
+BIOTAG_TO_TAG = {
+    "B-DATE": "date",
+    "I-DATE": "date",
+    "B-DURATION": "duration",
+    "I-DURATION": "duration",
+    "B-SET": "set",
+    "I-SET": "set",
+    "B-TIME": "time",
+    "I-TIME": "time",
+    "B-TEMPEXP": "tempexp",
+    "I-TEMPEXP": "tempexp",
+    "O": "O"
+}
+
+
+
+def _iter_bio_sentences(lines: Iterable[str]) -> Iterator[List[str]]:
+    """
+    Groups the lines of a BIO file into sentences, which are separated by empty lines.
+
+    Args:
+        lines (Iterable[str]): The lines, e.g. an open file.
+
+    Yields:
+        List[str]: The lines of one sentence without line breaks.
+    """
+    sentence = list()
+    for line in lines:
+        line = line.rstrip("\n")
+        if line == "":
+            if sentence:
+                yield sentence
+                sentence = list()
+        else:
+            sentence.append(line)
+    if sentence:
+        yield sentence
+
+
+
+def _bio_sentence_to_json(pairs: List[str]) -> Dict[str, Any]:
+    """
+    Converts the token-tag lines of one sentence to a dictionary with the tokens, text and entities.
+    """
+    sentence_json = dict()
+    tokens = [x.split("\t")[0] for x in pairs]
+    tags = [x.split("\t")[1] for x in pairs]
+    sentence_json["tokens"] = tokens
+    sentence_json["text"] = " ".join(tokens).strip()
+
+    #Extract entities
+    entities = list()
+    entity = None
+    for i, tag in enumerate(tags):
+        lower_tag = tag.lower()
+        if lower_tag.startswith("b-"):
+            entity = dict()
+            entity["type"] = BIOTAG_TO_TAG[tag]
+            entity["offset"] = [i]
+            entity["text"] = tokens[i]
+        elif lower_tag.startswith("i-"):
+            if entity is not None:
+                entity["offset"].append(i)
+                entity["text"] += " " + tokens[i]
+                entity["text"] = entity["text"].strip()
+            else:
+                raise ValueError(f"Found I- tag without B- tag: {tag}")
+        elif lower_tag.startswith("o"):
+            if entity is not None:
+                entities.append(entity)
+                entity = None
+        else:
+            raise ValueError(f"Unknown tag {tag}")
+
+        if i == len(tags) - 1:
+            if entity is not None:
+                entities.append(entity)
+
+    sentence_json["entity"] = entities
+    return sentence_json
+
+
+
+def _iter_bio_file(filepath: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads a BIO file sentence by sentence.
+
+    Args:
+        filepath (str): The path of the BIO file.
+
+    Yields:
+        Dict[str, Any]: The tokens, text and entities of each sentence.
+    """
+    with open(filepath, "r") as f:
+        for pairs in _iter_bio_sentences(f):
+            yield _bio_sentence_to_json(pairs)
+
+
+
+class BioFileRecords:
+    """
+    The sentences of a BIO file, read from disk each time they are iterated.
+    Only the path is pickled, so it is cheap to pass to worker processes.
+    """
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return _iter_bio_file(self.filepath)
+
+
+
 def _bio_to_json(bio: str) -> List[Dict[str, Any]]:
     """
     Converts a BIO string to a list of dictionaries.
@@ -975,62 +1164,8 @@ def _bio_to_json(bio: str) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: A list of dictionaries.
     """
-    biotag_to_tag = {
-        "B-DATE": "date",
-        "I-DATE": "date",
-        "B-DURATION": "duration",
-        "I-DURATION": "duration",
-        "B-SET": "set",
-        "I-SET": "set",
-        "B-TIME": "time",
-        "I-TIME": "time",
-        "B-TEMPEXP": "tempexp",
-        "I-TEMPEXP": "tempexp",
-        "O": "O"
-    }
     bio = bio.strip("\n\t" + " ")
-    bio = bio.split("\n\n")
-    jsonlist = list()
-    for sentence in bio:
-        sentence_json = dict()
-        pairs = sentence.split("\n")
-        tokens = [x.split("\t")[0] for x in pairs]
-        tags = [x.split("\t")[1] for x in pairs]
-        sentence_json["tokens"] = tokens
-        sentence_json["text"] = " ".join(tokens).strip()
-
-        #Extract entities
-        entities = list()
-        entity = None
-        for i, tag in enumerate(tags):
-            lower_tag = tag.lower()
-            if lower_tag.startswith("b-"):
-                entity = dict()
-                entity["type"] = biotag_to_tag[tag]
-                entity["offset"] = [i]
-                entity["text"] = tokens[i]
-            elif lower_tag.startswith("i-"):
-                if entity is not None:
-                    entity["offset"].append(i)
-                    entity["text"] += " " + tokens[i]
-                    entity["text"] = entity["text"].strip()
-                else:
-                    raise ValueError(f"Found I- tag without B- tag: {tag}")
-            elif lower_tag.startswith("o"):
-                if entity is not None:
-                    entities.append(entity)
-                    entity = None
-            else:
-                raise ValueError(f"Unknown tag {tag}")
-            
-            if i == len(tags) - 1:
-                if entity is not None:
-                    entities.append(entity)
-            
-        sentence_json["entity"] = entities
-        jsonlist.append(sentence_json)
-        #print(json.dumps(sentence_json, indent=4) + "\n" * 3)
-    return jsonlist
+    return [_bio_sentence_to_json(pairs) for pairs in _iter_bio_sentences(bio.split("\n"))]
 
 
 
@@ -1042,6 +1177,9 @@ def main():
     parser.add_argument("--classes", "-c", type=str) #multi or single
     parser.add_argument("--copy_gold_files", "-g", action="store_true")
     parser.add_argument("--output_base_dir", "-o", type=str, default="crossvalidation-output")
+    parser.add_argument("--num_workers", "-w", type=int, default=1) #processes for scoring the folds
+    parser.add_argument("--result_index", "-ri", type=str, default=None) #sqlite file of scored predictions, default: <output_base_dir>/crossvalidation_result_index.sqlite
+    parser.add_argument("--rescore", action="store_true") #score all predictions again, also the ones in the result index
     args = parser.parse_args()
 
     gold_base_directory = args.base_data_dir
@@ -1050,6 +1188,9 @@ def main():
     classes = args.classes
     full_dataset_name = f"{args.dataset_name}_{args.classes}" #e.g. "pate_multi"
     copy_gold_files = args.copy_gold_files
+    num_workers = args.num_workers
+    result_index_path = args.result_index if args.result_index is not None else os.path.join(args.output_base_dir, "crossvalidation_result_index.sqlite")
+    rescore = args.rescore
     logfiles_output_directory = f"{args.output_base_dir}/{full_dataset_name}_crossvalidation_logfiles"
 
     full_dataset_name = f"{dataset_name}_{classes}"
@@ -1060,18 +1201,15 @@ def main():
     print(f"Full dataset name: {full_dataset_name}")
     print(f"Classes: {classes}")
     print(f"Copy gold files: {copy_gold_files}")
+    print(f"Number of workers: {num_workers}")
+    print(f"Result index: {result_index_path}")
+    print(f"Rescore: {rescore}")
 
 
-    #Grab the gold and pred data
-    _, gold_val_files_bio, gold_test_files_bio = _load_gold_dataset_files(gold_base_directory, full_dataset_name)
+    #Grab the gold and pred data, the files are converted to json while they are scored
+    _, val_gold_json, test_gold_json = _load_gold_dataset_files(gold_base_directory, full_dataset_name)
     model_directories = _get_model_directories(model_base_directory, full_dataset_name)
-    val_predictions_bio, test_predictions_bio = _load_model_predictions(model_directories)
-
-    #Convert to json
-    val_gold_json = [(x[0], _bio_to_json(x[1])) for x in gold_val_files_bio]
-    test_gold_json = [(x[0], _bio_to_json(x[1])) for x in gold_test_files_bio]
-    val_predictions_json = [(x[0], _bio_to_json(x[1])) for x in val_predictions_bio]
-    test_predictions_json = [(x[0], _bio_to_json(x[1])) for x in test_predictions_bio]
+    val_predictions_json, test_predictions_json = _load_model_predictions(model_directories)
 
     #Check correspondence
     for i, record in enumerate(zip(val_gold_json, val_predictions_json, test_gold_json, test_predictions_json)):
@@ -1083,6 +1221,8 @@ def main():
         ):
             raise ValueError(f"Bad sorting of gold and pred files found in fold {i}")
 
+    result_index = CrossvalResultIndex(result_index_path, rescore=rescore)
+
     #Analyse the data
     model_directory_val_results, model_directory_test_results, \
     model_directory_val_negative_cases, model_directory_test_negative_cases  = _get_all_model_results(
@@ -1091,8 +1231,11 @@ def main():
         pred_val_files=val_predictions_json,
         pred_test_files=test_predictions_json,
         full_model_name=full_dataset_name,
-        debug=True
+        debug=True,
+        num_workers=num_workers,
+        result_index=result_index
     )
+    result_index.close()
 
     if not os.path.exists(logfiles_output_directory):
         os.makedirs(logfiles_output_directory)
@@ -1206,8 +1349,8 @@ def main():
     Copy gold files to logfiles directory for convenience 
     """
     if copy_gold_files:
-        gold_val_files_paths = [x[0] for x in gold_val_files_bio]
-        gold_test_files_paths = [x[0] for x in gold_test_files_bio]
+        gold_val_files_paths = [x[0] for x in val_gold_json]
+        gold_test_files_paths = [x[0] for x in test_gold_json]
 
         _copy_gold_files(
             gold_val_files = gold_val_files_paths,
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class CrossvalResultIndex:
+    """
+    Persistent index of the scored prediction files of the cross-validation.
+
+    Each prediction file is stored with its modification time and the hash of the gold
+    file it was scored against, together with its sub results and negative case indexes.
+    A file only has to be scored again if it changed, if its gold file changed or if it
+    is new. With rescore, every lookup misses, so all files are scored and stored again.
+    """
+
+    def __init__(self, path: str, rescore: bool = False):
+        directory = os.path.dirname(path)
+        if directory != "" and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.rescore = rescore
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "prediction_path TEXT PRIMARY KEY, "
+            "mtime REAL NOT NULL, "
+            "gold_hash TEXT NOT NULL, "
+            "full_model_name TEXT NOT NULL, "
+            "fold TEXT NOT NULL, "
+            "sub_results TEXT NOT NULL, "
+            "negative_case_indexes TEXT NOT NULL)"
+        )
+        self._connection.commit()
+        self._gold_hashes = dict()
+
+    def gold_hash(self, gold_path: str) -> str:
+        """
+        SHA1 of the content of a gold file, computed once per run.
+        """
+        if gold_path not in self._gold_hashes:
+            sha1 = hashlib.sha1()
+            with open(gold_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha1.update(block)
+            self._gold_hashes[gold_path] = sha1.hexdigest()
+        return self._gold_hashes[gold_path]
+
+    def lookup(self, prediction_path: str, gold_path: str) -> Optional[Tuple[dict, Dict[str, List[int]]]]:
+        """
+        Returns the stored (sub_results, negative_case_indexes) of a prediction file,
+        None if it was not scored yet or if it or its gold file changed since.
+        The negative case indexes are ascending lists.
+
+        Args:
+            prediction_path (str): Path of the prediction file.
+            gold_path (str): Path of the gold file the predictions are scored against.
+
+        Returns:
+            Optional[Tuple[dict, Dict[str, List[int]]]]: The sub results and negative case indexes.
+        """
+        if self.rescore:
+            return None
+        row = self._connection.execute(
+            "SELECT mtime, gold_hash, sub_results, negative_case_indexes FROM results WHERE prediction_path = ?",
+            (os.path.abspath(prediction_path),)
+        ).fetchone()
+        if row is None:
+            return None
+        mtime, gold_hash, sub_results, negative_case_indexes = row
+        if mtime != os.path.getmtime(prediction_path) or gold_hash != self.gold_hash(gold_path):
+            return None
+        return json.loads(sub_results), json.loads(negative_case_indexes)
+
+    def store(
+            self,
+            prediction_path: str,
+            gold_path: str,
+            full_model_name: str,
+            fold: str,
+            sub_results: dict,
+            negative_case_indexes: Dict[str, Set[int]]
+    ) -> None:
+        """
+        Stores (or replaces) the sub results and negative case indexes of a prediction file.
+        """
+        negative_case_indexes = {key: sorted(value) for key, value in negative_case_indexes.items()}
+        self._connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(prediction_path), os.path.getmtime(prediction_path), self.gold_hash(gold_path),
+             full_model_name, fold, json.dumps(sub_results), json.dumps(negative_case_indexes))
+        )
+        self._connection.commit()
+
+    def model_results(self, prediction_paths: List[str]) -> List[Tuple[str, str, str, dict]]:
+        """
+        Returns the (full_model_name, fold, prediction_path, sub_results) of the given
+        prediction files in the given order, e.g. for the reports of the current run.
+        """
+        model_results = list()
+        for prediction_path in prediction_paths:
+            row = self._connection.execute(
+                "SELECT full_model_name, fold, sub_results FROM results WHERE prediction_path = ?",
+                (os.path.abspath(prediction_path),)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"{prediction_path} is not in the result index {self.path}")
+            full_model_name, fold, sub_results = row
+            model_results += [(full_model_name, fold, prediction_path, json.loads(sub_results))]
+        return model_results
+
+    def close(self) -> None:
+        self._connection.close()
@@ -1,10 +1,12 @@
 import datetime
 import logging
+import os
 from typing import Dict, Tuple, List
 
 from torch.utils.data import Dataset
 from transformers import AutoTokenizer
 
+from machamp.data import machamp_dataset_cache
 from machamp.data.machamp_instance import MachampInstance
 from machamp.data.machamp_vocabulary import MachampVocabulary
 from machamp.readers.read_classification import read_classification
@@ -24,7 +26,8 @@ class MachampDataset(Dataset):
                  is_raw: bool = False, 
                  is_train: bool = True,
                  max_input_length: int = 512,
-                 num_epochs: int = 0):
+                 num_epochs: int = 0,
+                 cache_dir: str = None):
         """
         A machamp dataset is a single dataset, which can contain multiple
         tasks.  The main data is saved in self.data, which is a list of
@@ -62,6 +65,10 @@ class MachampDataset(Dataset):
             so we do not see the same data twice. 0 means we do not take this
             into account, and return everything (for dev/test data). We 
             increase the epoch count every time fill_batches is called.
+        cache_dir: str = None
+            If given, the instances of word-level datasets are cached in this
+            directory (see machamp_dataset_cache), and read from there in later
+            runs with the same data file, tokenizer and dataset configuration.
         """
         self.dataset_config = dataset_config
         self.num_epochs = num_epochs
@@ -128,12 +135,58 @@ class MachampDataset(Dataset):
 
         logger.info("Reading " + path + '...')
         start_time = datetime.datetime.now()
-        for instance in read_function(dataset_name, dataset_config, tokenizer, vocabulary, path,
-                                        is_train, max_sents, max_words, max_input_length):
-            self.data.append(instance)
+        if cache_dir != None and read_function == read_sequence and \
+                machamp_dataset_cache.is_cacheable(self.dataset_config):
+            self.data = self.read_cached(cache_dir, dataset_name, tokenizer, vocabulary, path, is_train, max_sents,
+                                         max_words, max_input_length)
+        else:
+            for instance in read_function(dataset_name, dataset_config, tokenizer, vocabulary, path,
+                                            is_train, max_sents, max_words, max_input_length):
+                self.data.append(instance)
         seconds = str(datetime.datetime.now() - start_time).split('.')[0]
         logger.info("Done reading " + path + " ({:.1f}s)".format((datetime.datetime.now() - start_time).seconds) + '\n')
 
+    def read_cached(self,
+                    cache_dir: str,
+                    dataset_name: str,
+                    tokenizer: AutoTokenizer,
+                    vocabulary: MachampVocabulary,
+                    path: str,
+                    is_train: bool,
+                    max_sents: int,
+                    max_words: int,
+                    max_input_length: int):
+        """
+        Reads the instances from the cache, or reads the data file with
+        read_sequence and writes the cache first. In both cases the
+        instances come from the (memory-mapped) cache, so that the label ids
+        and the vocabulary are the same in the first and in later runs.
+
+        Returns
+        -------
+        data: List[MachampInstance]
+            The instances of the data file.
+        """
+        cache_path = os.path.join(cache_dir, machamp_dataset_cache.cache_key(path, tokenizer, self.dataset_config,
+                                                                             is_train))
+        if not os.path.isdir(cache_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            recorder = machamp_dataset_cache.LabelRecorder()
+            instances = read_sequence(dataset_name, self.dataset_config, tokenizer, recorder, path, is_train, max_sents,
+                                      max_words, max_input_length)
+            if not machamp_dataset_cache.write_cache(cache_path, instances, recorder, self.dataset_config):
+                return read_sequence(dataset_name, self.dataset_config, tokenizer, vocabulary, path, is_train,
+                                     max_sents, max_words, max_input_length)
+        else:
+            logger.info('Reading from cache ' + cache_path)
+
+        data = machamp_dataset_cache.read_cache(cache_path, dataset_name, self.dataset_config, vocabulary, is_train)
+        if data == None:
+            logger.warning('Labels in ' + cache_path + ' do not match the vocabulary, reading ' + path)
+            data = read_sequence(dataset_name, self.dataset_config, tokenizer, vocabulary, path, is_train, max_sents,
+                                 max_words, max_input_length)
+        return data
+
     def __len__(self):
         """
         Length of the data is straightforward, its the number of instances
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Dict, List
+
+import numpy
+import torch
+from transformers import AutoTokenizer
+
+from machamp.data.machamp_instance import MachampInstance
+from machamp.data.machamp_vocabulary import MachampVocabulary
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+CACHEABLE_TASK_TYPES = ['seq', 'seq_bio', 'multiseq', 'string2string', 'dependency', 'classification']
+
+
+class LabelRecorder(MachampVocabulary):
+    def __init__(self):
+        """
+        A vocabulary that adds every label it sees, also when not training.
+        Instances read with it hold local label ids (in order of first
+        appearance), which can be mapped to the ids of the real vocabulary
+        later. It also records which vocabularies the reader created, so that
+        this can be repeated on the real vocabulary.
+        """
+        super().__init__()
+        self.created_vocabs = []
+
+    def create_vocab(self, name: str, has_unk: bool):
+        if name not in self.namespaces:
+            self.created_vocabs.append([name, has_unk])
+        super().create_vocab(name, has_unk)
+
+    def token2id(self, token: str, namespace: str, add_if_not_present: bool):
+        if namespace not in self.namespaces:
+            MachampVocabulary.create_vocab(self, namespace, True)
+        return super().token2id(token, namespace, True)
+
+
+def is_cacheable(dataset_config: Dict):
+    """
+    Whether the instances of a dataset (read by read_sequence) can be cached.
+    Tokenization tasks are not supported, as they also learn pre-splits and
+    keep the subword strings, and neither are dataset embeddings.
+
+    Parameters
+    ----------
+    dataset_config: Dict
+        The configuration of the dataset.
+
+    Returns
+    -------
+    cacheable: bool
+        Whether the dataset can be cached.
+    """
+    if 'dataset_embed_idx' in dataset_config:
+        return False
+    for task in dataset_config['tasks']:
+        task_config = dataset_config['tasks'][task]
+        if task_config['task_type'] not in CACHEABLE_TASK_TYPES:
+            return False
+        if task_config['task_type'] == 'classification' and task_config['column_idx'] != -1:
+            return False
+    return True
+
+
+def file_hash(path: str):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as data_file:
+        for block in iter(lambda: data_file.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def cache_key(data_path: str, tokenizer: AutoTokenizer, dataset_config: Dict, is_train: bool):
+    """
+    The key of the cache of a data file, which changes if the content of the
+    file, the tokenizer or the dataset configuration changes.
+
+    Parameters
+    ----------
+    data_path: str
+        The path of the data file.
+    tokenizer: AutoTokenizer
+        The tokenizer that is used to read the data.
+    dataset_config: Dict
+        The configuration of the dataset.
+    is_train: bool
+        Whether the file is read as training data.
+
+    Returns
+    -------
+    key: str
+        A hexadecimal hash.
+    """
+    key = {'version': CACHE_VERSION,
+           'file': file_hash(data_path),
+           'tokenizer': tokenizer.name_or_path,
+           'tokenizer_class': type(tokenizer).__name__,
+           'config': dataset_config,
+           'is_train': is_train}
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _gold_namespace(gold_name: str, tasks: List[str]):
+    # dependency heads are not in a vocabulary, the relations use the vocabulary of the task
+    if gold_name.endswith('-heads') and gold_name[:-len('-heads')] in tasks:
+        return None
+    if gold_name.endswith('-rels') and gold_name[:-len('-rels')] in tasks:
+        return gold_name[:-len('-rels')]
+    return gold_name
+
+
+def write_cache(cache_path: str, instances: List[MachampInstance], recorder: LabelRecorder, dataset_config: Dict):
+    """
+    Writes the instances in a columnar format: for each field one flat numpy
+    array with all instances concatenated and one array with the start
+    index of each instance. The gold labels are saved with the local ids of
+    the recorder, together with the label strings.
+
+    Parameters
+    ----------
+    cache_path: str
+        The directory to write to.
+    instances: List[MachampInstance]
+        The instances, read with the recorder as vocabulary.
+    recorder: LabelRecorder
+        The vocabulary the instances were read with.
+    dataset_config: Dict
+        The configuration of the dataset.
+
+    Returns
+    -------
+    written: bool
+        Whether the cache was written.
+    """
+    gold_names = list(instances[0].golds) if instances != [] else []
+    for instance in instances:
+        if list(instance.golds) != gold_names:
+            logger.warning('Not all instances have the same annotation, not caching ' + cache_path)
+            return False
+
+    tmp_path = cache_path + '.tmp' + str(os.getpid())
+    os.makedirs(tmp_path, exist_ok=True)
+
+    def save_column(name: str, values: List[numpy.ndarray], dtype):
+        starts = numpy.zeros(len(values) + 1, dtype=numpy.int64)
+        numpy.cumsum([value.size for value in values], out=starts[1:])
+        flat = numpy.zeros(starts[-1], dtype=dtype)
+        for idx, value in enumerate(values):
+            flat[starts[idx]:starts[idx + 1]] = value.reshape(-1)
+        numpy.save(os.path.join(tmp_path, name + '.npy'), flat)
+        numpy.save(os.path.join(tmp_path, name + '.starts.npy'), starts)
+
+    save_column('token_ids', [instance.token_ids.numpy() for instance in instances], numpy.int64)
+    save_column('seg_ids', [instance.seg_ids.numpy() for instance in instances], numpy.int64)
+    save_column('offsets', [instance.offsets.numpy() for instance in instances], numpy.int64)
+    full_data = ['\n'.join(['\t'.join(line) for line in instance.full_data]) for instance in instances]
+    save_column('full_data', [numpy.frombuffer(text.encode('utf-8'), dtype=numpy.uint8) for text in full_data],
+                numpy.uint8)
+
+    for gold_idx, gold_name in enumerate(gold_names):
+        values = []
+        shapes = numpy.zeros((len(instances), 3), dtype=numpy.int64)
+        for instance_idx, instance in enumerate(instances):
+            gold = instance.golds[gold_name]
+            if type(gold) == torch.Tensor:
+                value = gold.numpy()
+                shapes[instance_idx, 0] = value.ndim
+                shapes[instance_idx, 1:1 + value.ndim] = value.shape
+            else:
+                # sentence classification labels are plain ints
+                value = numpy.array([gold], dtype=numpy.int64)
+            values.append(value)
+        save_column('gold' + str(gold_idx), values, numpy.int64)
+        numpy.save(os.path.join(tmp_path, 'gold' + str(gold_idx) + '.shapes.npy'), shapes)
+
+    tasks = list(dataset_config['tasks'])
+    labels = {}
+    for gold_name in gold_names:
+        namespace = _gold_namespace(gold_name, tasks)
+        if namespace != None:
+            labels[namespace] = recorder.inverse_namespaces[namespace]
+    meta = {'num_instances': len(instances),
+            'golds': gold_names,
+            'labels': labels,
+            'created_vocabs': recorder.created_vocabs}
+    json.dump(meta, open(os.path.join(tmp_path, 'meta.json'), 'w'))
+
+    if os.path.isdir(cache_path):
+        # written by another process in the meantime
+        shutil.rmtree(tmp_path)
+    else:
+        os.rename(tmp_path, cache_path)
+    return True
+
+
+def read_cache(cache_path: str, dataset: str, dataset_config: Dict, vocabulary: MachampVocabulary, is_train: bool):
+    """
+    Reads the instances from the cache. The numpy files are memory-mapped,
+    the tensors of the instances are views on them (except the golds, which
+    are mapped to the ids of the vocabulary). The labels are looked up in
+    the vocabulary in the order in which they were first read, so the
+    vocabulary ends up the same as when reading the data file.
+
+    Parameters
+    ----------
+    cache_path: str
+        The directory of the cache.
+    dataset: str
+        The (unique) name of the dataset.
+    dataset_config: Dict
+        The configuration of the dataset.
+    vocabulary: MachampVocabulary
+        The vocabularies for all tasks.
+    is_train: bool
+        Whether we are currrently training, so whether to expand the label
+        vocabulary.
+
+    Returns
+    -------
+    data: List[Machamp.data.MachampInstance]
+        The instances, None if the labels can not be mapped to the vocabulary.
+    """
+    meta = json.load(open(os.path.join(cache_path, 'meta.json')))
+
+    def load_column(name: str):
+        starts = numpy.load(os.path.join(cache_path, name + '.starts.npy'))
+        if starts[-1] == 0:
+            # empty files can not be memory-mapped
+            return numpy.zeros(0, dtype=numpy.int64), starts
+        # copy-on-write, so that the tensors are writable without changing the cache
+        return numpy.load(os.path.join(cache_path, name + '.npy'), mmap_mode='c'), starts
+
+    if is_train:
+        for name, has_unk in meta['created_vocabs']:
+            vocabulary.create_vocab(name, has_unk)
+    label_maps = {}
+    for namespace, labels in meta['labels'].items():
+        label_ids = [vocabulary.token2id(label, namespace, is_train) for label in labels]
+        if None in label_ids:
+            return None
+        label_maps[namespace] = numpy.array(label_ids, dtype=numpy.int64)
+
+    token_ids, token_starts = load_column('token_ids')
+    seg_ids, seg_starts = load_column('seg_ids')
+    offsets, offset_starts = load_column('offsets')
+    full_data, full_data_starts = load_column('full_data')
+    tasks = list(dataset_config['tasks'])
+    golds = []
+    for gold_idx, gold_name in enumerate(meta['golds']):
+        flat, starts = load_column('gold' + str(gold_idx))
+        shapes = numpy.load(os.path.join(cache_path, 'gold' + str(gold_idx) + '.shapes.npy'))
+        namespace = _gold_namespace(gold_name, tasks)
+        if namespace != None:
+            # local label ids to vocabulary ids, UNK_ID (padding) stays the same
+            label_map = label_maps[namespace]
+            flat = numpy.where(flat >= 0, label_map[numpy.maximum(flat, 0)], flat)
+        golds.append((gold_name, flat, starts, shapes))
+
+    data = []
+    for idx in range(meta['num_instances']):
+        instance_golds = {}
+        for gold_name, flat, starts, shapes in golds:
+            value = flat[starts[idx]:starts[idx + 1]]
+            ndim = shapes[idx, 0]
+            if ndim == 0:
+                instance_golds[gold_name] = int(value[0])
+            else:
+                instance_golds[gold_name] = torch.from_numpy(value.reshape(tuple(shapes[idx, 1:1 + ndim])))
+        text = bytes(full_data[full_data_starts[idx]:full_data_starts[idx + 1]]).decode('utf-8')
+        instance_full_data = [line.split('\t') for line in text.split('\n')]
+        data.append(MachampInstance(instance_full_data,
+                                    torch.from_numpy(token_ids[token_starts[idx]:token_starts[idx + 1]]),
+                                    torch.from_numpy(seg_ids[seg_starts[idx]:seg_starts[idx + 1]]),
+                                    instance_golds, dataset,
+                                    torch.from_numpy(offsets[offset_starts[idx]:offset_starts[idx + 1]]),
+                                    None, []))
+    return data
@@ -26,7 +26,8 @@ class MachampDatasetCollection(Dataset):
                  vocabulary: MachampVocabulary = None,
                  max_input_length: int = 512,
                  raw_text: bool = False, 
-                 num_epochs: int = 0):
+                 num_epochs: int = 0,
+                 cache_dir: str = None):
         """
         A machamp dataset collection can hold multiple datasets. They are saved in
         self.data, which holds as keys the names of the datasets, and as values
@@ -58,6 +59,9 @@ class MachampDatasetCollection(Dataset):
             so we do not see the same data twice. 0 means we do not take this
             into account, and return everything (for dev/test data). We 
             increase the epoch count every time fill_batches is called.
+        cache_dir: str = None
+            Directory to cache the read (tokenized) instances in, see 
+            MachampDataset.
         """
 
         self.tokenizer = AutoTokenizer.from_pretrained(emb_name, use_fast=False)
@@ -88,7 +92,7 @@ class MachampDatasetCollection(Dataset):
 
         self.datasets = {}
         for dataset in self.dataset_configs:
-            self.datasets[dataset] = MachampDataset(dataset, self.dataset_configs[dataset], self.tokenizer, self.vocabulary, self.is_raw, self.is_train, max_input_length, self.num_epochs)
+            self.datasets[dataset] = MachampDataset(dataset, self.dataset_configs[dataset], self.tokenizer, self.vocabulary, self.is_raw, self.is_train, max_input_length, self.num_epochs, cache_dir)
 
 
     def task_to_tasktype(self, task: str):
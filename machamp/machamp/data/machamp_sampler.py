@@ -84,6 +84,7 @@ class MachampBatchSampler(Sampler):
             self.dataset_sizes[dataset] = int(size * prob)
 
         self.first_filled = True
+        self.epoch_started = False
         self.fill_batches() 
 
     def fill_batches(self):
@@ -187,6 +188,21 @@ class MachampBatchSampler(Sampler):
         if cur_batch != []:
             self.batches.append(cur_batch)
         
+    def start_epoch(self):
+        """
+        Prepares the batches of the next epoch, and increases the epoch of
+        the data source (which selects the MLM part of the epoch). This 
+        should be called before iter(dataloader): DataLoader workers are 
+        started there, and they keep the epoch the data source has at that
+        moment. When it is not called, __iter__ does it, which is only 
+        correct without workers.
+        """
+        if self.first_filled:
+            self.first_filled = False
+        else:
+            self.fill_batches()
+        self.epoch_started = True
+
     def __iter__(self) -> Iterator[List[Tuple[str, int]]]:
         """
         Iterate over the batches that are stored in self.batches.
@@ -198,10 +214,9 @@ class MachampBatchSampler(Sampler):
             batch size, and each tuple consists of the dataset
             name and the index of the batch.
         """
-        if self.first_filled:
-            self.first_filled = False
-        else:
-            self.fill_batches()
+        if not self.epoch_started:
+            self.start_epoch()
+        self.epoch_started = False
         for batch in self.batches:
             yield batch
 
@@ -1,5 +1,7 @@
 import logging
 
+import torch
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +20,51 @@ def to_spans(tags):
     return spans
 
 
+def bio_tables(vocabulary_list):
+    """
+    Lookup tables from label ids to whether the label is a B, an I or
+    a BIO label at all, and to the id of its span type (the label
+    without the B-/I- prefix).
+    """
+    span_types = {}
+    is_begin = []
+    is_inside = []
+    is_bio = []
+    span_type = []
+    for label in vocabulary_list:
+        is_begin.append(label[:1] == 'B')
+        is_inside.append(label[:1] == 'I')
+        is_bio.append(label[:1] in ['B', 'I', 'O'])
+        span_type.append(span_types.setdefault(label[2:], len(span_types)))
+    return torch.tensor(is_begin), torch.tensor(is_inside), torch.tensor(is_bio), torch.tensor(span_type)
+
+
+def to_span_keys(labels, lengths, is_begin, is_inside, span_type, num_types):
+    """
+    The spans of to_spans for a whole batch of label ids at once, each
+    span is encoded as one integer from its sentence, begin, end and
+    type, so that the spans of two batches can be compared in bulk.
+    """
+    batch_size, max_len = labels.shape
+    positions = torch.arange(max_len, device=labels.device).expand(batch_size, max_len)
+    sentences = torch.arange(batch_size, device=labels.device).unsqueeze(1).expand(batch_size, max_len)
+    inside = is_inside[labels] & (positions < lengths.unsqueeze(1))
+    # every position that is not an I (or the start of a sentence) starts
+    # a new group, the group of a B is the span with the I's following it
+    breaks = ~inside
+    breaks[:, 0] = True
+    groups = torch.cumsum(breaks.flatten().long(), 0) - 1
+    group_sizes = torch.bincount(groups)
+
+    begin_mask = is_begin[labels] & (positions < lengths.unsqueeze(1))
+    begins = begin_mask.flatten().nonzero(as_tuple=False).squeeze(1)
+    begin_positions = positions.flatten()[begins]
+    # like to_spans: the position after the span, or the last word if the span ends the sentence
+    ends = torch.min(begin_positions + group_sizes[groups[begins]], lengths[sentences.flatten()[begins]] - 1)
+    types = span_type[labels.flatten()[begins]]
+    return (begins * max_len + ends) * num_types + types
+
+
 class SpanF1:
     def __init__(self):
         self.tps = 0
@@ -25,23 +72,42 @@ class SpanF1:
         self.fns = 0
         self.str = 'span_f1'
         self.metric_scores = {}
+        self.tables = None
+        self.tables_vocabulary = None
+
+    def get_tables(self, vocabulary_list, device):
+        """
+        The bio_tables of the vocabulary on the device, they are only
+        computed again if the vocabulary changes.
+        """
+        if self.tables_vocabulary is not vocabulary_list or len(self.tables[0]) != len(vocabulary_list) \
+                or self.tables[0].device != device:
+            self.tables = [table.to(device) for table in bio_tables(vocabulary_list)]
+            self.tables_vocabulary = vocabulary_list
+        return self.tables
 
     def score(self, preds, golds, vocabulary_list):
         golds[golds == -100] = 0
-        for sent_idx in range(len(golds)):
-            if 0 in golds[sent_idx]:
-                length = (golds[sent_idx]==0).nonzero(as_tuple=False)[0].item()
-            else:
-                length = len(golds[sent_idx])
-            gold_labels_str = [vocabulary_list[token] for token in golds[sent_idx][:length]]
-            pred_labels_str = [vocabulary_list[token] for token in preds[sent_idx][:length]]
-
-            spans_gold = to_spans(gold_labels_str)
-            spans_pred = to_spans(pred_labels_str)
-            overlap = len(spans_gold.intersection(spans_pred))
-            self.tps += overlap
-            self.fps += len(spans_pred) - overlap
-            self.fns += len(spans_gold) - overlap
+        is_begin, is_inside, is_bio, span_type = self.get_tables(vocabulary_list, golds.device)
+        num_types = int(span_type.max().item()) + 1 if len(span_type) > 0 else 1
+
+        # a sentence ends at the first padding (0) label of the gold
+        batch_size, max_len = golds.shape
+        positions = torch.arange(max_len, device=golds.device).expand(batch_size, max_len)
+        lengths = torch.where(golds == 0, positions, torch.full_like(positions, max_len)).min(1)[0]
+        valid = positions < lengths.unsqueeze(1)
+
+        for labels in [golds, preds]:
+            for label_id in labels[valid & ~is_bio[labels]].unique().tolist():
+                logger.error("Warning, one of your labels is not following the BIO scheme: " + vocabulary_list[
+                    label_id] + " the span-f1 will not be calculated correctly")
+
+        spans_gold = to_span_keys(golds, lengths, is_begin, is_inside, span_type, num_types)
+        spans_pred = to_span_keys(preds, lengths, is_begin, is_inside, span_type, num_types)
+        overlap = len(spans_gold) + len(spans_pred) - len(torch.cat((spans_gold, spans_pred)).unique())
+        self.tps += overlap
+        self.fps += len(spans_pred) - overlap
+        self.fns += len(spans_gold) - overlap
 
     def reset(self):
         self.tps = 0
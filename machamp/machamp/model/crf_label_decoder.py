@@ -1,5 +1,4 @@
 import logging
-from typing import cast, List
 
 import torch
 import torch.nn.functional as F
@@ -44,9 +43,6 @@ class MachampCRFDecoder(MachampDecoder, torch.nn.Module):
 
     def forward(self, mlm_out, mask, gold=None):
         logits = self.hidden_to_label(mlm_out)
-        best_paths = self.crf_layer.viterbi_tags(logits, mask)
-
-        predicted_tags = cast(List[List[int]], [x[0] for x in best_paths])
         out_dict = {'logits': logits}
         # map mask to special token, to avoid out of bounds
         gold[gold==-100] = 0
@@ -54,13 +50,7 @@ class MachampCRFDecoder(MachampDecoder, torch.nn.Module):
         if type(gold) != type(None):
             log_likelihood = self.crf_layer.forward(logits, gold, mask)
 
-            # Represent viterbi tags as "class probabilities" that we can
-            # feed into the metrics
-            class_probabilities = logits * 0.0
-            for i, instance_tags in enumerate(predicted_tags):
-                for j, tag_id in enumerate(instance_tags):
-                    class_probabilities[i, j, tag_id] = 1
-            maxes = torch.add(torch.argmax(class_probabilities[:, :, 1:], 2), 1)
+            maxes = self.viterbi_maxes(logits, mask)
             self.metric.score(maxes, gold, self.vocabulary.inverse_namespaces[self.task])
             if self.additional_metrics:
                 for additional_metric in self.additional_metrics:
@@ -68,6 +58,16 @@ class MachampCRFDecoder(MachampDecoder, torch.nn.Module):
             out_dict['loss'] = -log_likelihood * self.loss_weight
         return out_dict
 
+    def viterbi_maxes(self, logits, mask):
+        """
+        The best viterbi tags of the whole batch as a (batch_size, sent_len)
+        tensor, decoded at once. Like the argmax over the labels without the
+        padding/unk label 0, positions after the sentence (and the label 0)
+        become label 1.
+        """
+        paths = self.crf_layer.viterbi_paths(logits, mask)[0][:, 0]
+        return paths.masked_fill(paths == 0, 1)
+
     def get_output_labels(self, mlm_out, mask, gold=None):
         """
         logits = batch_size*sent_len*num_labels
@@ -77,15 +77,7 @@ class MachampCRFDecoder(MachampDecoder, torch.nn.Module):
         """
         logits = self.forward(mlm_out, mask, gold)['logits']
         if self.topn == 1:
-            best_paths = self.crf_layer.viterbi_tags(logits, mask)
-
-            predicted_tags = cast(List[List[int]], [x[0] for x in best_paths])
-
-            class_probabilities = logits * 0.0
-            for i, instance_tags in enumerate(predicted_tags):
-                for j, tag_id in enumerate(instance_tags):
-                    class_probabilities[i, j, tag_id] = 1
-            maxes = torch.add(torch.argmax(class_probabilities[:, :, 1:], 2), 1)
+            maxes = self.viterbi_maxes(logits, mask)
             return {
                 'word_labels': [[self.vocabulary.id2token(token_id, self.task) for token_id in sent] for sent in maxes]}
         else:
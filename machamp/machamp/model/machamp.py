@@ -39,7 +39,8 @@ class MachampModel(torch.nn.Module):
                  retrain: str = '',
                  dropout: float = None,
                  reset_transformer_model: bool = False,
-                 dataset_embedder: torch.nn.Embedding = None
+                 dataset_embedder: torch.nn.Embedding = None,
+                 subword_pooling: str = 'last'
                  ) -> None:
         """
         The core MaChAmp model, which is basically a wrapper around a 
@@ -76,6 +77,13 @@ class MachampModel(torch.nn.Module):
             Dropout to be applied after the encoder (language model).
         reset_transformer_model: bool
             Resets all parameters of the language model
+        dataset_embedder: torch.nn.Embedding
+            Embeddings for the datasets, created here if None and the
+            data has dataset embeddings.
+        subword_pooling: str
+            How the subwords of a word are combined into its representation:
+            the 'first' subword, the 'last' subword or the 'mean' of all
+            subwords.
         """
         super().__init__()
 
@@ -104,6 +112,11 @@ class MachampModel(torch.nn.Module):
         self.task_types = task_types
         self.device = device
         self.dataset_configs = dataset_configs
+        if subword_pooling not in myutils.SUBWORD_POOLINGS:
+            logger.error('Subword pooling ' + subword_pooling + ' is not defined, options are: ' +
+                         str(myutils.SUBWORD_POOLINGS))
+            exit(1)
+        self.subword_pooling = subword_pooling
 
         # Find the size of the masked language model
         if hasattr(self.mlm.config, 'hidden_size'):
@@ -276,16 +289,10 @@ class MachampModel(torch.nn.Module):
             if self.dropout != None:
                 mlm_out_sent = self.dropout(mlm_out_sent)
         if type(offsets) != type(None):
-            mlm_out_nospecials = mlm_out
-            if self.start_token != None:
-                mlm_out_nospecials = mlm_out_nospecials[:, :, 1:, :]
-            if self.end_token != None:
-                mlm_out_nospecials = mlm_out_nospecials[:, :, :-1, :]
-
-            mlm_out_token = torch.zeros((len(mlm_out), len(offsets), len(offsets[0]), mlm_out.shape[-1]),
-                                        device=self.device)
-            for sentIdx in range(len(offsets)):
-                mlm_out_token[:, sentIdx] = mlm_out_nospecials[:, sentIdx, offsets[sentIdx]]
+            # the offsets do not count the special tokens
+            mlm_out_token = myutils.pool_subwords(mlm_out, offsets, getattr(self, 'subword_pooling', 'last'),
+                                                  0 if self.start_token == None else 1,
+                                                  None if self.end_token == None else -1)
             if self.dropout != None:
                 mlm_out_token = self.dropout(mlm_out_token)
 
@@ -404,31 +411,8 @@ class MachampModel(torch.nn.Module):
                 self.decoders[tok_task].get_output_labels(mlm_out_tok_merged, subword_mask[:, self.num_special_tokens:],
                                                           golds[tok_task])['word_labels']
 
-            # This could be done more efficient if a torch tensor was retrieved
-            tok_indices = torch.zeros((mlm_out_tok_merged.shape[0], mlm_out_tok_merged.shape[1]), dtype=torch.long,
-                                      device=self.device)
-
-            for sent_idx in range(len(tok_pred)):
-                word_idx = 0
-                subword_idx = 0
-                for subword_idx in range(len(tok_pred[sent_idx])):
-                    if not subword_mask[sent_idx][subword_idx + self.num_special_tokens].item():
-                        subword_idx -= 1
-                        break
-                    if tok_pred[sent_idx][subword_idx] == 'split':
-                        tok_indices[sent_idx][word_idx] = subword_idx
-                        word_idx += 1
-                # Add the last token if it was missed
-                if tok_pred[sent_idx][subword_idx] == 'merge':
-                    tok_indices[sent_idx][word_idx] = subword_idx
-                    word_idx += 1
-
-            mlm_out_token = torch.zeros_like(mlm_out_tok)
-            for layer_idx in range(len(mlm_out_tok)):
-                for sent_idx in range(len(mlm_out_token[0])):
-                    length = mlm_out_token.shape[-1]
-                    indices = tok_indices[sent_idx][:length]
-                    mlm_out_token[layer_idx][sent_idx] = mlm_out_tok[layer_idx][sent_idx][indices]
+            tok_indices = myutils.tok_word_ends(tok_pred, subword_mask[:, self.num_special_tokens:])
+            mlm_out_token = myutils.pool_subwords(mlm_out_tok, tok_indices, getattr(self, 'subword_pooling', 'last'))
 
         for task, task_type in zip(self.tasks, self.task_types):
             # Note that this is almost a copy of forward()
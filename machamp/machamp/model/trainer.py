@@ -25,7 +25,7 @@ def evaluate(dev_dataloader, model, train_dataset):
     total_dev_losses = {}
     dev_bach_idx = 0
     for dev_batch_idx, batch in enumerate(tqdm(dev_dataloader, file=sys.stdout)):
-        batch = myutils.prep_batch(batch, model.device, train_dataset)
+        batch = myutils.move_batch(batch, model.device)
         _, _, _, _, _, loss_dict = model.forward(batch['token_ids'], batch['golds'], batch['seg_ids'],
                                                     batch['offsets'], batch['subword_mask'], 
                                                     batch['task_masks'], batch['word_mask'], batch['dataset_ids'])
@@ -47,7 +47,8 @@ def train(
         resume: str = None,
         retrain: str = None,
         seed: int = None,
-        cmd: str = ''):
+        cmd: str = '',
+        dataset_cache: str = None):
     """
     
     Parameters
@@ -71,6 +72,9 @@ def train(
         random package. 
     cmd: str = ''
         The command invoked to start the training
+    dataset_cache: str = None
+        Directory in which the read (tokenized) datasets are cached, so 
+        that later runs on the same data do not have to read them again.
     """
     start_time = datetime.datetime.now()
     first_epoch = 1
@@ -122,21 +126,29 @@ def train(
 
     batch_size = parameters_config['batching']['batch_size']
     train_dataset = MachampDatasetCollection(parameters_config['transformer_model'], dataset_configs, is_train=True,
-                                   max_input_length=parameters_config['encoder']['max_input_length'] , num_epochs=parameters_config['training']['num_epochs'])
+                                   max_input_length=parameters_config['encoder']['max_input_length'] , num_epochs=parameters_config['training']['num_epochs'],
+                                   cache_dir=dataset_cache)
     train_sampler = MachampBatchSampler(train_dataset, batch_size, parameters_config['batching']['max_tokens'], parameters_config['batching']['shuffle'],
                                         parameters_config['batching']['sampling_smoothing'],
                                         parameters_config['batching']['sort_by_size'], parameters_config['batching']['diverse'], True)
-    train_dataloader = DataLoader(train_dataset, batch_sampler=train_sampler, collate_fn=lambda x: x)
+    # The batches are collated (padded) in worker processes, and moved to the device in the training loop
+    num_workers = parameters_config['batching'].get('num_workers', 0)
+    pin_memory = torch.device(device).type == 'cuda'
+    train_dataloader = DataLoader(train_dataset, batch_sampler=train_sampler,
+                                  collate_fn=myutils.MachampCollator(train_dataset), num_workers=num_workers,
+                                  pin_memory=pin_memory)
 
     # Note that the vocabulary is only saved for debugging purposes, there is also a copy in the model.pt
     train_dataset.vocabulary.save_vocabs(os.path.join(serialization_dir, 'vocabularies'))
 
     dev_dataset = MachampDatasetCollection(parameters_config['transformer_model'], dataset_configs, is_train=False,
                                  vocabulary=train_dataset.vocabulary,
-                                 max_input_length=parameters_config['encoder']['max_input_length'])
+                                 max_input_length=parameters_config['encoder']['max_input_length'],
+                                 cache_dir=dataset_cache)
     dev_sampler = MachampBatchSampler(dev_dataset, batch_size, parameters_config['batching']['max_tokens'], False, 1.0,
                                       parameters_config['batching']['sort_by_size'], False, True)
-    dev_dataloader = DataLoader(dev_dataset, batch_sampler=dev_sampler, collate_fn=lambda x: x)
+    dev_dataloader = DataLoader(dev_dataset, batch_sampler=dev_sampler, collate_fn=myutils.MachampCollator(train_dataset),
+                                num_workers=num_workers, pin_memory=pin_memory)
 
     if resume:
         model_path = os.path.join(serialization_dir, 'model_' + str(epoch) + '.pt')
@@ -199,15 +211,17 @@ def train(
         total_train_losses = {}
 
         train_batch_idx = 0
+        # before the DataLoader starts its workers, so that they get the MLM part of this epoch
+        train_sampler.start_epoch()
         for train_batch_idx, batch in enumerate(tqdm(train_dataloader, file=sys.stdout)):
             optimizer.zero_grad()
             # we create the batches again every epoch to save 
             # gpu ram, it is quite fast anyways
 
             # Why does this happen?
-            if len(batch) == 0:
+            if batch == None:
                 continue
-            batch = myutils.prep_batch(batch, device, train_dataset)
+            batch = myutils.move_batch(batch, device)
             #if batch['token_ids'].shape[0] * batch['token_ids'].shape[1] > 50000:
             #    print("skipping huge batch to avoid memory crash, size=" + str(batch['token_ids'].shape))
             #    continue
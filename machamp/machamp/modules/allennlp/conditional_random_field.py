@@ -355,38 +355,15 @@ class ConditionalRandomField(torch.nn.Module):
 
 
 
-    def viterbi_tags(
-            self, logits: torch.Tensor, mask: torch.BoolTensor = None, top_k: int = None
-    ) -> Union[List[VITERBI_DECODING], List[List[VITERBI_DECODING]]]:
+    def viterbi_transitions(self) -> torch.Tensor:
         """
-        Uses viterbi algorithm to find most likely tags for the given inputs.
-        If constraints are applied, disallows all other transitions.
-
-        Returns a list of results, of the same size as the batch (one result per batch member)
-        Each result is a List of length top_k, containing the top K viterbi decodings
-        Each decoding is a tuple  (tag_sequence, viterbi_score)
-
-        For backwards compatibility, if top_k is None, then instead returns a flat list of
-        tag sequences (the top tag sequence for each batch item).
+        The (num_tags + 2, num_tags + 2) transitions used for decoding, including the start
+        (num_tags) and end (num_tags + 1) tags, with the constraints applied.
         """
-        if mask is None:
-            mask = torch.ones(*logits.shape[:2], dtype=torch.bool, device=logits.device)
-
-        if top_k is None:
-            top_k = 1
-            flatten_output = True
-        else:
-            flatten_output = False
-
-        _, max_seq_length, num_tags = logits.size()
-
-        # Get the tensors out of the variables
-        logits, mask = logits.data, mask.data
-
-        # Augment transitions matrix with start and end transitions
+        num_tags = self.num_tags
         start_tag = num_tags
         end_tag = num_tags + 1
-        transitions = torch.full((num_tags + 2, num_tags + 2), -10000.0, device=logits.device)
+        transitions = torch.full((num_tags + 2, num_tags + 2), -10000.0, device=self.transitions.device)
 
         # Apply transition constraints
         constrained_transitions = self.transitions * self._constraint_mask[
@@ -409,37 +386,85 @@ class ConditionalRandomField(torch.nn.Module):
             transitions[:num_tags, end_tag] = -10000.0 * (
                     1 - self._constraint_mask[:num_tags, end_tag].detach()
             )
+        return transitions
+
+    def viterbi_paths(
+            self, logits: torch.Tensor, mask: torch.BoolTensor = None, top_k: int = 1
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Batched viterbi decoding, the tensor version of `viterbi_tags()`: all sentences of
+        the batch are decoded at once.
+
+        Returns a tuple (paths, scores, num_paths, lengths):
+        paths is a (batch_size, k, max_seq_length) tensor with the top k <= top_k tag
+        sequences of each batch member, padded with 0 after its length (the number of
+        unmasked positions, which are moved to the front), scores is a (batch_size, k)
+        tensor with their viterbi scores and num_paths the number of paths of each batch
+        member, which can be smaller than top_k for short sentences.
+        """
+        if mask is None:
+            mask = torch.ones(*logits.shape[:2], dtype=torch.bool, device=logits.device)
+
+        batch_size, max_seq_length, num_tags = logits.size()
+
+        # Get the tensors out of the variables
+        logits, mask = logits.data, mask.data.bool()
+
+        start_tag = num_tags
+        end_tag = num_tags + 1
+        transitions = self.viterbi_transitions()
 
-        best_paths = []
         # Pad the max sequence length by 2 to account for start_tag + end_tag.
-        tag_sequence = torch.empty(max_seq_length + 2, num_tags + 2, device=logits.device)
-
-        for prediction, prediction_mask in zip(logits, mask):
-            mask_indices = prediction_mask.nonzero(as_tuple=False).squeeze()
-            masked_prediction = torch.index_select(prediction, 0, mask_indices)
-            sequence_length = masked_prediction.shape[0]
-
-            # Start with everything totally unlikely
-            tag_sequence.fill_(-10000.0)
-            # At timestep 0 we must have the START_TAG
-            tag_sequence[0, start_tag] = 0.0
-            # At steps 1, ..., sequence_length we just use the incoming prediction
-            tag_sequence[1: (sequence_length + 1), :num_tags] = masked_prediction
-            # And at the last timestep we must have the END_TAG
-            tag_sequence[sequence_length + 1, end_tag] = 0.0
-
-            # We pass the tags and the transitions to `viterbi_decode`.
-            viterbi_paths, viterbi_scores = util.viterbi_decode(
-                tag_sequence=tag_sequence[: (sequence_length + 2)],
-                transition_matrix=transitions,
-                top_k=top_k,
-            )
-            top_k_paths = []
-            for viterbi_path, viterbi_score in zip(viterbi_paths, viterbi_scores):
-                # Get rid of START and END sentinels and append.
-                viterbi_path = viterbi_path[1:-1]
-                top_k_paths.append((viterbi_path, viterbi_score.item()))
-            best_paths.append(top_k_paths)
+        # Start with everything totally unlikely
+        tag_sequences = torch.full((batch_size, max_seq_length + 2, num_tags + 2), -10000.0, device=logits.device)
+        # At timestep 0 we must have the START_TAG
+        tag_sequences[:, 0, start_tag] = 0.0
+        # At steps 1, ..., sequence_length we just use the incoming (unmasked) predictions
+        lengths = mask.long().sum(1)
+        rows, columns = mask.nonzero(as_tuple=True)
+        positions = mask.long().cumsum(1)[rows, columns]
+        tag_sequences[rows, positions, :num_tags] = logits[rows, columns]
+        # And at the last timestep we must have the END_TAG
+        tag_sequences[torch.arange(batch_size, device=logits.device), lengths + 1, end_tag] = 0.0
+
+        paths, scores, num_paths = util.batched_viterbi_decode(
+            tag_sequences=tag_sequences,
+            lengths=lengths + 2,
+            transition_matrix=transitions,
+            top_k=top_k,
+        )
+        # Get rid of START and END sentinels.
+        paths = paths[:, :, 1:-1]
+        positions = torch.arange(max_seq_length, device=logits.device).view(1, 1, max_seq_length)
+        paths = paths.masked_fill(positions >= lengths.view(batch_size, 1, 1), 0)
+        return paths, scores, num_paths, lengths
+
+    def viterbi_tags(
+            self, logits: torch.Tensor, mask: torch.BoolTensor = None, top_k: int = None
+    ) -> Union[List[VITERBI_DECODING], List[List[VITERBI_DECODING]]]:
+        """
+        Uses viterbi algorithm to find most likely tags for the given inputs.
+        If constraints are applied, disallows all other transitions.
+
+        Returns a list of results, of the same size as the batch (one result per batch member)
+        Each result is a List of length top_k, containing the top K viterbi decodings
+        Each decoding is a tuple  (tag_sequence, viterbi_score)
+
+        For backwards compatibility, if top_k is None, then instead returns a flat list of
+        tag sequences (the top tag sequence for each batch item).
+        """
+        if top_k is None:
+            top_k = 1
+            flatten_output = True
+        else:
+            flatten_output = False
+
+        paths, scores, num_paths, lengths = self.viterbi_paths(logits, mask, top_k)
+
+        best_paths = []
+        for sent_paths, sent_scores, sent_num_paths, length in zip(
+                paths.tolist(), scores.tolist(), num_paths.tolist(), lengths.tolist()):
+            best_paths.append([(sent_paths[k][:length], sent_scores[k]) for k in range(sent_num_paths)])
 
         if flatten_output:
             return [top_k_paths[0] for top_k_paths in best_paths]
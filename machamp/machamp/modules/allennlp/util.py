@@ -188,6 +188,95 @@ def viterbi_decode(
     return viterbi_paths, viterbi_scores
 
 
+def batched_viterbi_decode(
+        tag_sequences: torch.Tensor,
+        lengths: torch.Tensor,
+        transition_matrix: torch.Tensor,
+        top_k: int = 1,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Perform Viterbi decoding in log space for a whole batch of sequences at once. The result
+    for sequence i is the same as `viterbi_decode(tag_sequences[i, :lengths[i]], transition_matrix,
+    top_k=top_k)`, but the potentials of all sequences are combined in one operation per timestep.
+    Sequences that are shorter than the batch keep their scores over the remaining timesteps.
+
+    # Parameters
+
+    tag_sequences : `torch.Tensor`, required.
+        A tensor of shape (batch_size, sequence_length, num_tags) representing scores for
+        a set of tags over the (padded) sequences.
+    lengths : `torch.Tensor`, required.
+        A tensor of shape (batch_size,) with the length of each sequence, at least 1.
+    transition_matrix : `torch.Tensor`, required.
+        A tensor of shape (num_tags, num_tags) representing the binary potentials
+        for transitioning between a given pair of tags.
+    top_k : `int`, optional, (default = `1`)
+        How many of the top paths to return for each sequence.
+
+    # Returns
+
+    viterbi_paths : `torch.Tensor`
+        A tensor of shape (batch_size, k, sequence_length) with the tag indices of the top
+        paths, where k is at most top_k. Positions after the length of a sequence repeat its
+        last tag.
+    viterbi_scores : `torch.Tensor`
+        A tensor of shape (batch_size, k) with the scores of the paths.
+    num_paths : `torch.Tensor`
+        A tensor of shape (batch_size,) with the number of paths of each sequence, short
+        sequences can have less than top_k paths. Scores of missing paths are -inf.
+    """
+    if top_k < 1:
+        raise ValueError(f"top_k must be an integer >=1. Instead received {top_k}")
+
+    batch_size, sequence_length, num_tags = list(tag_sequences.size())
+
+    # The number of paths kept at each timestep, which is the same for every sequence
+    num_kept = [1]
+    path_scores = tag_sequences[:, 0, :].unsqueeze(1)
+    path_indices = []
+
+    for timestep in range(1, sequence_length):
+        # Add pairwise potentials to current scores, the rows are (previous path, previous tag).
+        summed_potentials = path_scores.unsqueeze(3) + transition_matrix
+        summed_potentials = summed_potentials.view(batch_size, -1, num_tags)
+
+        # Best pairwise potential path scores from the previous timestep.
+        max_k = min(summed_potentials.size(1), top_k)
+        scores, paths = torch.topk(summed_potentials, k=max_k, dim=1)
+        scores = tag_sequences[:, timestep, :].unsqueeze(1) + scores
+
+        finished = lengths <= timestep
+        if finished.any():
+            # Finished sequences keep their paths, with backpointers to themselves.
+            kept_scores = torch.full_like(scores, -math.inf)
+            kept_scores[:, :num_kept[-1]] = path_scores
+            kept_paths = torch.arange(max_k * num_tags, device=paths.device).view(1, max_k, num_tags)
+            kept_paths = kept_paths % (num_kept[-1] * num_tags)
+            finished = finished.view(batch_size, 1, 1)
+            scores = torch.where(finished, kept_scores, scores)
+            paths = torch.where(finished, kept_paths, paths)
+
+        num_kept.append(max_k)
+        path_scores = scores
+        path_indices.append(paths.view(batch_size, -1))
+
+    # Construct the most likely sequences backwards.
+    path_scores_v = path_scores.view(batch_size, -1)
+    max_k = min(path_scores_v.size(1), top_k)
+    viterbi_scores, best_paths = torch.topk(path_scores_v, k=max_k, dim=1)
+    viterbi_paths = [best_paths]
+    for backward_timestep in reversed(path_indices):
+        viterbi_paths.append(backward_timestep.gather(1, viterbi_paths[-1]))
+    viterbi_paths.reverse()
+
+    # Viterbi paths uses (num_tags * n_permutations) nodes; therefore, we need to modulo.
+    viterbi_paths = torch.stack(viterbi_paths, 2) % num_tags
+
+    num_paths = torch.tensor([min(num_kept[length - 1] * num_tags, top_k) for length in lengths.tolist()],
+                             device=lengths.device)
+    return viterbi_paths, viterbi_scores, num_paths
+
+
 def logsumexp(tensor: torch.Tensor, dim: int = -1, keepdim: bool = False) -> torch.Tensor:
     """
     A numerically stable computation of logsumexp. This is mathematically equivalent to
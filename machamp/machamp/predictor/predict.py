@@ -189,19 +189,33 @@ def to_string(full_data: List[Any],
 
         return '\n'.join(['\t'.join(token_info) for token_info in full_data]) + '\n'
 
-def write_pred(out_file, batch, device, dev_dataset, model, dataset_config, raw_text=False, conn = '=', sep = '|'):
+def batch_to_strings(batch, device, dev_dataset, model, dataset_config, raw_text=False, conn = '=', sep = '|'):
+    """
+    Runs the model on a single batch and converts the predictions of
+    every instance to its output string (see to_string).
+
+    Returns
+    -------
+    outputs: List[str]
+        One string per instance in the batch, in the order of the batch.
+    """
     enc_batch = prep_batch(batch, device, dev_dataset, raw_text)
     out_dict = model.get_output_labels(enc_batch['token_ids'], enc_batch['golds'], enc_batch['seg_ids'],
                                         enc_batch['offsets'], enc_batch['subword_mask'], enc_batch['task_masks'], enc_batch['word_mask'], enc_batch['dataset_ids'], raw_text)
     
+    outputs = []
     for i in range(len(batch)):
         sent_dict = {}
         for task in out_dict:
             sent_dict[task] = {}
             for key in out_dict[task]:
                 sent_dict[task][key] = out_dict[task][key][i]
-        output = to_string(batch[i].full_data, sent_dict, dataset_config, batch[i].no_unk_subwords,
-                            model.vocabulary, enc_batch['token_ids'][i], )
+        outputs.append(to_string(batch[i].full_data, sent_dict, dataset_config, batch[i].no_unk_subwords,
+                                 model.vocabulary, enc_batch['token_ids'][i], ))
+    return outputs
+
+def write_pred(out_file, batch, device, dev_dataset, model, dataset_config, raw_text=False, conn = '=', sep = '|'):
+    for output in batch_to_strings(batch, device, dev_dataset, model, dataset_config, raw_text, conn, sep):
         out_file.write(output + '\n')
 
 def predict_with_paths(model, input_path, output_path, dataset, batch_size, raw_text, device, conn = '=', sep = '|', multi_threshold=None):
@@ -0,0 +1,360 @@
+import copy
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+from machamp.data.machamp_dataset_collection import MachampDatasetCollection
+from machamp.predictor.predict import batch_to_strings
+from machamp.readers.read_raw import raw_line_to_instance
+
+
+class PendingSentence:
+    def __init__(self, instance):
+        """
+        A single sentence waiting to be predicted. The worker thread fills
+        in the output and sets the event when the batch it was part of
+        is finished.
+
+        Parameters
+        ----------
+        instance: MachampInstance
+            The (unannotated) instance to predict.
+        """
+        self.instance = instance
+        self.output = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class LatencyStats:
+    def __init__(self, window: int = 10000):
+        """
+        Keeps track of the request latencies and the number of predicted
+        sentences, so that the server can report p50/p99 latency and
+        throughput.
+
+        Parameters
+        ----------
+        window: int
+            The number of most recent requests to use for the percentiles.
+        """
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.start_time = time.time()
+        self.num_requests = 0
+        self.num_sentences = 0
+        self.num_batches = 0
+        self.busy_seconds = 0.0
+
+    def add_request(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.num_requests += 1
+
+    def add_batch(self, num_sentences: int, seconds: float):
+        with self.lock:
+            self.num_batches += 1
+            self.num_sentences += num_sentences
+            self.busy_seconds += seconds
+
+    def summary(self):
+        """
+        Returns
+        -------
+        summary: Dict[str, float]
+            Latencies are in milliseconds, throughput is in sentences per
+            second, both over the wall-clock uptime and over the time the
+            model was actually running.
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            uptime = time.time() - self.start_time
+            summary = {'requests': self.num_requests,
+                       'sentences': self.num_sentences,
+                       'batches': self.num_batches,
+                       'avg_batch_size': self.num_sentences / self.num_batches if self.num_batches else 0.0,
+                       'uptime_s': uptime,
+                       'throughput_sents_per_s': self.num_sentences / uptime if uptime > 0 else 0.0,
+                       'model_throughput_sents_per_s': self.num_sentences / self.busy_seconds
+                                                       if self.busy_seconds > 0 else 0.0}
+        for name, percentile in [('p50_ms', 0.50), ('p99_ms', 0.99)]:
+            if latencies == []:
+                summary[name] = 0.0
+            else:
+                idx = min(len(latencies) - 1, int(percentile * len(latencies)))
+                summary[name] = latencies[idx] * 1000
+        return summary
+
+
+class MachampPredictionServer:
+    def __init__(self,
+                 model,
+                 dataset: str,
+                 device: str,
+                 batch_size: int = 32,
+                 max_words: int = 1024,
+                 max_wait_ms: float = 5.0,
+                 conn: str = '=',
+                 sep: str = '|'):
+        """
+        Keeps a MachampModel in memory and predicts on raw sentences that
+        are submitted from multiple threads. Sentences of concurrent
+        requests are merged into micro-batches, which are bounded in the
+        same way as in MachampBatchSampler: at most batch_size sentences
+        and at most max_words subwords.
+
+        Parameters
+        ----------
+        model: MachampModel
+            The (loaded) model to predict with.
+        dataset: str
+            Name of the dataset configuration of the model to use for
+            the output format; if None, the first one is used.
+        device: str
+            Description of cuda device to use, i.e.: "cpu" or "cuda:0"
+        batch_size: int
+            The maximum number of sentences in one batch.
+        max_words: int
+            The maximum amount of subwords to have in one batch.
+        max_wait_ms: float
+            How long the first sentence of a batch waits for other
+            requests to arrive before the batch is run.
+        conn: str
+            With --topn, string inserted between each label and its probability.
+        sep: str
+            With --topn, string inserted between label-probability pairs.
+        """
+        self.model = model
+        self.device = device
+        self.batch_size = batch_size
+        self.max_words = max_words
+        self.max_wait = max_wait_ms / 1000
+        self.conn = conn
+        self.sep = sep
+
+        if dataset == None:
+            dataset = list(model.dataset_configs.keys())[0]
+        elif dataset not in model.dataset_configs:
+            logger.error('Error, dataset ' + dataset + ' not found in the model, options: ' +
+                         str([dataset for dataset in model.dataset_configs]))
+            exit(1)
+        self.dataset = dataset
+        self.dataset_config = model.dataset_configs[dataset]
+
+        # Without a dev_data_path the collection does not read any data, we only
+        # use it for the tokenizer and the task types.
+        data_config = {dataset: copy.deepcopy(self.dataset_config)}
+        data_config[dataset].pop('dev_data_path', None)
+        data_config[dataset].pop('validation_data_path', None)
+        self.dev_dataset = MachampDatasetCollection(model.mlm.name_or_path, data_config, is_train=False,
+                                                    vocabulary=model.vocabulary, is_raw=True)
+        self.tokenizer = self.dev_dataset.tokenizer
+        self.num_special_tokens = len(self.tokenizer.prepare_for_model([])['input_ids'])
+
+        self.queue = queue.Queue()
+        self._leftover = None
+        self.stats = LatencyStats()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+
+        self.model.eval()
+        self.model.reset_metrics()
+
+    def start(self):
+        self.worker.start()
+
+    def predict(self, sentences: List[str]):
+        """
+        Predicts on a list of raw sentences, blocks until all of them
+        are done. Can be called from multiple threads at the same time.
+
+        Parameters
+        ----------
+        sentences: List[str]
+            Sentences with the tokens separated by spaces.
+
+        Returns
+        -------
+        outputs: List[str]
+            The predictions in the same format as predict.py writes them,
+            one string per input sentence. Empty sentences give an empty
+            string.
+        """
+        start_time = time.time()
+        pending = []
+        for sentence in sentences:
+            instance = raw_line_to_instance(sentence, self.dataset, self.tokenizer, self.num_special_tokens)
+            if instance == None:
+                pending.append(None)
+                continue
+            pending.append(PendingSentence(instance))
+            self.queue.put(pending[-1])
+
+        outputs = []
+        for item in pending:
+            if item == None:
+                outputs.append('')
+                continue
+            item.done.wait()
+            if item.error != None:
+                raise item.error
+            outputs.append(item.output)
+        self.stats.add_request(time.time() - start_time)
+        return outputs
+
+    def _next_batch(self):
+        """
+        Blocks until at least one sentence is available, and then keeps
+        adding sentences from the queue until the batch is full or
+        max_wait has passed. A sentence that does not fit anymore is kept
+        for the next batch.
+        """
+        if self._leftover != None:
+            batch = [self._leftover]
+            self._leftover = None
+        else:
+            batch = [self.queue.get()]
+        num_words = len(batch[0].instance)
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            try:
+                if timeout <= 0:
+                    item = self.queue.get_nowait()
+                else:
+                    item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if num_words + len(item.instance) > self.max_words:
+                self._leftover = item
+                break
+            num_words += len(item.instance)
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            start_time = time.time()
+            try:
+                with torch.no_grad():
+                    outputs = batch_to_strings([item.instance for item in batch], self.device, self.dev_dataset,
+                                               self.model, self.dataset_config, True, self.conn, self.sep)
+                for item, output in zip(batch, outputs):
+                    item.output = output
+            except Exception as error:
+                logger.exception('Error while predicting a batch of ' + str(len(batch)) + ' sentences')
+                for item in batch:
+                    item.error = error
+            self.stats.add_batch(len(batch), time.time() - start_time)
+            for item in batch:
+                item.done.set()
+
+
+class MachampRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP requests, the prediction server is found in
+    self.server.predictor. Endpoints:
+    POST /predict  {"sentences": ["tok1 tok2 ...", ...]} or {"sentences": [["tok1", "tok2"], ...]}
+    GET  /stats    latency and throughput statistics
+    """
+    def _send_json(self, code: int, content: Dict):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.server.predictor.stats.summary())
+        else:
+            self._send_json(404, {'error': 'unknown path ' + self.path})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': 'unknown path ' + self.path})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            sentences = request['sentences']
+            if type(sentences) != list:
+                raise ValueError('sentences should be a list')
+            for sent in sentences:
+                if type(sent) != str and not (type(sent) == list and all(type(token) == str for token in sent)):
+                    raise ValueError('each sentence should be a string or a list of strings')
+            sentences = [' '.join(sent) if type(sent) == list else sent for sent in sentences]
+        except (ValueError, KeyError, TypeError) as error:
+            self._send_json(400, {'error': 'invalid request: ' + str(error)})
+            return
+        try:
+            outputs = self.server.predictor.predict(sentences)
+        except Exception as error:
+            self._send_json(500, {'error': str(error)})
+            return
+        self._send_json(200, {'predictions': outputs})
+
+    def address_string(self):
+        # unix sockets have no client address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug(self.address_string() + ' ' + format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def serve(predictor: MachampPredictionServer, host: str = '127.0.0.1', port: int = 8000, socket_path: str = None):
+    """
+    Starts the prediction worker and serves HTTP requests until
+    interrupted, either on host:port or on a unix socket.
+
+    Parameters
+    ----------
+    predictor: MachampPredictionServer
+        The prediction server holding the model.
+    host: str
+        The host to listen on.
+    port: int
+        The port to listen on.
+    socket_path: str
+        If given, listen on this unix socket instead of on host:port.
+    """
+    if socket_path != None:
+        httpd = ThreadingUnixHTTPServer(socket_path, MachampRequestHandler)
+        logger.info('serving on unix socket ' + socket_path)
+    else:
+        httpd = ThreadingHTTPServer((host, port), MachampRequestHandler)
+        logger.info('serving on http://' + host + ':' + str(port))
+    httpd.predictor = predictor
+    predictor.start()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        if socket_path != None and os.path.exists(socket_path):
+            os.remove(socket_path)
+        logger.info('stats: ' + json.dumps(predictor.stats.summary()))
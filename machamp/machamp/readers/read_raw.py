@@ -10,6 +10,59 @@ from machamp.data.machamp_vocabulary import MachampVocabulary
 logger = logging.getLogger(__name__)
 
 
+def raw_line_to_instance(
+        line: str,
+        dataset: str,
+        tokenizer: AutoTokenizer,
+        num_special_tokens: int):
+    """
+    Converts a single raw input line (tokens separated by spaces) into a
+    MachampInstance without annotation. Shared by read_raw and the
+    prediction server, which receives its sentences over a socket instead
+    of from a file.
+
+    Parameters
+    ----------
+    line: str
+        The raw input sentence, tokens are split on single spaces.
+    dataset: str
+        The (unique) name of the dataset.
+    tokenizer: AutoTokenizer
+        The tokenizer to use (that should match the used MLM).
+    num_special_tokens: int
+        Number of special tokens the tokenizer adds to each input.
+
+    Returns
+    -------
+    instance: Machamp.data.MachampInstance
+        The instance, or None if the line does not contain any tokens.
+    """
+    line = line.strip()
+
+    tokens = line.split(' ')
+    token_ids = []
+    offsets = []
+    for token in tokens:
+        subwords = tokenizer.tokenize(token)
+        if len(subwords) == 0:
+            subwords = [tokenizer.unk_token]
+        token_ids.extend(tokenizer.convert_tokens_to_ids(subwords))
+        offsets.append(len(token_ids)-1)
+    token_ids = torch.tensor(tokenizer.prepare_for_model(token_ids)['input_ids'])
+    offsets = torch.tensor(offsets)
+
+    if len(token_ids) <= num_special_tokens:
+        return None
+
+    golds = {}
+    full_data = []
+    for token in tokens:
+        full_data.append([str(len(full_data)+1), token] + ['_'] * 8) # TODO hardcoded, doesnt work for non-UD (including classification)
+
+    return MachampInstance(full_data, token_ids, torch.zeros((len(token_ids)), dtype=torch.long), golds, dataset,
+                           offsets)
+
+
 def read_raw(
         dataset: str,
         config: dict,
@@ -63,36 +116,16 @@ def read_raw(
         exit(1)
 
     for line in open(data_path):
-        line = line.strip()
-
-        tokens = line.split(' ')
-        token_ids = []
-        offsets = []
-        for token in tokens:
-            subwords = tokenizer.tokenize(token)
-            if len(subwords) == 0:
-                subwords = [tokenizer.unk_token]
-            token_ids.extend(tokenizer.convert_tokens_to_ids(subwords))
-            offsets.append(len(token_ids)-1)
-        token_ids = torch.tensor(tokenizer.prepare_for_model(token_ids)['input_ids'])
-        offsets = torch.tensor(offsets)
-    
+        instance = raw_line_to_instance(line, dataset, tokenizer, num_special_tokens)
         # skip empty lines
-        if len(token_ids) <= num_special_tokens:
+        if instance == None:
             continue
         sent_counter += 1
 
         if has_unk:
-            unk_counter += sum(token_ids == tokenizer.unk_token_id)
-        subword_counter += len(token_ids) - num_special_tokens
-
-        golds = {}
-        full_data = []
-        for token in tokens:
-            full_data.append([str(len(full_data)+1), token] + ['_'] * 8) # TODO hardcoded, doesnt work for non-UD (including classification)
-        
-        data.append(MachampInstance(full_data, token_ids, torch.zeros((len(token_ids)), dtype=torch.long), golds, dataset,
-                                    offsets))
+            unk_counter += sum(instance.token_ids == tokenizer.unk_token_id)
+        subword_counter += len(instance.token_ids) - num_special_tokens
+        data.append(instance)
     logger.info('Stats ' + dataset + ' (' + data_path + '):')
     logger.info('Lines:    {:,}'.format(sent_counter))
     logger.info('Subwords: {:,}'.format(subword_counter))
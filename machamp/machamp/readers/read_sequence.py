@@ -78,7 +78,7 @@ def seqs2data(tabular_file: str, skip_first_line: bool = False):
 
 
 def tokenize_simple(tokenizer: AutoTokenizer, sent: List[List[str]], word_col_idx: int, num_special_tokens: int,
-                    has_unk: bool):
+                    has_unk: bool, word_cache: tok_utils.WordTokenCache = None):
     """
     A tokenizer that tokenizes each token separately (over gold tokenization). 
     We found that this is the most robust method to tokenize overall (handling
@@ -98,6 +98,9 @@ def tokenize_simple(tokenizer: AutoTokenizer, sent: List[List[str]], word_col_id
         (only end token)
     has_unk: bool
         Does the tokenizer have an unk token
+    word_cache: tok_utils.WordTokenCache
+        If given, the subwords of each token are looked up in this cache,
+        which gives the same result as tokenizing them here.
     
     Returns
     -------
@@ -110,6 +113,12 @@ def tokenize_simple(tokenizer: AutoTokenizer, sent: List[List[str]], word_col_id
     """
     token_ids = []
     offsets = []
+    if word_cache != None:
+        for token in sent:
+            token_ids.extend(word_cache[token[word_col_idx]])
+            offsets.append(len(token_ids) - 1)
+        return token_ids, torch.tensor(offsets, dtype=torch.long)
+
     for token_idx in range(len(sent)):
         # we do not use return_tensors='pt' because we do not know the length beforehand
         if num_special_tokens == 2:
@@ -140,7 +149,8 @@ def read_sequence(
         is_train: bool,
         max_sents: int,
         max_words: int,
-        max_input_length: int):
+        max_input_length: int,
+        use_word_cache: bool = True):
     """
     Reads conllu-like files. It relies heavily on seqs2data for the reading
     logic.  Can also read sentence classification tasks for which the labels 
@@ -168,6 +178,10 @@ def read_sequence(
         The maximum amount of words to read, rounds down.
     max_input_length
         The maximum amount of subwords to input to the encoder, not used here.
+    use_word_cache: bool
+        Whether to look up the subwords of the gold tokens in a cache that is
+        shared by all datasets read in this run (see tok_utils.WordTokenCache),
+        instead of tokenizing every token separately.
 
     Returns
     -------
@@ -190,6 +204,11 @@ def read_sequence(
         type_tokenizer = myutils.identify_tokenizer(tokenizer)
 
     all_sents = list(seqs2data(data_path))
+    word_cache = None
+    if use_word_cache and not has_tok_task:
+        word_cache = tok_utils.get_word_token_cache(tokenizer, num_special_tokens, has_unk)
+        # tokenize all new words of the file in one batch
+        word_cache.add_words([line[word_col_idx] for sent, _ in all_sents for line in sent if len(line) > word_col_idx])
     do_splits = False
     if has_tok_task:
         for task in config['tasks']:
@@ -232,7 +251,8 @@ def read_sequence(
             # We assume that if we have only one special token, that it is the end token
 
         else:
-            token_ids, offsets = tokenize_simple(tokenizer, sent, word_col_idx, num_special_tokens, has_unk)
+            token_ids, offsets = tokenize_simple(tokenizer, sent, word_col_idx, num_special_tokens, has_unk,
+                                                 word_cache)
             no_unk_subwords = None
         token_ids = tokenizer.prepare_for_model(token_ids, return_tensors='pt')['input_ids']
 
@@ -425,4 +445,7 @@ def read_sequence(
     logger.info('Subwords:   {:,}'.format(subword_counter))
     logger.info('Unks:       {:,}'.format(unk_counter))
     logger.info('Pre-splits: {:,}'.format(len(vocabulary.pre_splits)))
+    if word_cache != None:
+        logger.info('Word cache: {:,} words, {:,} hits, {:,} misses'.format(len(word_cache.cache), word_cache.hits,
+                                                                            word_cache.misses))
     return data
@@ -5,6 +5,7 @@ import re
 from typing import List, Dict, Tuple, Optional, Any, Union, Iterator
 
 import _jsonnet
+import numpy
 import torch
 
 logger = logging.getLogger(__name__)
@@ -69,6 +70,209 @@ def merge_configs(dataset_configs: List[str], parameters_config: Dict):
     return data_params
 
 
+def _to_numpy(values):
+    if type(values) == torch.Tensor:
+        return values.numpy()
+    return numpy.asarray(values)
+
+
+def _fill_padded(buffer: numpy.ndarray, sequences: List, lengths: numpy.ndarray):
+    """
+    Copies variable length sequences into the rows of a padded 2d buffer
+    with a single (masked) assignment.
+    """
+    if lengths.sum() == 0:
+        return
+    mask = numpy.arange(buffer.shape[1])[None, :] < lengths[:, None]
+    buffer[mask] = numpy.concatenate([_to_numpy(sequence).reshape(-1) for sequence in sequences
+                                      if sequence is not None and len(sequence) > 0])
+
+
+class MachampCollator:
+    def __init__(self, dataset: MachampDataset, assume_word_level: bool = False):
+        """
+        Collates a list of instances into a batch of (CPU) tensors, see
+        prep_batch. Only the task types and label counts of the dataset are
+        kept, so that it can be used as collate_fn in DataLoader worker
+        processes.
+
+        Parameters
+        ----------
+        dataset: MachampDataset
+            Used for task-types.
+        assume_word_level: bool
+            Normally, we check the gold annotations to see whether we need word
+            level information (i.e. offsets); but if gold data is absent, and we
+            still need to perform token level tasks, this variable can enforce
+            getting the word level information.
+        """
+        self.assume_word_level = assume_word_level
+        self.task_types = {}
+        self.num_labels = {}
+        for task, task_type in zip(dataset.tasks, dataset.task_types):
+            if task_type == 'dependency':
+                self.task_types[task + '-heads'] = task_type
+                self.task_types[task + '-rels'] = task_type
+            self.task_types[task] = task_type
+            if task_type in ['multiseq', 'multiclas']:
+                self.num_labels[task] = len(dataset.vocabulary.get_vocab(task))
+
+    def __call__(self, batch: List[MachampInstance]):
+        """
+        Builds the padded numpy buffers of the batch on the host, and converts
+        each of them to a torch.tensor (without copying).
+
+        Parameters
+        ----------
+        batch: List[MachampInstance]
+            A list of Machamp.data.MachampInstance . Where basically each instance
+            represents a sentence.
+
+        Returns
+        -------
+        batch: Dict[key: torch.tensor]
+            The same as prep_batch, but on the CPU. None for an empty batch.
+        """
+        if len(batch) == 0:
+            return None
+        batch_size = len(batch)
+        subword_lengths = numpy.array([len(instance.token_ids) for instance in batch], dtype=numpy.int64)
+        max_subword_len = int(subword_lengths.max())
+        batch_subwords = numpy.zeros((batch_size, max_subword_len), dtype=numpy.int64)
+        batch_seg_ids = numpy.zeros((batch_size, max_subword_len), dtype=numpy.int64)
+        batch_dataset_ids = None
+        golds = {}
+        batch_offsets = None
+        batch_word_mask = None
+
+        # Check if any of the task is token level, because then we need to save the offsets and a 
+        # separate mask
+        all_tasks = []
+        has_word_level = self.assume_word_level
+        for instance in batch:
+            for task in instance.golds:
+                if task not in all_tasks:
+                    all_tasks.append(task)
+                    if self.task_types[task] in ['seq', 'multiseq', 'seq_bio', 'tok', 'dependency', 'string2string',
+                                                 'mlm']:
+                        has_word_level = True
+        if has_word_level:
+            offsets = [instance.offsets for instance in batch]
+            word_lengths = numpy.array([0 if instance_offsets is None else len(instance_offsets)
+                                        for instance_offsets in offsets], dtype=numpy.int64)
+            max_token_len = int(word_lengths.max())
+            batch_offsets = numpy.full((batch_size, max_token_len), -1, dtype=numpy.int64)
+            _fill_padded(batch_offsets, offsets, word_lengths)
+            batch_word_mask = numpy.arange(max_token_len)[None, :] < word_lengths[:, None]
+
+        _fill_padded(batch_subwords, [instance.token_ids for instance in batch], subword_lengths)
+        seg_ids = [instance.seg_ids for instance in batch]
+        _fill_padded(batch_seg_ids, seg_ids, numpy.array([len(instance_seg_ids) for instance_seg_ids in seg_ids],
+                                                         dtype=numpy.int64))
+        dataset_ids = [instance.dataset_ids if instance.dataset_ids not in [[], None] else None for instance in batch]
+        if any(instance_dataset_ids is not None for instance_dataset_ids in dataset_ids):
+            batch_dataset_ids = numpy.zeros((batch_size, max_subword_len), dtype=numpy.int64)
+            _fill_padded(batch_dataset_ids, dataset_ids, numpy.array(
+                [0 if instance_dataset_ids is None else len(instance_dataset_ids) for instance_dataset_ids in dataset_ids],
+                dtype=numpy.int64))
+        batch_subword_mask = numpy.arange(max_subword_len)[None, :] < subword_lengths[:, None]
+
+        task_masks = {}
+        for task in all_tasks:
+            task_type = self.task_types[task]
+            instance_idxs = [instanceIdx for instanceIdx, instance in enumerate(batch) if task in instance.golds]
+            task_golds = [batch[instanceIdx].golds[task] for instanceIdx in instance_idxs]
+
+            if task_type == 'tok':
+                golds[task] = numpy.full((batch_size, max_subword_len - 2), -100, dtype=numpy.int64)
+            elif task_type == 'regression':
+                golds[task] = numpy.full((batch_size,), -100, dtype=numpy.float32)
+            elif task_type == 'multiseq':
+                golds[task] = numpy.full((batch_size, max_token_len, self.num_labels[task]), -100, dtype=numpy.int64)
+            elif task_type == 'multiclas':
+                golds[task] = numpy.full((batch_size, self.num_labels[task]), -100, dtype=numpy.int64)
+            elif task_type == 'classification':
+                golds[task] = numpy.full((batch_size,), -100, dtype=numpy.int64)
+            else: # token level task
+                golds[task] = numpy.full((batch_size, max_token_len), -100, dtype=numpy.int64)
+
+            if task_type == 'multiseq':
+                # set a 1 for every (instance, token, label) triple, -100 are padding labels
+                instance_ids, token_ids, label_ids = [], [], []
+                for instanceIdx, instance_golds in zip(instance_idxs, task_golds):
+                    instance_golds = _to_numpy(instance_golds).reshape(len(instance_golds), -1)
+                    token_idxs, label_idxs = numpy.nonzero(instance_golds != -100)
+                    instance_ids.append(numpy.full(len(token_idxs), instanceIdx))
+                    token_ids.append(token_idxs)
+                    label_ids.append(instance_golds[token_idxs, label_idxs])
+                golds[task][numpy.concatenate(instance_ids), numpy.concatenate(token_ids),
+                            numpy.concatenate(label_ids)] = 1
+            elif task_type == 'multiclas':
+                instance_ids, label_ids = [], []
+                for instanceIdx, instance_golds in zip(instance_idxs, task_golds):
+                    instance_golds = _to_numpy(instance_golds).reshape(-1)
+                    instance_golds = instance_golds[instance_golds != -100]
+                    instance_ids.append(numpy.full(len(instance_golds), instanceIdx))
+                    label_ids.append(instance_golds)
+                golds[task][numpy.concatenate(instance_ids), numpy.concatenate(label_ids).astype(numpy.int64)] = 1
+            elif task_type in ['regression', 'classification']:
+                golds[task][instance_idxs] = [float(gold) if task_type == 'regression' else int(gold)
+                                              for gold in task_golds]
+            else: # token level task
+                gold_lengths = numpy.zeros(batch_size, dtype=numpy.int64)
+                gold_lengths[instance_idxs] = [len(gold) for gold in task_golds]
+                _fill_padded(golds[task], task_golds, gold_lengths)
+
+            if task_type == 'dependency':
+                if task.endswith('-rels'):
+                    task_masks[task[:-5]] = numpy.zeros((batch_size), dtype=numpy.bool_)
+                    task_masks[task[:-5]][instance_idxs] = True
+            else:
+                task_masks[task] = numpy.zeros((batch_size), dtype=numpy.bool_)
+                task_masks[task][instance_idxs] = True
+
+        def to_tensor(array):
+            return None if array is None else torch.from_numpy(array)
+
+        return {'token_ids': to_tensor(batch_subwords), 'seg_ids': to_tensor(batch_seg_ids),
+                'golds': {task: to_tensor(golds[task]) for task in golds}, 'offsets': to_tensor(batch_offsets),
+                'subword_mask': to_tensor(batch_subword_mask),
+                'task_masks': {task: to_tensor(task_masks[task]) for task in task_masks},
+                'word_mask': to_tensor(batch_word_mask), 'dataset_ids': to_tensor(batch_dataset_ids)}
+
+
+def move_batch(batch: Dict, device: str):
+    """
+    Moves a collated batch (see MachampCollator) to the device. On cuda 
+    devices the tensors are pinned first (if they are not yet, i.e. by the
+    DataLoader), so that the copies are asynchronous.
+
+    Parameters
+    ----------
+    batch: Dict[key: torch.tensor]
+        The batch as returned by MachampCollator.
+    device: str
+        Description of cuda device to use, i.e.: "cpu" or "gpu:0"
+
+    Returns
+    -------
+    batch: Dict[key: torch.tensor]
+        The same batch, with all tensors on the device.
+    """
+    use_cuda = torch.device(device).type == 'cuda'
+
+    def move(value):
+        if value is None:
+            return None
+        if type(value) == dict:
+            return {key: move(value[key]) for key in value}
+        if use_cuda and not value.is_pinned():
+            value = value.pin_memory()
+        return value.to(device, non_blocking=True)
+
+    return {key: move(batch[key]) for key in batch}
+
+
 def prep_batch(
         batch: List[MachampInstance],
         device: str,
@@ -79,7 +283,8 @@ def prep_batch(
     forward pass of a MachampModel training. This means it converts a
     list of instances to a dictionary holding multiple torch.tensors, 
     containing at least the token_ids. Based on the setup it could also 
-    conclude seg_ids, golds, offsets and mask.
+    conclude seg_ids, golds, offsets and mask. This is the same as 
+    collating with MachampCollator and moving the result to the device.
 
     Parameters
     ----------
@@ -110,95 +315,7 @@ def prep_batch(
         'task_masks': multiseq, multiclas and seq_bio need a word-level mask. This is for evaluation purposes mainly.
         'dataset_ids': Dataset ID's for the dataset embeddings (enabled with: dataset_embed_idx).
     """
-    batch_size = len(batch)
-    max_subword_len = max([len(instance) for instance in batch])
-    batch_subwords = torch.full((batch_size, max_subword_len), 0, dtype=torch.long, device=device)
-    batch_dataset_ids = torch.full((batch_size, max_subword_len), 0, dtype=torch.long, device=device)
-    found_dataset_id = False
-    batch_seg_ids = torch.zeros((batch_size, max_subword_len), dtype=torch.long, device=device)
-    golds = {}
-    batch_offsets = None
-    batch_word_mask = None
-
-    # Check if any of the task is token level, because then we need to save the offsets and a 
-    # separate mask
-    all_tasks = set()
-    has_word_level = assume_word_level
-    for instance in batch:
-        for task in instance.golds:
-            all_tasks.add(task)
-            task_type = dataset.task_to_tasktype(task)
-            if task_type in ['seq', 'multiseq', 'seq_bio', 'tok', 'dependency', 'string2string', 'mlm']:
-                has_word_level = True
-    if has_word_level:
-        max_token_len = max([len(instance.offsets) for instance in batch if type(instance.offsets) != type(None)])
-        batch_offsets = torch.full((batch_size, max_token_len), -1, dtype=torch.long, device=device)
-        batch_word_mask = torch.zeros((batch_size, max_token_len), dtype=torch.bool, device=device)
-
-    batch_subword_mask = torch.zeros((batch_size, max_subword_len), dtype=torch.bool, device=device)
-    task_masks = {}
-    for task in all_tasks:
-        task_type = dataset.task_to_tasktype(task)
-
-        if task_type == 'tok':
-            golds[task] = torch.full((batch_size, max_subword_len - 2), -100, dtype=torch.long, device=device)
-        elif task_type == 'regression':
-            golds[task] = torch.full((batch_size,), -100, dtype=torch.float, device=device)
-        elif task_type == 'multiseq':
-            num_labels = len(dataset.vocabulary.get_vocab(task))
-            golds[task] = torch.full((batch_size, max_token_len, num_labels), -100, dtype=torch.long, device=device)
-        elif task_type == 'multiclas':
-            num_labels = len(dataset.vocabulary.get_vocab(task))
-            golds[task] = torch.full((batch_size, num_labels), -100, dtype=torch.long, device=device)
-        elif task_type == 'classification':
-            golds[task] = torch.full((batch_size,), -100, dtype=torch.long, device=device)
-        else: # token level task
-            golds[task] = torch.full((batch_size, max_token_len), -100, dtype=torch.long, device=device)
-        if task_type == 'dependency':
-            if task.endswith('-rels'):
-                task_masks[task[:-5]] = torch.zeros((batch_size), dtype=torch.bool, device=device)
-        else:
-            task_masks[task] = torch.zeros((batch_size), dtype=torch.bool, device=device)
-
-    for instanceIdx, instance in enumerate(batch):
-        batch_subwords[instanceIdx][0:len(instance.token_ids)] = instance.token_ids
-        if instance.dataset_ids not in [[], None]:
-            found_dataset_id = True
-            batch_dataset_ids[instanceIdx][0:len(instance.token_ids)] = instance.dataset_ids
-        batch_seg_ids[instanceIdx][0:len(instance.seg_ids)] = instance.seg_ids
-        for task in instance.golds:
-            task_type = dataset.task_to_tasktype(task)
-
-            if task_type == 'multiseq':
-                for token_idx, token_labels in enumerate(instance.golds[task]):
-                    for token_label in token_labels:
-                        if token_label != -100:
-                            golds[task][instanceIdx][token_idx][token_label] = 1
-            elif task_type == 'multiclas':
-                for sent_label in instance.golds[task]:
-                    if sent_label != -100:
-                        golds[task][instanceIdx][sent_label] = 1
-            elif task_type in ['regression', 'classification']:
-                golds[task][instanceIdx] = instance.golds[task]
-            else: # token level task
-                golds[task][instanceIdx][0:len(instance.golds[task])] = instance.golds[task]
-            
-            if task_type == 'dependency':
-                if task.endswith('-rels'):
-                    task_masks[task[:-5]][instanceIdx] = True
-            else:
-                task_masks[task][instanceIdx] = True
-
-        if has_word_level and type(instance.offsets) != type(None):
-            batch_offsets[instanceIdx][:len(instance.offsets)] = instance.offsets
-            batch_word_mask[instanceIdx][:len(instance.offsets)] = 1
-        batch_subword_mask[instanceIdx][:len(instance.token_ids)] = 1
-
-    if not found_dataset_id:
-            batch_dataset_ids = None
-
-    return {'token_ids': batch_subwords, 'seg_ids': batch_seg_ids, 'golds': golds, 'offsets': batch_offsets,
-            'subword_mask': batch_subword_mask, 'task_masks': task_masks, 'word_mask': batch_word_mask, 'dataset_ids': batch_dataset_ids}
+    return move_batch(MachampCollator(dataset, assume_word_level)(batch), device)
 
 
 def report_metrics(metrics):
@@ -440,6 +557,107 @@ def apply_scalar(mlm_out: torch.tensor, layers: List, scalar: ScalarMix):
         return mlm_out[layers[0]]
 
 
+SUBWORD_POOLINGS = ['first', 'last', 'mean']
+
+
+def pool_subwords(mlm_out: torch.tensor, offsets: torch.tensor, pooling: str = 'last', begin: int = 0,
+                  end: int = None):
+    """
+    Converts the subword level output of the LM to the word level in one
+    batched operation. The offsets are the indices of the last subword of
+    each word, the padding offsets (-1) take the last subword of the
+    sentence, like indexing with -1 does.
+
+    Parameters
+    ----------
+    mlm_out: torch.tensor
+        Input, shape = [layers, batch_size, num_subwords, emb_size]
+    offsets: torch.tensor
+        The index of the last subword of each word (counted from begin), 
+        padded with -1, shape = [batch_size, num_words]
+    pooling: str
+        Which subwords represent a word: the 'first', the 'last' or the 
+        'mean' of all its subwords.
+    begin: int
+        The subwords of the sentences are mlm_out[:, :, begin:end], so 
+        that the special tokens can be skipped without slicing (and
+        copying) mlm_out.
+    end: int
+        See begin, None for the last subword.
+
+    Returns
+    -------
+    result: torch.tensor
+        The word level output, shape = [layers, batch_size, num_words, 
+        emb_size]
+    """
+    num_layers, batch_size, num_subwords, emb_size = mlm_out.shape
+    sent_subwords = len(range(num_subwords)[begin:end])
+    last = torch.where(offsets < 0, offsets + sent_subwords, offsets)
+    if pooling == 'last':
+        index = last
+    else:
+        # the first subword of a word follows the last subword of the previous word
+        first = torch.cat((torch.zeros_like(offsets[:, :1]), offsets[:, :-1] + 1), 1)
+        first = torch.where(offsets < 0, last, torch.min(first, last))
+        if pooling == 'first':
+            index = first
+        elif pooling == 'mean':
+            subword_idxs = torch.arange(sent_subwords, device=mlm_out.device).view(1, 1, sent_subwords)
+            weights = ((subword_idxs >= first.unsqueeze(2)) & (subword_idxs <= last.unsqueeze(2))).to(mlm_out.dtype)
+            weights = weights / weights.sum(2, keepdim=True)
+            return torch.matmul(weights.unsqueeze(0), mlm_out[:, :, begin:end])
+        else:
+            logger.error('Subword pooling ' + pooling + ' is not defined, options are: ' + str(SUBWORD_POOLINGS))
+            exit(1)
+    # index the subwords of all sentences at once, in the flattened batch
+    index = index + begin + torch.arange(batch_size, device=index.device).unsqueeze(1) * num_subwords
+    word_out = mlm_out.reshape(num_layers, batch_size * num_subwords, emb_size).index_select(1, index.view(-1))
+    return word_out.view(num_layers, batch_size, -1, emb_size)
+
+
+def tok_word_ends(tok_pred: List[List[str]], subword_mask: torch.tensor):
+    """
+    Finds the index of the last subword of each word predicted by a tok
+    task: the subwords labeled as 'split', and the last subword of the
+    sentence if it was labeled as 'merge'. 
+
+    Parameters
+    ----------
+    tok_pred: List[List[str]]
+        The predicted labels ('split' or 'merge') for each subword.
+    subword_mask: torch.tensor
+        Mask of the subwords, starting at the first subword that is not a 
+        special token, shape = [batch_size, num_subwords]
+
+    Returns
+    -------
+    tok_indices: torch.tensor
+        The index of the last subword for each word, padded with 0, 
+        shape = [batch_size, num_subwords]
+    """
+    device = subword_mask.device
+    is_split = torch.tensor([[label == 'split' for label in sent] for sent in tok_pred], dtype=torch.bool,
+                            device=device)
+    is_merge = torch.tensor([[label == 'merge' for label in sent] for sent in tok_pred], dtype=torch.bool,
+                            device=device)
+    batch_size, num_subwords = is_split.shape
+    subword_idxs = torch.arange(num_subwords, device=device).expand(batch_size, num_subwords)
+    # the sentence ends at the first masked subword
+    in_sent = subword_mask[:, :num_subwords].bool()
+    lengths = torch.where(in_sent, torch.full_like(subword_idxs, num_subwords), subword_idxs).min(1)[0]
+    ends = is_split & (subword_idxs < lengths.unsqueeze(1))
+    # add the last token if it was missed (an empty sentence uses the label of the last subword)
+    last = (lengths - 1) % num_subwords
+    sent_idxs = torch.arange(batch_size, device=device)
+    ends[sent_idxs, last] |= is_merge[sent_idxs, last]
+
+    tok_indices = torch.zeros((batch_size, num_subwords), dtype=torch.long, device=device)
+    rows, cols = ends.nonzero(as_tuple=True)
+    tok_indices[rows, ends.long().cumsum(1)[rows, cols] - 1] = cols
+    return tok_indices
+
+
 def identify_tokenizer(tokenizer: AutoTokenizer):
     """
     Identifies the strategy the tokenizer uses to represent (the absence of) whitespaces. 
@@ -577,3 +577,108 @@ def tokenize_and_annotate(
 
     return token_ids, offsets, tok_gold, no_unk_subwords, pre_splits
 
+
+
+class WordTokenCache:
+    def __init__(self, tokenizer: AutoTokenizer, num_special_tokens: int, has_unk: bool):
+        """
+        Memoizes the subword ids of single words, exactly as tokenize_simple
+        computes them (tokenizer.encode() of each word, without the special
+        tokens, the unk token if the word gives no subwords). Words that are
+        not cached yet are tokenized in one batch call of the same tokenizer,
+        so the ids are always the ones the tokenizer itself gives.
+
+        Parameters
+        ----------
+        tokenizer: AutoTokenizer
+            The tokenizer to use (that should match the used MLM).
+        num_special_tokens: int
+            Number of special tokens, here assumed to be 2 (start/end token) or 1
+            (only end token)
+        has_unk: bool
+            Does the tokenizer have an unk token
+        """
+        self.tokenizer = tokenizer
+        self.num_special_tokens = num_special_tokens
+        self.has_unk = has_unk
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _strip(self, tokked: List[int]):
+        if self.num_special_tokens == 2:
+            tokked = tokked[1:-1]
+        elif self.num_special_tokens == 1:
+            # We assume that if there is only one special token, it is the end token
+            tokked = tokked[:-1]
+        elif self.num_special_tokens != 0:
+            logger.error('Number of special tokens is currently not handled: ' + str(self.num_special_tokens))
+            exit(1)
+        if len(tokked) == 0 and self.has_unk:
+            tokked = [self.tokenizer.unk_token_id]
+        return tokked
+
+    def add_words(self, words: List[str]):
+        """
+        Tokenizes all words that are not in the cache yet, with one batch
+        call of the tokenizer.
+
+        Parameters
+        ----------
+        words: List[str]
+            The words to cache, can contain duplicates.
+        """
+        new_words = [word for word in dict.fromkeys(words) if word not in self.cache]
+        if new_words == []:
+            return
+        for word, tokked in zip(new_words, self.tokenizer(new_words)['input_ids']):
+            self.cache[word] = self._strip(tokked)
+
+    def __getitem__(self, word: str):
+        """
+        Parameters
+        ----------
+        word: str
+            A single (gold) token.
+
+        Returns
+        -------
+        token_ids: List[int]
+            The subword ids of the word, without special tokens. Note that
+            this list is shared, it should not be modified.
+        """
+        if word in self.cache:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.add_words([word])
+        return self.cache[word]
+
+
+_word_token_caches = {}
+
+
+def get_word_token_cache(tokenizer: AutoTokenizer, num_special_tokens: int, has_unk: bool):
+    """
+    Returns the WordTokenCache for this tokenizer, so that the cache is shared
+    over all datasets (and the train/dev splits) that are read in one run.
+
+    Parameters
+    ----------
+    tokenizer: AutoTokenizer
+        The tokenizer to use (that should match the used MLM).
+    num_special_tokens: int
+        Number of special tokens of the tokenizer.
+    has_unk: bool
+        Does the tokenizer have an unk token
+
+    Returns
+    -------
+    word_cache: WordTokenCache
+        The (possibly already filled) cache.
+    """
+    key = (tokenizer.name_or_path, type(tokenizer).__name__, getattr(tokenizer, 'do_basic_tokenize', None),
+           getattr(tokenizer, 'do_lower_case', None), num_special_tokens, has_unk)
+    if key not in _word_token_caches:
+        _word_token_caches[key] = WordTokenCache(tokenizer, num_special_tokens, has_unk)
+    return _word_token_caches[key]
@@ -0,0 +1,103 @@
+"""
+Times the viterbi decoding of the CRF decoders during a dev evaluation,
+decoding sentence by sentence with viterbi_decode (as before) and the whole
+batch at once with viterbi_paths. The logits and masks are recorded while
+predicting on the dev file, both decodings are then timed on the same
+batches. Also checks that the predicted tags are identical.
+
+Usage (from the machamp directory):
+python3 scripts/misc/time_crf_viterbi.py logs/TEMPEVAL_MULTI_cv_fold_0/<date>/model.pt ../temporal-data/entity/my_converted_datasets/machamp-format/tempeval_multi_fold_0/dev.txt --dataset TEMPEVAL_MULTI
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+sys.path.insert(0, os.getcwd())
+from machamp.model.crf_label_decoder import MachampCRFDecoder
+from machamp.modules.allennlp import util
+from machamp.predictor.predict import predict_with_paths
+
+parser = argparse.ArgumentParser()
+parser.add_argument('torch_model', help='The path to the pytorch (*.pt) model')
+parser.add_argument('dev_file', help='The dev file to evaluate on')
+parser.add_argument('--dataset', default=None, help='Name of the dataset in the model')
+parser.add_argument('--batch_size', default=32, type=int)
+parser.add_argument('--top_k', default=5, type=int, help='k for timing the top-k decoding')
+parser.add_argument('--device', default='cpu')
+args = parser.parse_args()
+
+
+def record_batches(model):
+    """
+    Predicts on the dev file and returns the (crf_layer, logits, mask) of each
+    call to the viterbi decoding of a CRF decoder.
+    """
+    batches = []
+    for decoder in model.decoders.values():
+        if isinstance(decoder, MachampCRFDecoder):
+            crf_layer = decoder.crf_layer
+
+            def viterbi_paths(logits, mask=None, top_k=1, crf_layer=crf_layer, decode=crf_layer.viterbi_paths):
+                batches.append((crf_layer, logits.detach(), mask))
+                return decode(logits, mask, top_k)
+
+            crf_layer.viterbi_paths = viterbi_paths
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        predict_with_paths(model, args.dev_file, os.path.join(tmp_dir, 'dev.out'), args.dataset, args.batch_size,
+                           False, args.device)
+    for decoder in model.decoders.values():
+        if isinstance(decoder, MachampCRFDecoder):
+            del decoder.crf_layer.viterbi_paths
+    return batches
+
+
+def sentence_viterbi_tags(crf_layer, logits, mask, top_k):
+    """
+    The former viterbi_tags: each sentence is decoded separately.
+    """
+    num_tags = logits.shape[2]
+    transitions = crf_layer.viterbi_transitions()
+    best_paths = []
+    tag_sequence = torch.empty(logits.shape[1] + 2, num_tags + 2, device=logits.device)
+    for prediction, prediction_mask in zip(logits, mask):
+        masked_prediction = prediction[prediction_mask.bool()]
+        sequence_length = masked_prediction.shape[0]
+        tag_sequence.fill_(-10000.0)
+        tag_sequence[0, num_tags] = 0.0
+        tag_sequence[1: (sequence_length + 1), :num_tags] = masked_prediction
+        tag_sequence[sequence_length + 1, num_tags + 1] = 0.0
+        viterbi_paths, viterbi_scores = util.viterbi_decode(tag_sequence=tag_sequence[: (sequence_length + 2)],
+                                                            transition_matrix=transitions, top_k=top_k)
+        best_paths.append([(path[1:-1], score.item()) for path, score in zip(viterbi_paths, viterbi_scores)])
+    return best_paths
+
+
+def time_decoding(batches, decode, top_k):
+    start_time = time.time()
+    with torch.no_grad():
+        results = [decode(crf_layer, logits, mask, top_k) for crf_layer, logits, mask in batches]
+    return time.time() - start_time, results
+
+
+model = torch.load(args.torch_model, map_location=args.device)
+model.device = args.device
+batches = record_batches(model)
+if batches == []:
+    print('the model has no CRF decoders')
+    exit(1)
+print('batches: {:,}, sentences: {:,}'.format(len(batches), sum(len(logits) for _, logits, _ in batches)))
+
+for top_k in [1, args.top_k]:
+    before, paths_before = time_decoding(batches, sentence_viterbi_tags, top_k)
+    after, paths_after = time_decoding(
+        batches, lambda crf_layer, logits, mask, k: crf_layer.viterbi_tags(logits, mask, top_k=k), top_k)
+    identical = [[[path for path, _ in sent] for sent in batch] for batch in paths_before] == \
+                [[[path for path, _ in sent] for sent in batch] for batch in paths_after]
+    print('top-{}:'.format(top_k))
+    print('  per sentence viterbi: {:.2f}s'.format(before))
+    print('  batched viterbi:      {:.2f}s ({:.1f}x)'.format(after, before / after))
+    print('  identical paths: ' + str(identical))
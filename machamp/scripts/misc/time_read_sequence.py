@@ -0,0 +1,57 @@
+"""
+Times reading the cross-validation folds of a dataset with read_sequence,
+tokenizing every gold token separately (as before) and with the shared
+word cache. Also checks that the token ids and offsets are identical.
+
+Usage (from the machamp directory):
+python3 scripts/misc/time_read_sequence.py configs/crossvalidation_configs_multi/TEMPEVAL_MULTI_cv_fold_*.json --transformer_model xlm-roberta-base
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+from transformers import AutoTokenizer
+
+sys.path.insert(0, os.getcwd())
+from machamp.data.machamp_vocabulary import MachampVocabulary
+from machamp.readers.read_sequence import read_sequence
+from machamp.utils import myutils
+from machamp.utils import tok_utils
+
+parser = argparse.ArgumentParser()
+parser.add_argument('dataset_configs', nargs='+', help='Dataset configuration files, e.g. of all folds')
+parser.add_argument('--transformer_model', default='xlm-roberta-base')
+args = parser.parse_args()
+
+
+def read_all(use_word_cache: bool):
+    tokenizer = AutoTokenizer.from_pretrained(args.transformer_model, use_fast=False)
+    vocabulary = MachampVocabulary()
+    data = []
+    start_time = time.time()
+    for config_path in args.dataset_configs:
+        dataset_configs = myutils.load_json(config_path)
+        for dataset in dataset_configs:
+            config = dataset_configs[dataset]
+            for path_key, is_train in [('train_data_path', True), ('dev_data_path', False)]:
+                if path_key in config:
+                    data.extend(read_sequence(dataset, config, tokenizer, vocabulary, config[path_key], is_train, -1,
+                                              -1, 512, use_word_cache=use_word_cache))
+    return time.time() - start_time, data
+
+
+before, data_before = read_all(False)
+after, data_after = read_all(True)
+
+identical = len(data_before) == len(data_after) and all(
+    torch.equal(inst1.token_ids, inst2.token_ids) and torch.equal(inst1.offsets, inst2.offsets)
+    for inst1, inst2 in zip(data_before, data_after))
+print('instances: {:,}'.format(len(data_before)))
+print('per token tokenization: {:.2f}s'.format(before))
+print('word cache:             {:.2f}s ({:.1f}x)'.format(after, before / after))
+for word_cache in tok_utils._word_token_caches.values():
+    print('cache: {:,} words, {:,} hits, {:,} misses'.format(
+        len(word_cache.cache), word_cache.hits, word_cache.misses))
+print('identical token ids and offsets: ' + str(identical))
@@ -0,0 +1,92 @@
+"""
+Profiles converting the subword level LM output to the word level, with
+the former loop over the sentences of a batch and with the batched
+myutils.pool_subwords (first, last and mean pooling). Random LM output and
+offsets are used, with the shapes of a batch given on the command line.
+Also checks that the last subword pooling is identical to the loop.
+
+Usage (from the machamp directory):
+python3 scripts/misc/time_subword_pooling.py --layers 13 --batch_size 32 --subwords 128 --device cuda:0
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.getcwd())
+from machamp.utils import myutils
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--layers', default=13, type=int, help='Number of layers of the LM output')
+parser.add_argument('--batch_size', default=32, type=int)
+parser.add_argument('--subwords', default=128, type=int, help='Number of subwords (without special tokens)')
+parser.add_argument('--emb_size', default=768, type=int)
+parser.add_argument('--device', default='cpu')
+parser.add_argument('--repeat', default=20, type=int)
+args = parser.parse_args()
+
+
+def random_offsets():
+    """
+    Offsets of the last subword of each word, 1-3 subwords per word, padded with -1.
+    """
+    offsets = []
+    for _ in range(args.batch_size):
+        length = random.randint(args.subwords // 2, args.subwords)
+        sent_offsets = []
+        offset = -1
+        while offset + 1 < length:
+            offset = min(offset + random.randint(1, 3), length - 1)
+            sent_offsets.append(offset)
+        offsets.append(sent_offsets)
+    num_words = max(len(sent_offsets) for sent_offsets in offsets)
+    return torch.tensor([sent_offsets + [-1] * (num_words - len(sent_offsets)) for sent_offsets in offsets],
+                        device=args.device)
+
+
+def loop_last(mlm_out, offsets):
+    """
+    The former implementation in MachampModel.forward
+    """
+    mlm_out_nospecials = mlm_out[:, :, 1:-1, :]
+    mlm_out_token = torch.zeros((len(mlm_out), len(offsets), len(offsets[0]), mlm_out.shape[-1]), device=args.device)
+    for sentIdx in range(len(offsets)):
+        mlm_out_token[:, sentIdx] = mlm_out_nospecials[:, sentIdx, offsets[sentIdx]]
+    return mlm_out_token
+
+
+def synchronize():
+    if args.device.startswith('cuda'):
+        torch.cuda.synchronize()
+
+
+def time_pooling(name, function):
+    function()
+    synchronize()
+    start_time = time.time()
+    for _ in range(args.repeat):
+        function()
+    synchronize()
+    per_batch = (time.time() - start_time) / args.repeat
+    with torch.autograd.profiler.profile() as profile:
+        function()
+    print('{}: {:.2f}ms per batch, {} operations'.format(name, per_batch * 1000, len(profile.function_events)))
+    return per_batch
+
+
+mlm_out = torch.randn(args.layers, args.batch_size, args.subwords + 2, args.emb_size, device=args.device)
+offsets = random_offsets()
+print('batch: {} layers, {} sentences, {} subwords, {} words'.format(args.layers, args.batch_size, args.subwords,
+                                                                    offsets.shape[1]))
+
+with torch.no_grad():
+    identical = torch.equal(loop_last(mlm_out, offsets), myutils.pool_subwords(mlm_out, offsets, 'last', 1, -1))
+    before = time_pooling('loop (last)', lambda: loop_last(mlm_out, offsets))
+    for pooling in myutils.SUBWORD_POOLINGS:
+        after = time_pooling('pool_subwords (' + pooling + ')',
+                             lambda: myutils.pool_subwords(mlm_out, offsets, pooling, 1, -1))
+        print('  {:.1f}x'.format(before / after))
+print('identical last subword pooling: ' + str(identical))
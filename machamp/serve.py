@@ -0,0 +1,52 @@
+import argparse
+import logging
+import sys
+
+import torch
+
+from machamp.predictor.server import MachampPredictionServer, serve
+
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                    level=logging.INFO, handlers=[logging.StreamHandler(sys.stdout)])
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("torch_model", type=str, help="The path to the pytorch (*.pt) model.")
+parser.add_argument("--dataset", default=None, type=str,
+                    help="name of the dataset, needed to know the output format to use")
+parser.add_argument("--device", default=None, type=int, help="CUDA device number; set to -1 for CPU.")
+parser.add_argument("--host", default='127.0.0.1', type=str, help="The host to listen on.")
+parser.add_argument("--port", default=8000, type=int, help="The port to listen on.")
+parser.add_argument("--socket", default=None, type=str, help="Listen on this unix socket instead of on host:port.")
+parser.add_argument("--batch_size", default=32, type=int, help="The maximum number of sentences in one batch.")
+parser.add_argument("--max_words", default=1024, type=int, help="The maximum number of subwords in one batch.")
+parser.add_argument("--max_wait_ms", default=5.0, type=float,
+                    help="How long to wait for concurrent requests before a batch is run.")
+parser.add_argument("--topn", default=None, type=int, help='Output the top-n labels and their probability.')
+parser.add_argument("--conn", default='=', type=str, help="With --topn, string inserted between each label and its probability.")
+parser.add_argument("--sep", default='|', type=str, help="With --topn, string inserted between label-probability pairs.")
+parser.add_argument("--threshold", default=None, type=float, help="The threshold to be used for multiseq and multiclas, note that the same metric will be applied to all tasks.")
+args = parser.parse_args()
+
+logger.info('cmd: ' + ' '.join(sys.argv) + '\n')
+
+if args.device == None:
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+elif args.device == -1:
+    device = 'cpu'
+else:
+    device = 'cuda:' + str(args.device)
+
+logger.info('loading model...')
+model = torch.load(args.torch_model, map_location=device)
+model.device = device
+
+if args.topn != None:
+    for decoder in model.decoders:
+        model.decoders[decoder].topn = args.topn
+if args.threshold != None:
+    model.set_multi_threshold(args.threshold)
+
+predictor = MachampPredictionServer(model, args.dataset, device, args.batch_size, args.max_words, args.max_wait_ms,
+                                    args.conn, args.sep)
+serve(predictor, args.host, args.port, args.socket)
@@ -0,0 +1,65 @@
+import unittest
+
+from torch.utils.data import DataLoader
+
+# myutils is imported first, like in train.py, the readers import it while the datasets are imported
+from machamp.utils import myutils
+from machamp.data.machamp_dataset import MachampDataset
+from machamp.data.machamp_dataset_collection import MachampDatasetCollection
+from machamp.data.machamp_sampler import MachampBatchSampler
+
+
+def collate_instances(batch):
+    return batch
+
+
+def toy_mlm_collection(num_instances: int, num_epochs: int):
+    """
+    A collection with one MLM dataset, the instances are lists that hold
+    their own index, so that the MLM part of an epoch can be checked.
+    """
+    dataset_config = {'tasks': {'mlm': {'task_type': 'mlm'}}}
+    # is_train=False without a dev_data_path does not read any data
+    dataset = MachampDataset('toy', dataset_config, None, is_train=False, num_epochs=num_epochs)
+    dataset.is_mlm = True
+    dataset.data = [[index] for index in range(num_instances)]
+    collection = MachampDatasetCollection.__new__(MachampDatasetCollection)
+    collection.datasets = {'toy': dataset}
+    return collection
+
+
+class TestMachampBatchSampler(unittest.TestCase):
+    num_instances = 12
+    num_epochs = 3
+
+    def mlm_parts_per_epoch(self, num_workers: int):
+        collection = toy_mlm_collection(self.num_instances, self.num_epochs)
+        sampler = MachampBatchSampler(collection, 2, 1024, True, 1.0, False, False, True)
+        dataloader = DataLoader(collection, batch_sampler=sampler, collate_fn=collate_instances,
+                                num_workers=num_workers)
+        parts = []
+        for epoch in range(self.num_epochs):
+            sampler.start_epoch()
+            parts.append(sorted(instance[0] for batch in dataloader for instance in batch))
+        return parts
+
+    def expected_parts(self):
+        part_size = self.num_instances // self.num_epochs
+        return [list(range(epoch * part_size, (epoch + 1) * part_size)) for epoch in range(self.num_epochs)]
+
+    def test_mlm_part_per_epoch(self):
+        self.assertEqual(self.mlm_parts_per_epoch(0), self.expected_parts())
+
+    def test_mlm_part_per_epoch_with_workers(self):
+        self.assertEqual(self.mlm_parts_per_epoch(2), self.expected_parts())
+
+    def test_mlm_part_per_epoch_without_start_epoch(self):
+        # Without workers, iterating the sampler still starts the epoch
+        collection = toy_mlm_collection(self.num_instances, self.num_epochs)
+        sampler = MachampBatchSampler(collection, 2, 1024, True, 1.0, False, False, True)
+        parts = [sorted(collection[index][0] for batch in sampler for index in batch) for _ in range(self.num_epochs)]
+        self.assertEqual(parts, self.expected_parts())
+
+
+if __name__ == '__main__':
+    unittest.main()
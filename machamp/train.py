@@ -23,6 +23,9 @@ parser.add_argument("--retrain", type=str, default='',
                     help="Retrain on an previously train MaChAmp model. Specify the path to model.tar.gz and add a "
                          "dataset_config that specifies the new training.")
 parser.add_argument("--seed", type=int, default=8446, help="seed to use for training.")
+parser.add_argument("--dataset_cache", type=str, default=None,
+                    help="Directory to cache the tokenized datasets in, later runs on the same data (e.g. other "
+                         "encoders or seeds) read them from there.")
 args = parser.parse_args()
 
 if args.resume == '' and (args.dataset_configs == None or len(args.dataset_configs) == 0):
@@ -47,10 +50,12 @@ cmd = ' '.join(sys.argv)
 
 if args.sequential:
     prevDir = trainer.train(name + '.0', args.parameters_config, [args.dataset_configs[0]], device, args.resume, args.retrain,
-                            args.seed, cmd)
+                            args.seed, cmd, args.dataset_cache)
     for datasetIdx, dataset in enumerate(args.dataset_configs[1:]):
         modelName = name + '.' + str(datasetIdx + 1)
-        prevDir = trainer.train(modelName, args.parameters_config, [dataset], device, None, prevDir, args.seed, cmd)
+        prevDir = trainer.train(modelName, args.parameters_config, [dataset], device, None, prevDir, args.seed, cmd,
+                                args.dataset_cache)
 
 else:
-    trainer.train(name, args.parameters_config, args.dataset_configs, device, args.resume, args.retrain, args.seed, cmd)
+    trainer.train(name, args.parameters_config, args.dataset_configs, device, args.resume, args.retrain, args.seed, cmd,
+                  args.dataset_cache)
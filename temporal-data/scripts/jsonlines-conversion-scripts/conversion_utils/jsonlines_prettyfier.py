@@ -5,7 +5,10 @@ class JSONLinesPrettifier:
     """
     Converts a jsonlines file to a file with pretty formatting.
     """
-    def __init__(self, input_jsonlines_filepaths: List[str] = list(), output_filepaths: List[str] = list()):
+    def __init__(self, input_jsonlines_filepaths: List[str] = None, output_filepaths: List[str] = None):
+        #New lists for each instance, otherwise all the prettifiers of a process share the filepaths and convert them again
+        input_jsonlines_filepaths = list() if input_jsonlines_filepaths is None else input_jsonlines_filepaths
+        output_filepaths = list() if output_filepaths is None else output_filepaths
         if len(input_jsonlines_filepaths) != len(output_filepaths):
             raise Exception("The number of input files must be equal to the number of output files.")
         self.input_jsonlines_filepaths = input_jsonlines_filepaths
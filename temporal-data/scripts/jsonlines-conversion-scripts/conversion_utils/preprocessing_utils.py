@@ -2,6 +2,7 @@ from typing import List, Tuple
 import math
 import nltk
 from nltk.tokenize import word_tokenize
+from .tokenization_cache import TOKENIZATION_CACHE
 
 class DatasetNltkTokenizer:
     """
@@ -11,6 +12,18 @@ class DatasetNltkTokenizer:
         self.sent_tokenizer = nltk.data.load("tokenizers/punkt/english.pickle")
 
     def tokenize(self, text) -> List[str]:
+        """
+        Tokenizes given text into a list of individual tokens. Texts that were tokenized before are taken from the tokenization cache.
+
+        Args:
+            text (str): The input sentence to be tokenized.
+
+        Returns:
+            list: A list of tokens extracted from the sentence.
+        """
+        return TOKENIZATION_CACHE.tokenize(text, self.tokenize_uncached, "DatasetNltkTokenizer")
+
+    def tokenize_uncached(self, text) -> List[str]:
         """
         Tokenizes given text into a list of individual tokens.
 
@@ -48,6 +61,31 @@ def initiate_tokenizers() -> Tuple[DatasetNltkTokenizer, nltk.data.load]:
     return word_tokenizer, sentence_tokenizer
 
 
+def relabel_entities(json_list: List[dict], classes_dictionary: dict) -> List[dict]:
+    """
+    Maps the entity types of a converted dataset to other classes, e.g. the multi-class dataset to the single-class one.
+    The text and tokens are shared with the input list, only the entities are copied.
+
+    Args:
+        json_list: The dataset in json format.
+        classes_dictionary: Maps the current entity types to the new ones. Types that are not in the dictionary are kept.
+
+    Returns:
+        A new list of dictionaries with the relabeled entities.
+
+    Example:
+        relabel_entities([{"text": "...", "tokens": [...], "entity": [{"text": "today", "type": "date", ...}]}], {"date": "tempexp"})
+        => [{"text": "...", "tokens": [...], "entity": [{"text": "today", "type": "tempexp", ...}]}]
+    """
+    relabeled_json_list = list()
+    for json_element in json_list:
+        relabeled_entities = list()
+        for entity in json_element["entity"]:
+            relabeled_entities += [{**entity, "type": classes_dictionary.get(entity["type"], entity["type"])}]
+        relabeled_json_list += [{**json_element, "entity": relabeled_entities}]
+    return relabeled_json_list
+
+
 def slice_list(input_list:List, *slicers:float, debug:bool=False) -> List[List]:
     """
     Slice a list based on the provided slicers. The sum of all slicers should be 1.
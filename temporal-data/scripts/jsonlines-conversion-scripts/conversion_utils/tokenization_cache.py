@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+import nltk
+try:
+    import fcntl
+except ImportError: #Not available on Windows, the cache file is saved without a lock there
+    fcntl = None
+
+class TokenizationCache:
+    """
+    Memoizes tokenizations by the hash of the tokenizer name and the text.
+    The tokenizations are kept in memory and can be stored in a cache file, so that converting the datasets again
+    skips the tokenization of the texts that have already been tokenized. Cache files of another nltk version are ignored.
+    """
+    def __init__(self, cache_filepath: str = None) -> None:
+        self.cache_filepath = None #Where the cache is stored, None if it is only kept in memory
+        self.tokenizations: Dict[str, List[str]] = dict() #Hash of the tokenizer name and the text => tokens
+        self.new_tokenizations: Dict[str, List[str]] = dict() #Tokenizations that are not in the cache file yet
+
+        #Statistics
+        self.hits = 0
+        self.misses = 0
+
+        if cache_filepath is not None:
+            self.use_cache_file(cache_filepath)
+
+    def tokenize(self, text: str, tokenize_function: Callable[[str], List[str]], tokenizer_name: str) -> List[str]:
+        """
+        Tokenizes the text with the tokenize function, unless the tokenizer already tokenized the same text before.
+
+        Args:
+            text: The text to be tokenized.
+            tokenize_function: The tokenizer, it is called on a cache miss.
+            tokenizer_name: Distinguishes the tokenizations of different tokenizers of the same text.
+
+        Returns:
+            A new list with the tokens of the text.
+        """
+        key = hashlib.sha1((tokenizer_name + "\0" + text).encode("utf-8")).hexdigest()
+        tokens = self.tokenizations.get(key)
+        if tokens is None:
+            self.misses += 1
+            tokens = list(tokenize_function(text))
+            self.tokenizations[key] = tokens
+            self.new_tokenizations[key] = tokens
+        else:
+            self.hits += 1
+        return list(tokens)
+
+    def use_cache_file(self, cache_filepath: str) -> None:
+        """
+        Stores the cache in the file and loads the tokenizations that are already in it.
+
+        Args:
+            cache_filepath: Path to the cache file, it is created on the first save.
+        """
+        self.cache_filepath = cache_filepath
+        self.tokenizations.update(self.load_cache_file(cache_filepath))
+
+    def load_cache_file(self, cache_filepath: str) -> Dict[str, List[str]]:
+        """
+        Loads the tokenizations of a cache file.
+
+        Args:
+            cache_filepath: Path to the cache file.
+
+        Returns:
+            The tokenizations, empty if the file does not exist or was created with another nltk version.
+        """
+        if not os.path.isfile(cache_filepath):
+            return dict()
+        with open(cache_filepath, "r", encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+        if cache["nltk_version"] != nltk.__version__:
+            print(f"Ignoring the tokenization cache \"{cache_filepath}\" of nltk {cache['nltk_version']}.")
+            return dict()
+        return cache["tokenizations"]
+
+    def save(self) -> None:
+        """
+        Adds the new tokenizations to the cache file. Loading, merging and replacing the file happens under a file lock,
+        so tokenizations that other processes save at the same time are kept.
+        """
+        if self.cache_filepath is None or len(self.new_tokenizations) == 0:
+            return
+        cache_dirname = os.path.dirname(os.path.abspath(self.cache_filepath))
+        os.makedirs(cache_dirname, exist_ok=True)
+        with locked_file(f"{self.cache_filepath}.lock"):
+            tokenizations = self.load_cache_file(self.cache_filepath)
+            tokenizations.update(self.new_tokenizations)
+
+            temporary_filepath = f"{self.cache_filepath}.{os.getpid()}.tmp"
+            with open(temporary_filepath, "w", encoding="utf-8") as cache_file:
+                json.dump({"nltk_version": nltk.__version__, "tokenizations": tokenizations}, cache_file, ensure_ascii=False)
+            os.replace(temporary_filepath, self.cache_filepath) #Processes that load the cache never read a partially written file
+        self.new_tokenizations = dict()
+
+    def statistics(self) -> str:
+        """
+        Returns the hit rate of the cache.
+        """
+        return format_cache_statistics(self.hits, self.misses)
+
+
+@contextmanager
+def locked_file(lock_filepath: str):
+    """
+    Holds an exclusive lock on the lock file, other processes that want the lock wait until it is released.
+
+    Args:
+        lock_filepath: Path to the lock file, it is created if it does not exist.
+    """
+    with open(lock_filepath, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def format_cache_statistics(hits: int, misses: int) -> str:
+    """
+    Formats the hits and misses of a tokenization cache.
+
+    Example:
+        format_cache_statistics(3, 1) => "3 hits, 1 misses (75.0% hit rate)"
+    """
+    lookups = hits + misses
+    hit_rate = 100.0 * hits / lookups if lookups > 0 else 0.0
+    return f"{hits} hits, {misses} misses ({hit_rate:.1f}% hit rate)"
+
+
+#Shared by all the tokenizers of a process
+TOKENIZATION_CACHE = TokenizationCache()
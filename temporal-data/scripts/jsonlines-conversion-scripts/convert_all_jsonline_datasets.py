@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Converts all the original datasets to the jsonlines format, both the multi-class and the single-class version.
+
+Each original dataset is read and tokenized only once: the converter creates the multi-class json structure
+and the single-class version is derived from it by relabeling the entities. The datasets are converted in
+parallel worker processes, each of them loads the tokenizers once. The union datasets TempEval-3 and Fullpate
+are created afterwards from the previously converted subsets, like with the single converter scripts.
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+from conversion_utils.preprocessing_utils import initiate_tokenizers, relabel_entities
+from conversion_utils.tokenization_cache import TOKENIZATION_CACHE, format_cache_statistics
+from converter_aquaint import AquaintDatasetConverter
+from converter_fullpate import FullPateDatasetConverter
+from converter_pate import PateDatasetConverter
+from converter_snips import SnipsDatasetConverter
+from converter_tempeval import TempevalDatasetConverter
+from converter_timebank import TimebankDatasetConverter
+from converter_tweets import TweetsDatasetConverter
+WikiwarsTaggedDatasetConverter = importlib.import_module("converter_wikiwars-tagged").WikiwarsTaggedDatasetConverter #Module name is not a valid identifier
+
+"""Datasets."""
+#Datasets that are converted from the original datasets
+ORIGINAL_DATASET_NAMES = ["pate", "snips", "wikiwars-tagged", "aquaint", "timebank", "tweets"]
+
+#Datasets that are created from the previously converted ones
+UNION_DATASET_NAMES = ["tempeval", "fullpate"]
+
+#Output directory suffix of each dataset version
+DATASET_VARIANTS = ["multi", "single"]
+
+#Maps the four timex3 classes of the multi-class datasets to the single class
+SINGLE_CLASSES_DICTIONARY = {
+    "date": "tempexp",
+    "time": "tempexp",
+    "duration": "tempexp",
+    "set": "tempexp"
+}
+
+
+def list_tml_files(directory_path: str) -> List[str]:
+    """
+    Lists the tml files of a directory.
+
+    Args:
+        directory_path: Path to the directory with the tml files.
+
+    Returns:
+        The sorted list of filepaths of the tml files.
+    """
+    tml_filepaths = [os.path.join(directory_path, f) for f in os.listdir(directory_path) if os.path.isfile(os.path.join(directory_path, f)) and f.endswith(".tml")]
+    tml_filepaths.sort()
+    return tml_filepaths
+
+
+def get_output_directory(args: argparse.Namespace, dataset_name: str, variant: str) -> str:
+    return os.path.join(args.output_directory, f"{dataset_name}_{variant}")
+
+
+def create_original_dataset_converter(dataset_name: str, args: argparse.Namespace):
+    """
+    Creates the converter of an original dataset. The converter creates the multi-class version of the dataset.
+
+    Args:
+        dataset_name: Name of the original dataset, one of ORIGINAL_DATASET_NAMES.
+        args: The command line arguments.
+
+    Returns:
+        The converter of the dataset.
+    """
+    converter_arguments = {
+        "output_directory_path": get_output_directory(args, dataset_name, "multi"),
+        "single_entity_class": False,
+        "crossvalidation_enabled": args.crossvalidation,
+        "folds": args.folds
+    }
+    if dataset_name == "pate":
+        return PateDatasetConverter(
+            input_filepaths=[os.path.join(args.input_directory, "pate_and_snips", "pate.json")],
+            **converter_arguments
+        )
+    elif dataset_name == "snips":
+        return SnipsDatasetConverter(
+            input_filepaths=[os.path.join(args.input_directory, "pate_and_snips", "snips_train.json"), os.path.join(args.input_directory, "pate_and_snips", "snips_valid.json")],
+            only_temporal_entities=args.only_temporal,
+            **converter_arguments
+        )
+    elif dataset_name == "wikiwars-tagged":
+        return WikiwarsTaggedDatasetConverter(
+            input_filepaths=list_tml_files(os.path.join(args.input_directory, "wikiwars-tagged")),
+            **converter_arguments
+        )
+    elif dataset_name == "aquaint":
+        return AquaintDatasetConverter(
+            input_filepaths=list_tml_files(os.path.join(args.input_directory, "aquaint")),
+            **converter_arguments
+        )
+    elif dataset_name == "timebank":
+        return TimebankDatasetConverter(
+            input_filepaths_extra=list_tml_files(os.path.join(args.input_directory, "timebank", "data", "extra")),
+            input_filepaths_timeml=list_tml_files(os.path.join(args.input_directory, "timebank", "data", "timeml")),
+            **converter_arguments
+        )
+    elif dataset_name == "tweets":
+        tweets_filepaths = list_tml_files(os.path.join(args.input_directory, "tweets", "trainingset")) + list_tml_files(os.path.join(args.input_directory, "tweets", "testset"))
+        tweets_filepaths.sort()
+        return TweetsDatasetConverter(
+            input_filepaths=tweets_filepaths,
+            **converter_arguments
+        )
+    else:
+        raise ValueError(f"Unknown original dataset '{dataset_name}'.")
+
+
+def create_union_dataset_converter(dataset_name: str, variant: str, args: argparse.Namespace):
+    """
+    Creates the converter of a union dataset. It reads the full datasets of the same variant that were converted before.
+
+    Args:
+        dataset_name: Name of the union dataset, one of UNION_DATASET_NAMES.
+        variant: Either "multi" or "single".
+        args: The command line arguments.
+
+    Returns:
+        The converter of the dataset.
+    """
+    converter_arguments = {
+        "output_directory_path": get_output_directory(args, dataset_name, variant),
+        "single_entity_class": variant == "single",
+        "crossvalidation_enabled": args.crossvalidation,
+        "folds": args.folds
+    }
+    if dataset_name == "tempeval":
+        return TempevalDatasetConverter(
+            input_filepaths=[
+                os.path.join(get_output_directory(args, "timebank", variant), "timebank-full.jsonlines"),
+                os.path.join(get_output_directory(args, "aquaint", variant), "aquaint-full.jsonlines")
+            ],
+            **converter_arguments
+        )
+    elif dataset_name == "fullpate":
+        return FullPateDatasetConverter(
+            input_filepaths=[
+                os.path.abspath(os.path.join(get_output_directory(args, "snips", variant), "snips-full.jsonlines")),
+                os.path.abspath(os.path.join(get_output_directory(args, "pate", variant), "pate-full.jsonlines"))
+            ],
+            only_temporal_entities=args.only_temporal,
+            **converter_arguments
+        )
+    else:
+        raise ValueError(f"Unknown union dataset '{dataset_name}'.")
+
+
+def convert_original_dataset(dataset_name: str, args: argparse.Namespace) -> Tuple[str, float, int, int]:
+    """
+    Converts an original dataset once and saves its multi-class and single-class versions.
+
+    Args:
+        dataset_name: Name of the original dataset, one of ORIGINAL_DATASET_NAMES.
+        args: The command line arguments.
+
+    Returns:
+        The dataset name, the conversion time in seconds and the hits and misses of the tokenization cache.
+    """
+    start_time = time.time()
+    hits, misses = TOKENIZATION_CACHE.hits, TOKENIZATION_CACHE.misses
+    if args.seed is not None:
+        random.seed(args.seed)
+    converter = create_original_dataset_converter(dataset_name, args)
+    json_list = converter.create_dataset()
+    for variant in DATASET_VARIANTS:
+        variant_json_list = json_list if variant == "multi" else relabel_entities(json_list, SINGLE_CLASSES_DICTIONARY)
+        converter.save_json_list(variant_json_list, get_output_directory(args, dataset_name, variant))
+    TOKENIZATION_CACHE.save()
+    return dataset_name, time.time() - start_time, TOKENIZATION_CACHE.hits - hits, TOKENIZATION_CACHE.misses - misses
+
+
+def convert_union_dataset(dataset_name_and_variant: Tuple[str, str], args: argparse.Namespace) -> Tuple[str, float, int, int]:
+    """
+    Converts a version of a union dataset.
+
+    Args:
+        dataset_name_and_variant: Name of the union dataset and the variant, either "multi" or "single".
+        args: The command line arguments.
+
+    Returns:
+        The name of the converted dataset, the conversion time in seconds and the hits and misses of the tokenization cache.
+    """
+    start_time = time.time()
+    hits, misses = TOKENIZATION_CACHE.hits, TOKENIZATION_CACHE.misses
+    dataset_name, variant = dataset_name_and_variant
+    if args.seed is not None:
+        random.seed(args.seed)
+    converter = create_union_dataset_converter(dataset_name, variant, args)
+    converter.convert_dataset()
+    TOKENIZATION_CACHE.save()
+    return f"{dataset_name}_{variant}", time.time() - start_time, TOKENIZATION_CACHE.hits - hits, TOKENIZATION_CACHE.misses - misses
+
+
+def initiate_worker(tokenization_cache_filepath: str = None) -> None:
+    """
+    Loads the tokenizers once per worker process. nltk caches the loaded Punkt model, all converters created in the process reuse it.
+
+    Args:
+        tokenization_cache_filepath: Cache file of the tokenizations, None to keep them only in memory.
+    """
+    initiate_tokenizers()
+    if tokenization_cache_filepath is not None:
+        TOKENIZATION_CACHE.use_cache_file(tokenization_cache_filepath)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input_directory",
+        "-i",
+        type = str,
+        default = "../../original_datasets",
+        help = "The directory that contains the original datasets."
+    )
+
+    parser.add_argument(
+        "--output_directory",
+        "-o",
+        type = str,
+        default = "../../entity/my_converted_datasets/jsonlines",
+        help = "The parent directory for the newly converted datasets. Each dataset version is saved in a '<dataset>_<multi|single>' subdirectory."
+    )
+
+    parser.add_argument(
+        "--crossvalidation",
+        "-c",
+        action = "store_true",
+        help = "Wether to generate crossvalidation folds or not."
+    )
+
+    parser.add_argument(
+        "--folds",
+        "-f",
+        type = int,
+        default = 10,
+        help = "Number of crossvalidation folds."
+    )
+
+    parser.add_argument(
+        "--only_temporal",
+        "-ot",
+        action = "store_true",
+        help = "Wether the Snips and Fullpate datasets contain only temporal classes or not. The Snips dataset contains other entitiy classes than the four temporal timex3 classes."
+    )
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type = int,
+        default = 1,
+        help = "Number of worker processes that convert the datasets in parallel."
+    )
+
+    parser.add_argument(
+        "--seed",
+        type = int,
+        default = None,
+        help = "Random seed for shuffling the datasets. Each dataset is shuffled independently of the number of workers."
+    )
+
+    parser.add_argument(
+        "--tokenization_cache",
+        "-tc",
+        type = str,
+        default = None,
+        help = "Cache file of the tokenizations. If it is passed, converting the datasets again skips the tokenization of texts that were tokenized before."
+    )
+    args = parser.parse_args()
+
+
+    #Validate input
+    is_error: bool = False
+    if args.input_directory is None or not os.path.isdir(args.input_directory):
+        is_error = True
+
+    if args.output_directory is None:
+        is_error = True
+
+    if args.workers < 1:
+        is_error = True
+
+    if is_error:
+        print("Problem with input arguments.")
+        sys.exit()
+
+
+    print("Loading conversion script for all jsonlines datasets...")
+    print("Following arguments were passed:")
+    print(f"Original datasets directory:    {args.input_directory} => {type(args.input_directory)}")
+    print(f"Output directory:               {args.output_directory} => {type(args.output_directory)}")
+    print(f"Crossvalidation enabled:        {args.crossvalidation} => {type(args.crossvalidation)}")
+    print(f"Number of folds:                {args.folds} => {type(args.folds)}")
+    print(f"Temporal classes only:          {args.only_temporal} => {type(args.only_temporal)}")
+    print(f"Number of workers:              {args.workers} => {type(args.workers)}")
+    print(f"Random seed:                    {args.seed} => {type(args.seed)}")
+    print(f"Tokenization cache file:        {args.tokenization_cache} => {type(args.tokenization_cache)}")
+    print()
+
+    start_time = time.time()
+    union_datasets = [(dataset_name, variant) for dataset_name in UNION_DATASET_NAMES for variant in DATASET_VARIANTS]
+    timings = []
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=initiate_worker, initargs=(args.tokenization_cache,)) as executor:
+            timings += list(executor.map(convert_original_dataset, ORIGINAL_DATASET_NAMES, [args] * len(ORIGINAL_DATASET_NAMES)))
+            #The union datasets read the full datasets of the previous step
+            timings += list(executor.map(convert_union_dataset, union_datasets, [args] * len(union_datasets)))
+    else:
+        initiate_worker(args.tokenization_cache)
+        timings += [convert_original_dataset(dataset_name, args) for dataset_name in ORIGINAL_DATASET_NAMES]
+        timings += [convert_union_dataset(dataset_name_and_variant, args) for dataset_name_and_variant in union_datasets]
+
+    print()
+    for dataset_name, dataset_time, hits, misses in timings:
+        print(f"Converting {dataset_name} took {dataset_time:.2f}s, tokenization cache: {format_cache_statistics(hits, misses)}.")
+    print(f"Converting all datasets took {time.time() - start_time:.2f}s, tokenization cache: {format_cache_statistics(sum(x[2] for x in timings), sum(x[3] for x in timings))}.")
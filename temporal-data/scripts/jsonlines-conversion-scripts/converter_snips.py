@@ -99,14 +99,36 @@ class SnipsDatasetConverter:
 
         Prior to conversion the dataset is shuffled.
         """
-        json_list = self.create_json_list(self.dataset)
+        json_list = self.create_dataset()
         print(f"Loaded input dataset in memory and created json structure.\n")
-        
+        self.save_json_list(json_list, self.output_directory_path)
+
+    def create_dataset(self) -> List[dict]:
+        """
+        Converts the dataset into json format without writing it to the filesystem.
+
+        Returns:
+            A list of dictionaries. Each dictionary represents a dataset entry in json format.
+        """
+        return self.create_json_list(self.dataset)
+
+    def save_json_list(self, json_list: List[dict], output_directory_path: str) -> None:
+        """
+        Shuffles the converted dataset and writes it to the filesystem.
+        The dataset is saved in multiple copies:
+            (1) Full dataset
+            (2) Train dataset / Test dataset
+            (3) Train dataset / Test dataset for each crossvalidation fold
+
+        Args:
+            json_list: The dataset in json format.
+            output_directory_path: Where to save the converted dataset.
+        """
         random.shuffle(json_list)
 
         save_dataset_splits(
             json_list=json_list,
-            output_directory_path=self.output_directory_path,
+            output_directory_path=output_directory_path,
             train_percent=self.train_percent,
             test_percent=self.test_percent,
             val_percent=self.val_percent,
@@ -120,7 +142,7 @@ class SnipsDatasetConverter:
         if self.crossvalidation_enabled:
             generate_crossvalidation_folds(
                 json_list=json_list,
-                output_dirname=self.output_directory_path, 
+                output_dirname=output_directory_path, 
                 folds=self.folds,
                 output_file_train_suffix=self.output_file_train_suffix,
                 output_file_val_suffix=self.output_file_val_suffix,
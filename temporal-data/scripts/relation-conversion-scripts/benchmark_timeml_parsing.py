@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Per document benchmark of the TimeML tag extraction: the former extraction with one findall per
+tag name and one regex search per attribute against the single pass scan_timeml_tags.
+Also checks that both extract identical tag objects.
+
+Run from the relation-conversion-scripts directory:
+    python benchmark_timeml_parsing.py
+"""
+import argparse
+import os
+import re
+import time
+from typing import List
+
+from conversion_utils.tempeval_datastructures import (
+    TagEvent,
+    TagMakeinstance,
+    TagSignal,
+    TagTimex3,
+    TagTlink,
+    REGEX_ANY_XMLTAG,
+    REGEX_SINGLETON_MAKEINSTANCE,
+    REGEX_SINGLETON_TLINK,
+    REGEX_SPAN_EVENT,
+    REGEX_SPAN_SIGNAL,
+    REGEX_SPAN_TIMEX3,
+    scan_timeml_tags,
+)
+
+
+def former_read_attribute_value(attribute_name: str, text: str) -> str:
+    text_match = re.search(attribute_name + r'="[^"]+?"', text)
+    if text_match:
+        return text_match.group().split("=")[1].replace('"', "").upper().strip()
+    else:
+        return None
+
+
+def former_read_tag_content(tag: str) -> str:
+    return re.sub(REGEX_ANY_XMLTAG, "", tag).strip()
+
+
+def former_extract_tags(input_text: str) -> List[list]:
+    """
+    The former extract_makeinstance_objects, extract_tlink_objects, extract_event_objects,
+    extract_timex3_objects and extract_signal_objects.
+    """
+    makeinstance_tags = []
+    for tag in re.findall(REGEX_SINGLETON_MAKEINSTANCE, input_text, re.IGNORECASE):
+        makeinstance_tags += [TagMakeinstance(*[former_read_attribute_value(name, tag) for name in ["eventID", "eiid", "tense", "aspect", "polarity", "pos", "modality"]])]
+    tlink_tags = []
+    for tag in re.findall(REGEX_SINGLETON_TLINK, input_text, re.IGNORECASE):
+        tlink_tags += [TagTlink(*[former_read_attribute_value(name, tag) for name in ["lid", "relType", "eventInstanceID", "timeID", "relatedToTime", "relatedToEventInstance", "modality", "signalID"]])]
+    event_tags = []
+    for tag in re.findall(REGEX_SPAN_EVENT, input_text, re.IGNORECASE):
+        event_tags += [TagEvent(former_read_attribute_value("eid", tag), former_read_attribute_value("class", tag), former_read_tag_content(tag))]
+    timex3_tags = []
+    for tag in re.findall(REGEX_SPAN_TIMEX3, input_text, re.IGNORECASE):
+        timex3_tags += [TagTimex3(*[former_read_attribute_value(name, tag) for name in ["tid", "type", "value", "mod", "temporalFunction", "functionInDocument"]], former_read_tag_content(tag))]
+    signal_tags = []
+    for tag in re.findall(REGEX_SPAN_SIGNAL, input_text, re.IGNORECASE):
+        signal_tags += [TagSignal(former_read_attribute_value("sid", tag), former_read_tag_content(tag))]
+    return [makeinstance_tags, tlink_tags, event_tags, timex3_tags, signal_tags]
+
+
+def scanner_extract_tags(input_text: str) -> List[list]:
+    timeml_tags = scan_timeml_tags(input_text)
+    return [timeml_tags.makeinstance_tags, timeml_tags.tlink_tags, timeml_tags.event_tags, timeml_tags.timex3_tags, timeml_tags.signal_tags]
+
+
+def comparable(tag_lists: List[list]) -> List[list]:
+    return [[vars(tag) for tag in tag_list] for tag_list in tag_lists]
+
+
+def time_document(extract_tags, input_text: str, repeat: int) -> tuple:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tag_lists = extract_tags(input_text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tag_lists
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_filepath_timebank_timeml", "-itt", type = str, default = "../../original_datasets/timebank/data/timeml")
+    parser.add_argument("--input_filepath_timebank_extra", "-ite", type = str, default = "../../original_datasets/timebank/data/extra")
+    parser.add_argument("--input_filepath_aquaint", "-ia", type = str, default = "../../original_datasets/aquaint")
+    parser.add_argument("--repeat", type = int, default = 5, help = "Number of runs per document, the fastest one is used.")
+    args = parser.parse_args()
+
+    tml_filepaths = []
+    for directory_path in [args.input_filepath_timebank_timeml, args.input_filepath_timebank_extra, args.input_filepath_aquaint]:
+        tml_filepaths += sorted(os.path.join(directory_path, f) for f in os.listdir(directory_path) if f.endswith(".tml"))
+
+    former_times = []
+    scanner_times = []
+    identical = True
+    number_of_tags = 0
+    for tml_filepath in tml_filepaths:
+        with open(tml_filepath, "r", encoding="utf-8") as tml_file:
+            tml_full_file_contents = tml_file.read().strip()
+        former_time, former_tags = time_document(former_extract_tags, tml_full_file_contents, args.repeat)
+        scanner_time, scanner_tags = time_document(scanner_extract_tags, tml_full_file_contents, args.repeat)
+        former_times += [former_time]
+        scanner_times += [scanner_time]
+        identical = identical and comparable(former_tags) == comparable(scanner_tags)
+        number_of_tags += sum(len(tag_list) for tag_list in scanner_tags)
+
+    former_total = sum(former_times)
+    scanner_total = sum(scanner_times)
+    print(f"Documents: {len(tml_filepaths)}, tags: {number_of_tags}")
+    print(f"Identical tag objects: {identical}")
+    print(f"Former extraction: {former_total * 1000 / len(tml_filepaths):.2f} ms per document (max {max(former_times) * 1000:.2f} ms), {former_total:.2f}s in total")
+    print(f"scan_timeml_tags : {scanner_total * 1000 / len(tml_filepaths):.2f} ms per document (max {max(scanner_times) * 1000:.2f} ms), {scanner_total:.2f}s in total ({former_total / scanner_total:.2f}x)")
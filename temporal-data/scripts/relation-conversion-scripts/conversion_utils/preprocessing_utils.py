@@ -2,6 +2,7 @@ from typing import List, Tuple
 import math
 import nltk
 from nltk.tokenize import word_tokenize
+from .tokenization_cache import TOKENIZATION_CACHE
 
 class DatasetNltkTokenizer:
     """
@@ -11,6 +12,18 @@ class DatasetNltkTokenizer:
         self.sent_tokenizer = nltk.data.load("tokenizers/punkt/english.pickle")
 
     def tokenize(self, text) -> List[str]:
+        """
+        Tokenizes given text into a list of individual tokens. Texts that were tokenized before are taken from the tokenization cache.
+
+        Args:
+            text (str): The input sentence to be tokenized.
+
+        Returns:
+            list: A list of tokens extracted from the sentence.
+        """
+        return TOKENIZATION_CACHE.tokenize(text, self.tokenize_uncached, "DatasetNltkTokenizer")
+
+    def tokenize_uncached(self, text) -> List[str]:
         """
         Tokenizes given text into a list of individual tokens.
 
@@ -1,7 +1,7 @@
 import re
 import copy
 from collections import Counter
-from typing import List, Match, Any, Tuple
+from typing import List, Any, Tuple, Dict
 import nltk
 from .preprocessing_utils import DatasetNltkTokenizer, initiate_tokenizers
 import os
@@ -272,6 +272,47 @@ REGEX_XML_END_EVENT = r"</EVENT>"
 REGEX_ANY_XMLTAG = r"<[^>]+>"
 
 
+"""
+Precompiled patterns of the TimeML scanner and the text cleaning
+"""
+TIMEML_TAG_NAMES = ("MAKEINSTANCE", "TLINK", "EVENT", "TIMEX3", "SIGNAL")
+
+#Start of any TimeML tag, the group is the name of the tag
+REGEX_TIMEML_TAG_START = re.compile(r"<(" + "|".join(TIMEML_TAG_NAMES) + r")", re.IGNORECASE)
+
+#The same tags as the REGEX_SPAN_* and REGEX_SINGLETON_* patterns
+TIMEML_TAG_PATTERNS = {
+    "MAKEINSTANCE": re.compile(REGEX_SINGLETON_MAKEINSTANCE, re.IGNORECASE),
+    "TLINK": re.compile(REGEX_SINGLETON_TLINK, re.IGNORECASE),
+    "EVENT": re.compile(REGEX_SPAN_EVENT, re.IGNORECASE),
+    "TIMEX3": re.compile(REGEX_SPAN_TIMEX3, re.IGNORECASE),
+    "SIGNAL": re.compile(REGEX_SPAN_SIGNAL, re.IGNORECASE)
+}
+
+TIMEML_TAG_ATTRIBUTES = {
+    "MAKEINSTANCE": ("eventID", "eiid", "tense", "aspect", "polarity", "pos", "modality"),
+    "TLINK": ("lid", "relType", "eventInstanceID", "timeID", "relatedToTime", "relatedToEventInstance", "modality", "signalID"),
+    "EVENT": ("eid", "class"),
+    "TIMEX3": ("tid", "type", "value", "mod", "temporalFunction", "functionInDocument"),
+    "SIGNAL": ("sid",)
+}
+
+#name="value" for all attributes of a tag. No attribute name of a tag is the suffix of another one,
+#so a match never hides the first occurrence of another attribute.
+TIMEML_ATTRIBUTE_PATTERNS = {
+    tag_name: re.compile("(" + "|".join(attribute_names) + r')="([^"]+?)"')
+    for tag_name, attribute_names in TIMEML_TAG_ATTRIBUTES.items()
+}
+
+COMPILED_ANY_XMLTAG = re.compile(REGEX_ANY_XMLTAG)
+
+#Opening and closing tag of each of the TAGS_TO_DELETE, e.g. NG -> Opening: <NG[^>]*?>, Closing: </NG>
+REGEX_TAGS_TO_DELETE = [
+    (tag.upper(), re.compile(r"<" + tag + r"[^>]*?>", re.IGNORECASE), re.compile(r"</" + tag + r">", re.IGNORECASE))
+    for tag in TAGS_TO_DELETE
+]
+
+
 """
 Special tokens
 """
@@ -282,56 +323,93 @@ TIMEX3_SPECIAL_TOKEN_END = " ENDTIMEX3XML "
 
 
 
-def fetch_object(object: Match[str]) -> str:
+class TimeMLTags:
+    """
+    The TimeML tags of a text, each list in the order of the tags in the text.
+    """
+    def __init__(self) -> None:
+        self.makeinstance_tags: List[TagMakeinstance] = []
+        self.tlink_tags: List[TagTlink] = []
+        self.event_tags: List[TagEvent] = []
+        self.timex3_tags: List[TagTimex3] = []
+        self.signal_tags: List[TagSignal] = []
+
+
+def scan_timeml_tags(input_text: str, tag_names: Tuple[str, ...] = TIMEML_TAG_NAMES) -> TimeMLTags:
     """
-    Fetches the object from the regex match object.
+    Extracts the MAKEINSTANCE, TLINK, EVENT, TIMEX3 and SIGNAL tags in a single sweep over the text.
+    The start of every tag is found with one precompiled pattern, the tag itself is then matched
+    with the precompiled pattern of its name at that position. As with a findall per tag name,
+    the tags of the same name don't overlap, but tags of different names may (e.g. a SIGNAL inside an EVENT).
 
     Args:
-        object (Match[str]): regex match object.
+        input_text (str): The TimeML text, e.g. the full file contents or a sentence.
+        tag_names (Tuple[str, ...]): The names of the tags to extract.
 
     Returns:
-        str: Object or None if object wasn't found.
+        TimeMLTags: The extracted tag objects.
     """
-    if object:
-        return object.group().split("=")[1].replace('"', "").upper().strip()
-    else:
-        return None
-    
+    timeml_tags = TimeMLTags()
+    tag_ends = dict.fromkeys(tag_names, 0)
+    for tag_start in REGEX_TIMEML_TAG_START.finditer(input_text):
+        tag_name = tag_start.group(1).upper()
+        if tag_name not in tag_ends or tag_start.start() < tag_ends[tag_name]:
+            continue
+        tag_match = TIMEML_TAG_PATTERNS[tag_name].match(input_text, tag_start.start())
+        if tag_match is None:
+            continue
+        tag_ends[tag_name] = tag_match.end()
+        tag = tag_match.group()
+
+        if tag_name == "MAKEINSTANCE":
+            timeml_tags.makeinstance_tags += [_create_makeinstance_object(tag)]
+        elif tag_name == "TLINK":
+            timeml_tags.tlink_tags += [_create_tlink_object(tag)]
+        elif tag_name == "EVENT":
+            timeml_tags.event_tags += [_create_event_object(tag)]
+        elif tag_name == "TIMEX3":
+            timeml_tags.timex3_tags += [_create_timex3_object(tag)]
+        else:
+            timeml_tags.signal_tags += [_create_signal_object(tag)]
+    return timeml_tags
+
+
+def _read_attribute_values(tag_name: str, tag: str) -> List[str]:
+    """
+    Reads the attributes of a tag with one search over the tag for all of its attributes.
+    Like a search for name="value" per attribute, the first occurrence with a non-empty value is used.
+    Values are upper case, stripped and cut at the first "=".
+
+    Args:
+        tag_name (str): Name of the tag, one of TIMEML_TAG_NAMES.
+        tag (str): The full tag.
+
+    Returns:
+        List[str]: The values of the attributes in TIMEML_TAG_ATTRIBUTES, None for missing attributes.
+    """
+    #Reversed, so that the first occurrence of an attribute is kept
+    attributes = dict(reversed(TIMEML_ATTRIBUTE_PATTERNS[tag_name].findall(tag)))
+    return [
+        attributes[attribute_name].split("=")[0].upper().strip() if attribute_name in attributes else None
+        for attribute_name in TIMEML_TAG_ATTRIBUTES[tag_name]
+    ]
 
-def read_attribute_value(regex: str, text: str) -> str:
-    text_match = re.search(regex, text)
-    return fetch_object(text_match)
-    
 
 def extract_makeinstance_objects(input_text: str) -> List[TagMakeinstance]:
-    full_makeinstance_tags = re.findall(REGEX_SINGLETON_MAKEINSTANCE, input_text, re.IGNORECASE)
-    makeinstance_tags = []
-    for makeinstance_tag in full_makeinstance_tags:
-        makeinstance_tags += [_create_makeinstance_object(makeinstance_tag)]
-    return makeinstance_tags
+    return scan_timeml_tags(input_text, ("MAKEINSTANCE",)).makeinstance_tags
 
 
 def _create_makeinstance_object(text_makeinstance_tag: str) -> TagMakeinstance:
     """
     Example: <MAKEINSTANCE eventID="e48" eiid="ei414" tense="PRESENT" aspect="NONE" polarity="POS" pos="VERB" modality="can"/>
     """
-    event_id = read_attribute_value(r'eventID="[^"]+?"', text_makeinstance_tag)
-    eiid = read_attribute_value(r'eiid="[^"]+?"', text_makeinstance_tag)
-    tense = read_attribute_value(r'tense="[^"]+?"', text_makeinstance_tag)
-    aspect = read_attribute_value(r'aspect="[^"]+?"', text_makeinstance_tag)
-    polarity = read_attribute_value(r'polarity="[^"]+?"', text_makeinstance_tag)
-    pos = read_attribute_value(r'pos="[^"]+?"', text_makeinstance_tag)
-    modality = read_attribute_value(r'modality="[^"]+?"', text_makeinstance_tag)
+    event_id, eiid, tense, aspect, polarity, pos, modality = _read_attribute_values("MAKEINSTANCE", text_makeinstance_tag)
 
     return TagMakeinstance(event_id, eiid, tense, aspect, polarity, pos, modality)
 
 
 def extract_tlink_objects(input_text: str) -> List[TagTlink]:
-    full_tlink_tags = re.findall(REGEX_SINGLETON_TLINK, input_text, re.IGNORECASE)
-    tlink_tags = []
-    for tlink_tag in full_tlink_tags:
-        tlink_tags += [_create_tlink_object(tlink_tag)]
-    return tlink_tags
+    return scan_timeml_tags(input_text, ("TLINK",)).tlink_tags
 
 
 def _create_tlink_object(text_tlink_tag: str) -> TagTlink:
@@ -341,24 +419,13 @@ def _create_tlink_object(text_tlink_tag: str) -> TagTlink:
     Example (TT): <TLINK lid="l5" relType="BEFORE" timeID="t86" relatedToTime="t82"/>
     Example (EE): <TLINK lid="l10" relType="BEFORE" eventInstanceID="ei387" relatedToEventInstance="ei386" signalID="s13"/>
     """
-    lid = read_attribute_value(r'lid="[^"]+?"', text_tlink_tag)
-    rel_type = read_attribute_value(r'relType="[^"]+?"', text_tlink_tag)
-    event_instance_id = read_attribute_value(r'eventInstanceID="[^"]+?"', text_tlink_tag)
-    time_id = read_attribute_value(r'timeID="[^"]+?"', text_tlink_tag)
-    related_to_time = read_attribute_value(r'relatedToTime="[^"]+?"', text_tlink_tag)
-    related_to_event_instance = read_attribute_value(r'relatedToEventInstance="[^"]+?"', text_tlink_tag)
-    modality = read_attribute_value(r'modality="[^"]+?"', text_tlink_tag)
-    signal_id = read_attribute_value(r'signalID="[^"]+?"', text_tlink_tag)
+    lid, rel_type, event_instance_id, time_id, related_to_time, related_to_event_instance, modality, signal_id = _read_attribute_values("TLINK", text_tlink_tag)
 
     return TagTlink(lid, rel_type, event_instance_id, time_id, related_to_time, related_to_event_instance, modality, signal_id)
 
 
-def extract_event_objects(input_text: str) -> List[TagTimex3]:
-    full_event_tags = re.findall(REGEX_SPAN_EVENT, input_text, re.IGNORECASE)
-    event_tags = []
-    for event_tag in full_event_tags:
-        event_tags += [_create_event_object(event_tag)]
-    return event_tags
+def extract_event_objects(input_text: str) -> List[TagEvent]:
+    return scan_timeml_tags(input_text, ("EVENT",)).event_tags
 
 
 def _read_tag_content(tag: str) -> str:
@@ -371,7 +438,7 @@ def _read_tag_content(tag: str) -> str:
     Returns:
         str: The tag content without xml tags.
     """
-    return re.sub(REGEX_ANY_XMLTAG, "", tag).strip()
+    return COMPILED_ANY_XMLTAG.sub("", tag).strip()
 
 
 def _create_event_object(text_event_tag: str) -> TagEvent:
@@ -380,33 +447,21 @@ def _create_event_object(text_event_tag: str) -> TagEvent:
     Example: <EVENT eid="e371" class="STATE">thirty</EVENT>
     Example: <EVENT eid="e46" class="OCCURRENCE">goes</EVENT>
     """
-    eid = read_attribute_value(r'eid="[^"]+?"', text_event_tag)
-    event_class = read_attribute_value(r'class="[^"]+?"', text_event_tag)
+    eid, event_class = _read_attribute_values("EVENT", text_event_tag)
     text = _read_tag_content(text_event_tag)
     
     return TagEvent(eid, event_class, text)
 
 
 def extract_timex3_objects(input_text: str) -> List[TagTimex3]:
-    full_timex3_tags = re.findall(REGEX_SPAN_TIMEX3, input_text, re.IGNORECASE)
-    timex3_tags = []
-    for timex3_tag in full_timex3_tags:
-        timex3_tags += [_create_timex3_object(timex3_tag)]
-    return timex3_tags
+    return scan_timeml_tags(input_text, ("TIMEX3",)).timex3_tags
 
 
 def _create_timex3_object(text_timex3_tag: str) -> TagTimex3:
     """
     Example: <TIMEX3 tid="t196" type="DATE" value="PRESENT_REF" temporalFunction="true" functionInDocument="NONE" anchorTimeID="t82">Now</TIMEX3>
-    Example: <EVENT eid="e371" class="STATE">thirty</EVENT>
-    Example: <EVENT eid="e46" class="OCCURRENCE">goes</EVENT>
     """
-    tid = read_attribute_value(r'tid="[^"]+?"', text_timex3_tag)
-    timex3_type = read_attribute_value(r'type="[^"]+?"', text_timex3_tag)
-    value = read_attribute_value(r'value="[^"]+?"', text_timex3_tag)
-    mod = read_attribute_value(r'mod="[^"]+?"', text_timex3_tag)
-    temporal_function = read_attribute_value(r'temporalFunction="[^"]+?"', text_timex3_tag)
-    function_in_document = read_attribute_value(r'functionInDocument="[^"]+?"', text_timex3_tag)
+    tid, timex3_type, value, mod, temporal_function, function_in_document = _read_attribute_values("TIMEX3", text_timex3_tag)
     text = _read_tag_content(text_timex3_tag)
     
     return TagTimex3(tid, timex3_type, value, mod, temporal_function, function_in_document, text)
@@ -423,28 +478,27 @@ def find_matching_pairs(list_a: List[Any], list_b: List[Any], key_a: str, key_b:
     return pairs
 
 
-def extract_full_event_objects(input_text: str) -> List[TagFullEvent]:
-    event_objects = extract_event_objects(input_text)
-    makeinstance_objects = extract_makeinstance_objects(input_text)
+def create_full_event_objects(event_objects: List[TagEvent], makeinstance_objects: List[TagMakeinstance]) -> List[TagFullEvent]:
     event_makeinstance_pairs = find_matching_pairs(event_objects, makeinstance_objects, "eid", "event_id")
 
     full_event_objects = []
     for event_object, makeinstance_object in event_makeinstance_pairs:
         full_event_objects += [TagFullEvent(event_object, makeinstance_object)]
-   
+
     return full_event_objects
 
 
+def extract_full_event_objects(input_text: str) -> List[TagFullEvent]:
+    timeml_tags = scan_timeml_tags(input_text, ("MAKEINSTANCE", "EVENT"))
+    return create_full_event_objects(timeml_tags.event_tags, timeml_tags.makeinstance_tags)
+
+
 def extract_signal_objects(input_text: str) -> List[TagSignal]:
-    full_signal_tags = re.findall(REGEX_SPAN_SIGNAL, input_text, re.IGNORECASE)
-    signal_tags = []
-    for signal_tag in full_signal_tags:
-        signal_tags += [_create_signal_object(signal_tag)]
-    return signal_tags
+    return scan_timeml_tags(input_text, ("SIGNAL",)).signal_tags
 
 
 def _create_signal_object(text_signal_tag: str) -> TagSignal:
-    sid = read_attribute_value(r'sid="[^"]+?"', text_signal_tag)
+    sid, = _read_attribute_values("SIGNAL", text_signal_tag)
     text = _read_tag_content(text_signal_tag)
    
     return TagSignal(sid, text)
@@ -557,23 +611,39 @@ def split_sentences_timebank_extra(input_text: str) -> List[str]:
 
 def generate_sentence_objects(full_sentences: List[str], makeinstance_objects: List[TagMakeinstance], tlink_objects: List[TagTlink], meta_time: TagDocumentMetaTime) -> List[Sentence]:
 
+    tlink_index = index_tlink_objects(tlink_objects)
     sentences = []
     for index_in_document, full_sentence in enumerate(full_sentences):
-        sentences += [_analyze_sentence_and_generate_targets(full_sentence, index_in_document, makeinstance_objects, tlink_objects, meta_time)]
+        sentences += [_analyze_sentence_and_generate_targets(full_sentence, index_in_document, makeinstance_objects, tlink_index, meta_time)]
     return sentences
 
 
-def _construct_tag_regex(tag_name: str) -> str:
+def index_tlink_objects(tlink_objects: List[TagTlink]) -> Dict[tuple, List[TagTlink]]:
     """
-    Takes name of a tag like EVENT (XML tag) and creates a pair
-    of regex to match the opening and the end of the tag.
-    Returns a pair of regexes.
+    Indexes the tlinks of a document by the pair of entities they relate.
+    Every tlink is indexed for the four relation codes, since the tlink type isn't
+    checked when matching the entities of a sentence:
+        TT: (timeID, relatedToTime)
+        TE: (timeID, relatedToEventInstance)
+        ET: (eventInstanceID, relatedToTime)
+        EE: (eventInstanceID, relatedToEventInstance)
+
+    Args:
+        tlink_objects (List[TagTlink]): The tlinks of the document.
 
-    Example: EVENT -> Opening: <EVENT[^>]*?>, Closing: </EVENT>
+    Returns:
+        Dict[tuple, List[TagTlink]]: Tlinks in document order for each (relation code, source id, target id).
     """
-    regex_open_tag = r"<" + tag_name + r"[^>]*?>"
-    regex_close_tag = r"</" + tag_name + r">"
-    return regex_open_tag, regex_close_tag
+    tlink_index = dict()
+    for tlink in tlink_objects:
+        for key in [
+            ("TT", tlink.timeID, tlink.relatedToTime),
+            ("TE", tlink.timeID, tlink.relatedToEventInstance),
+            ("ET", tlink.eventInstanceID, tlink.relatedToTime),
+            ("EE", tlink.eventInstanceID, tlink.relatedToEventInstance)
+        ]:
+            tlink_index.setdefault(key, []).append(tlink)
+    return tlink_index
 
 
 def strip_article_content_timebank_extra(input_text: str) -> str:
@@ -710,11 +780,10 @@ def _clean_text(text: str) -> str:
     for pattern, replacement in TEXT_CLEANING_PATTERNS:
         text = re.sub(pattern, replacement, text)
 
-    for tag in TAGS_TO_DELETE:
-        if tag.upper() in text.upper():
-            regex_open_tag, regex_close_tag = _construct_tag_regex(tag)
-            text = re.sub(regex_open_tag, "", text, flags=re.IGNORECASE)
-            text = re.sub(regex_close_tag, "", text, flags=re.IGNORECASE)
+    for tag, regex_open_tag, regex_close_tag in REGEX_TAGS_TO_DELETE:
+        if tag in text.upper():
+            text = regex_open_tag.sub("", text)
+            text = regex_close_tag.sub("", text)
 
     return text
 
@@ -727,11 +796,10 @@ def _pre_clean_sentence(sentence):
     sentence = re.sub(r"\s{2,}", " ", sentence)
     sentence = sentence.replace("'s", " 's")
     
-    for tag in TAGS_TO_DELETE:
-        if tag.upper() in sentence.upper():
-            regex_open_tag, regex_close_tag = _construct_tag_regex(tag)
-            sentence = re.sub(regex_open_tag, "", sentence, flags=re.IGNORECASE)
-            sentence = re.sub(regex_close_tag, "", sentence, flags=re.IGNORECASE)
+    for tag, regex_open_tag, regex_close_tag in REGEX_TAGS_TO_DELETE:
+        if tag in sentence.upper():
+            sentence = regex_open_tag.sub("", sentence)
+            sentence = regex_close_tag.sub("", sentence)
 
     sentence = sentence.replace("-", " - ") #TODO is this fine? does it lead to problems?
 
@@ -742,7 +810,7 @@ def _analyze_sentence_and_generate_targets(
     sentence: str,
     index_in_document: int,
     makeinstance_objects: List[TagMakeinstance],
-    tlink_objects: List[TagTlink],
+    tlink_index: Dict[tuple, List[TagTlink]],
     meta_time: TagDocumentMetaTime
 ) -> List[str]:
     original_sentence = sentence
@@ -755,7 +823,7 @@ def _analyze_sentence_and_generate_targets(
 
     timex3_objects, full_event_objects = _extract_entities_from_sentence(original_sentence, makeinstance_objects)
     labeled_entities, tokens = _tokenize_and_position_entities(sentence, full_event_objects, timex3_objects)
-    entity_relations, dct_relations, dpt_relations = _find_relations_in_sentence(timex3_objects, full_event_objects, tlink_objects, meta_time)
+    entity_relations, dct_relations, dpt_relations = _find_relations_in_sentence(timex3_objects, full_event_objects, tlink_index, meta_time)
 
     sentence_without_special_tokens = sentence.replace(EVENT_SPECIAL_TOKEN_START + " ", "")
     sentence_without_special_tokens = sentence_without_special_tokens.replace(" " + EVENT_SPECIAL_TOKEN_END, "")
@@ -780,12 +848,9 @@ def _analyze_sentence_and_generate_targets(
 
 
 def _extract_entities_from_sentence(sentence: str, makeinstance_objects: List[TagMakeinstance]) -> tuple:
-    timex3_objects = extract_timex3_objects(sentence)
-    event_objects = extract_event_objects(sentence)
-    event_make_instance_pairs = find_matching_pairs(event_objects, makeinstance_objects, "eid", "event_id")
-    full_event_objects = []
-    for event_object, makeinstance_object in event_make_instance_pairs:
-        full_event_objects += [TagFullEvent(event_object, makeinstance_object)]
+    timeml_tags = scan_timeml_tags(sentence, ("EVENT", "TIMEX3"))
+    timex3_objects = timeml_tags.timex3_tags
+    full_event_objects = create_full_event_objects(timeml_tags.event_tags, makeinstance_objects)
 
     return timex3_objects, full_event_objects
 
@@ -793,7 +858,7 @@ def _extract_entities_from_sentence(sentence: str, makeinstance_objects: List[Ta
 def _find_relations_in_sentence(
     timex3_objects: List[TagTimex3],
     full_event_objects: List[TagFullEvent],
-    tlink_objects: List[TagTlink],
+    tlink_index: Dict[tuple, List[TagTlink]],
     meta_time: TagDocumentMetaTime
 )-> tuple:
     temporal_objects = timex3_objects + full_event_objects
@@ -801,45 +866,41 @@ def _find_relations_in_sentence(
         temporal_objects += [meta_time.dct_object]
     if meta_time.dpt_object:
         temporal_objects += [meta_time.dpt_object]
-    entity_relations = []
     contains_dct = "-DCT"
     contains_dpt = "-DPT"
-    for source_entity in temporal_objects:
-        for target_entity in temporal_objects:
-            if source_entity == target_entity:
+
+    #(entity, T/E, id for the tlinks, is dct, is dpt)
+    entities = []
+    for temporal_object in temporal_objects:
+        if isinstance(temporal_object, TagTimex3):
+            entities += [(temporal_object, "T", temporal_object.tid, temporal_object.is_dct, temporal_object.is_dpt)]
+        elif isinstance(temporal_object, TagFullEvent):
+            entities += [(temporal_object, "E", temporal_object.eiid, False, False)]
+        else:
+            raise Exception("Unknown temporal object.")
+
+    entity_relations = []
+    for source_entity, source_code, source_id, source_is_dct, source_is_dpt in entities:
+        for target_entity, target_code, target_id, target_is_dct, target_is_dpt in entities:
+            if source_entity is target_entity:
                 continue
-            
+
+            #First position in Tlink: eventInstanceID, timeID
+            #Second position in Tlink: relatedToTime, relatedToEventInstance
+            tlinks = tlink_index.get((source_code + target_code, source_id, target_id))
+            if not tlinks:
+                continue
+
             relation_type = ""
-            if (isinstance(source_entity, TagTimex3) and source_entity.is_dct) or (isinstance(target_entity, TagTimex3) and target_entity.is_dct):
+            if source_is_dct or target_is_dct:
                 relation_type += contains_dct
-            if (isinstance(source_entity, TagTimex3) and source_entity.is_dpt) or (isinstance(target_entity, TagTimex3) and target_entity.is_dpt):
+            if source_is_dpt or target_is_dpt:
                 relation_type += contains_dpt
 
-            for tlink in tlink_objects:
-                #First position in Tlink: eventInstanceID, timeID
-                #Second position in Tlink: relatedToTime, relatedToEventInstance
-                if isinstance(source_entity, TagTimex3):
-                    if isinstance(target_entity, TagTimex3): #TT
-                        if tlink.timeID == source_entity.tid and tlink.relatedToTime == target_entity.tid:
-                            relation_type = "TT" + relation_type
-                            entity_relations += [TemporalRelation(tlink.relType, source_entity, target_entity, tlink, relation_type)]
-                    elif isinstance(target_entity, TagFullEvent): #TE
-                        if tlink.timeID == source_entity.tid and tlink.relatedToEventInstance == target_entity.eiid:
-                            relation_type = "TE" + relation_type
-                            entity_relations += [TemporalRelation(tlink.relType, source_entity, target_entity, tlink, relation_type)]
-                    else:
-                        raise Exception("Unknown temporal object.")
-                elif isinstance(source_entity, TagFullEvent):
-                    if isinstance(target_entity, TagTimex3): #ET
-                        if tlink.eventInstanceID == source_entity.eiid and tlink.relatedToTime == target_entity.tid:
-                            relation_type = "ET" + relation_type
-                            entity_relations += [TemporalRelation(tlink.relType, source_entity, target_entity, tlink, relation_type)]
-                    elif isinstance(target_entity, TagFullEvent): #EE
-                        if tlink.eventInstanceID == source_entity.eiid and tlink.relatedToEventInstance == target_entity.eiid:
-                            relation_type = "EE" + relation_type
-                            entity_relations += [TemporalRelation(tlink.relType, source_entity, target_entity, tlink, relation_type)]
-                    else:
-                        raise Exception("Unknown temporal object.")
+            for tlink in tlinks:
+                relation_type = source_code + target_code + relation_type
+                entity_relations += [TemporalRelation(tlink.relType, source_entity, target_entity, tlink, relation_type)]
+
     dct_relations = []
     dpt_relations = []
     for entity_relation in entity_relations:
@@ -849,12 +910,21 @@ def _find_relations_in_sentence(
         elif contains_dpt in relation_code:
             dpt_relations += [entity_relation]
 
+    #The DCT/DPT relations used to be removed with list.remove while iterating over the list,
+    #which skips the relation after each removed one. Keep those relations for identical datasets.
+    sentence_relations = []
+    skip_next = False
     for entity_relation in entity_relations:
         relation_code = entity_relation.relation_code
-        if contains_dct in relation_code or contains_dpt in relation_code:
-            entity_relations.remove(entity_relation)
+        if skip_next:
+            sentence_relations += [entity_relation]
+            skip_next = False
+        elif contains_dct in relation_code or contains_dpt in relation_code:
+            skip_next = True
+        else:
+            sentence_relations += [entity_relation]
 
-    return entity_relations, dct_relations, dpt_relations
+    return sentence_relations, dct_relations, dpt_relations
 
 
 def _tokenize_and_position_entities(sentence, full_event_objects, timex3_objects) -> tuple:
@@ -4,21 +4,20 @@ import random
 import os
 from typing import List, Tuple, Dict
 from conversion_utils.preprocessing_file_saver import generate_crossvalidation_folds, save_dataset_splits
+from conversion_utils.tokenization_cache import TOKENIZATION_CACHE
 from collections import Counter
 import pprint
 import argparse
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from conversion_utils.tempeval_datastructures import (
     Document,
     TagTimex3,
     TagFullEvent,
-    extract_makeinstance_objects,
-    extract_tlink_objects,
-    extract_signal_objects,
-    extract_event_objects,
-    extract_timex3_objects,
-    extract_full_event_objects,
+    scan_timeml_tags,
+    create_full_event_objects,
     extract_meta_document_time,
     extract_article_content_timebank_extra,
     generate_sentence_objects,
@@ -70,7 +69,8 @@ class TempevalDatasetConverter:
             extract_events: bool = True,
             extract_temporal_relations: bool = True,
             crossvalidation_enabled: bool = False, 
-            folds: int = 10
+            folds: int = 10,
+            workers: int = 1
         ) -> None:
         """
         Extraction targets.
@@ -188,6 +188,12 @@ class TempevalDatasetConverter:
         """
         self.min_tokens_per_sentence_treshold = 5 #Minimum number of tokens per sentence. Sentences with less tokens are dropped.
         self.single_entity_class = single_entity_class #Whether to use a single entity class or not
+
+
+        """
+        Parallelization.
+        """
+        self.workers = workers #Number of processes that parse the tml files
         
 
     def load_tml_files(self, input_filepaths: List[str]) -> List[str]:
@@ -214,6 +220,7 @@ class TempevalDatasetConverter:
         json_list_tempelval = []
         json_list_only_timebank = []
         json_list_aquaint = []
+        conversion_start_time = time.perf_counter()
         if self.extract_tempeval or (self.extract_timebank and self.extract_aquaint):
             documents_timeml: List[Document] = self.parse_timeml_directory()
             documents_extra: List[Document] = self.parse_extra_directory()
@@ -233,6 +240,7 @@ class TempevalDatasetConverter:
             json_list_aquaint: List[dict] = self.documents_to_json_list(documents_aquaint)
         else:
             raise Exception("No dataset to convert specified!")
+        conversion_time = time.perf_counter() - conversion_start_time
 
 
         #List of tuples. Each tuple contains the json list, the output directory path and the output file prefix.
@@ -284,6 +292,7 @@ class TempevalDatasetConverter:
             print(f"Completed generating files for {output_directory_path}!\n")
         
         print("\nConversion complete! Have a great day!\n")
+        print(f"Converting the documents to json took {conversion_time:.2f}s, tokenization cache: {TOKENIZATION_CACHE.statistics()}.\n")
         print("Final event classes used for labeling:")
         pprint.pprint(self.event_classes)
         print()
@@ -449,14 +458,16 @@ class TempevalDatasetConverter:
         return sentence_json_list
 
 
-    def _generate_document_from_file(self, tml_filepath: str, tml_full_file_contents: str, article_content_with_tags: str, article_content_without_tags: str, split_sentences: List[str]) -> Document:
-        makeinstance_objects = extract_makeinstance_objects(tml_full_file_contents)
-        tlink_objects = extract_tlink_objects(tml_full_file_contents)
-        event_objects = extract_event_objects(tml_full_file_contents)
-        timex3_objects = extract_timex3_objects(tml_full_file_contents)
+    @staticmethod
+    def _generate_document_from_file(tml_filepath: str, tml_full_file_contents: str, article_content_with_tags: str, article_content_without_tags: str, split_sentences: List[str]) -> Document:
+        timeml_tags = scan_timeml_tags(tml_full_file_contents)
+        makeinstance_objects = timeml_tags.makeinstance_tags
+        tlink_objects = timeml_tags.tlink_tags
+        event_objects = timeml_tags.event_tags
+        timex3_objects = timeml_tags.timex3_tags
         meta_document_time = extract_meta_document_time(timex3_objects)
-        signal_objects = extract_signal_objects(tml_full_file_contents)
-        full_event_objects = extract_full_event_objects(tml_full_file_contents)
+        signal_objects = timeml_tags.signal_tags
+        full_event_objects = create_full_event_objects(event_objects, makeinstance_objects)
 
         if len(makeinstance_objects) != len(event_objects) != len(full_event_objects):
             print(f"Warning: Number of makeinstance objects ({len(makeinstance_objects)}), event objects ({len(event_objects)}) and full event objects ({len(full_event_objects)}) are not the same size in file:\n{tml_filepath}.")
@@ -485,6 +496,60 @@ class TempevalDatasetConverter:
         return document
 
 
+    @staticmethod
+    def _parse_tml_file(tml_filepath: str, tml_full_file_contents: str, extract_article_content, strip_article_content, split_sentences) -> Document:
+        article_content_with_tags = extract_article_content(tml_full_file_contents)
+        article_content_without_tags = strip_article_content(article_content_with_tags)
+        document_sentences = split_sentences(article_content_with_tags)
+
+        return TempevalDatasetConverter._generate_document_from_file(tml_filepath, tml_full_file_contents, article_content_with_tags, article_content_without_tags, document_sentences)
+
+
+    @staticmethod
+    def _parse_tml_file_in_worker(tml_filepath: str, tml_full_file_contents: str, extract_article_content, strip_article_content, split_sentences) -> Tuple[Document, dict]:
+        """
+        Parses a tml file in a worker process and also returns the new tokenizations of the worker, see TokenizationCache.export().
+        """
+        document = TempevalDatasetConverter._parse_tml_file(tml_filepath, tml_full_file_contents, extract_article_content, strip_article_content, split_sentences)
+        return document, TOKENIZATION_CACHE.export()
+
+
+    def _parse_tml_files(self, tml_filepaths: List[str], tml_file_contents: List[str], extract_article_content, strip_article_content, split_sentences) -> List[Document]:
+        """
+        Parses the tml files with the extraction rules of their directory and returns a document per file.
+        With workers > 1 the files are parsed in a process pool, the documents are still returned
+        in the order of the files, so that the shuffled splits and folds don't depend on the workers.
+        The workers send their new tokenizations back, so that the tokenization cache is saved by this process only.
+
+        Args:
+            tml_filepaths: List of tml filepaths.
+            tml_file_contents: List of tml file contents.
+            extract_article_content: Extracts the article content (with tags) from the file contents.
+            strip_article_content: Removes the tags from the article content.
+            split_sentences: Splits the article content (with tags) into sentences.
+
+        Returns:
+            A list of documents. Each document represents a tml file.
+        """
+        number_of_files = len(tml_filepaths)
+        arguments = (
+            tml_filepaths,
+            tml_file_contents,
+            [extract_article_content] * number_of_files,
+            [strip_article_content] * number_of_files,
+            [split_sentences] * number_of_files
+        )
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=initiate_worker, initargs=(TOKENIZATION_CACHE.cache_filepath,)) as executor:
+                results: List[Tuple[Document, dict]] = list(executor.map(TempevalDatasetConverter._parse_tml_file_in_worker, *arguments))
+            documents: List[Document] = [document for document, _ in results]
+            for _, exported_tokenizations in results:
+                TOKENIZATION_CACHE.merge(exported_tokenizations)
+        else:
+            documents: List[Document] = list(map(TempevalDatasetConverter._parse_tml_file, *arguments))
+        return documents
+
+
     def parse_extra_directory(self) -> List[Document]:
         """
         The 'extra' directory is part of the TimeBank dataset. Its files are inconsistently 
@@ -503,14 +568,13 @@ class TempevalDatasetConverter:
         """
         print("Parsing TimeBank Extra directory...")
         assert len(self.timebank_tml_filepaths_extra) == len(self.tml_file_contents_extra)
-        documents: List[Document] = []
-        for tml_filepath, tml_full_file_contents in zip(self.timebank_tml_filepaths_extra ,self.tml_file_contents_extra):
-            article_content_with_tags = extract_article_content_timebank_extra(tml_full_file_contents)
-            article_content_without_tags = strip_article_content_timebank_extra(article_content_with_tags)
-            split_sentences = split_sentences_timebank_extra(article_content_with_tags)
-
-            document = self._generate_document_from_file(tml_filepath, tml_full_file_contents, article_content_with_tags, article_content_without_tags, split_sentences)
-            documents += [document]
+        documents: List[Document] = self._parse_tml_files(
+            self.timebank_tml_filepaths_extra,
+            self.tml_file_contents_extra,
+            extract_article_content_timebank_extra,
+            strip_article_content_timebank_extra,
+            split_sentences_timebank_extra
+        )
         print("Completed parsing TimeBank Extra directory!")
 
         return documents
@@ -533,14 +597,13 @@ class TempevalDatasetConverter:
         """
         print("Parsing TimeBank TimeMl directory...")
         assert len(self.timebank_tml_filepaths_timeml) == len(self.tml_file_contents_timeml)
-        documents: List[Document] = []
-        for tml_filepath, tml_full_file_contents in zip(self.timebank_tml_filepaths_timeml ,self.tml_file_contents_timeml):
-            article_content_with_tags = extract_article_content_timebank_timeml(tml_full_file_contents)
-            article_content_without_tags = strip_article_content_timebank_timeml(article_content_with_tags)
-            split_sentences = split_sentences_timebank_timeml(article_content_with_tags)
-
-            document = self._generate_document_from_file(tml_filepath, tml_full_file_contents, article_content_with_tags, article_content_without_tags, split_sentences)
-            documents += [document]
+        documents: List[Document] = self._parse_tml_files(
+            self.timebank_tml_filepaths_timeml,
+            self.tml_file_contents_timeml,
+            extract_article_content_timebank_timeml,
+            strip_article_content_timebank_timeml,
+            split_sentences_timebank_timeml
+        )
         print("Completed parsing TimeBank TimeMl directory!")
 
         return documents
@@ -549,20 +612,32 @@ class TempevalDatasetConverter:
     def parse_aquaint_files(self) -> List[dict]:
         print("Parsing Aquaint directory...")
         assert len(self.aquaint_tml_filepaths) == len(self.tml_file_contents_aquaint)
-        documents: List[Document] = []
-        for tml_filepath, tml_full_file_contents in zip(self.aquaint_tml_filepaths ,self.tml_file_contents_aquaint):
-            article_content_with_tags = extract_article_content_aquaint(tml_full_file_contents)
-            article_content_without_tags = strip_article_content_aquaint(article_content_with_tags)
-            split_sentences = split_sentences_aquaint(article_content_with_tags)
-
-            document = self._generate_document_from_file(tml_filepath, tml_full_file_contents, article_content_with_tags, article_content_without_tags, split_sentences)
-            documents += [document]
+        documents: List[Document] = self._parse_tml_files(
+            self.aquaint_tml_filepaths,
+            self.tml_file_contents_aquaint,
+            extract_article_content_aquaint,
+            strip_article_content_aquaint,
+            split_sentences_aquaint
+        )
         print("Completed parsing Aquaint directory!")
 
         return documents
 
 
 
+def initiate_worker(tokenization_cache_filepath: str = None) -> None:
+    """
+    Prepares the tokenization cache of a worker process.
+
+    Args:
+        tokenization_cache_filepath: Cache file of the tokenizations, None to keep them only in memory.
+    """
+    #Forked workers inherit the new tokenizations and statistics of the parent process, which already counts them
+    TOKENIZATION_CACHE.export()
+    if tokenization_cache_filepath is not None and TOKENIZATION_CACHE.cache_filepath is None:
+        TOKENIZATION_CACHE.use_cache_file(tokenization_cache_filepath)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -676,8 +751,37 @@ if __name__ == "__main__":
         default = 10,
         help = "Number of crossvalidation folds."
     )
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type = int,
+        default = 1,
+        help = "Number of processes that parse the tml files. The converted dataset doesn't depend on it."
+    )
+
+    parser.add_argument(
+        "--seed",
+        type = int,
+        default = None,
+        help = "Seed for shuffling the dataset before splitting it, for reproducible splits and folds."
+    )
+
+    parser.add_argument(
+        "--tokenization_cache",
+        "-tc",
+        type = str,
+        default = None,
+        help = "Cache file of the tokenizations. If it is passed, converting the dataset again skips the tokenization of sentences that were tokenized before."
+    )
     args = parser.parse_args()
 
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    if args.tokenization_cache is not None:
+        TOKENIZATION_CACHE.use_cache_file(args.tokenization_cache)
+
 
     timebank_directory_path_extra = args.input_filepath_timebank_extra
     timebank_filepaths_extra = [os.path.join(timebank_directory_path_extra, f) for f in os.listdir(timebank_directory_path_extra) if os.path.isfile(os.path.join(timebank_directory_path_extra, f)) and f.endswith(".tml")]
@@ -707,6 +811,8 @@ if __name__ == "__main__":
         extract_events=args.extract_events,
         extract_temporal_relations=args.extract_relations,
         crossvalidation_enabled=args.crossvalidation,
-        folds=args.folds
+        folds=args.folds,
+        workers=args.workers
     )
-    converter.convert_dataset()
\ No newline at end of file
+    converter.convert_dataset()
+    TOKENIZATION_CACHE.save()
\ No newline at end of file
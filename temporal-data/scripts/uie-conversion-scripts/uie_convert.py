@@ -10,6 +10,7 @@ from universal_ie.generation_format import generation_format_dict
 from universal_ie.generation_format.structure_marker import BaseStructureMarker
 from universal_ie.dataset import Dataset
 from universal_ie.ie_format import Sentence
+from universal_ie.tokenization_cache import TOKENIZATION_CACHE
 import argparse
 
 
@@ -193,8 +194,18 @@ def main():
         default="../../entity/my_converted_datasets/uie",
         help="The path to the output base directory."
     )
+
+    parser.add_argument(
+        "-tokenization_cache",
+        dest="tokenization_cache",
+        default=None,
+        help="Cache file of the tokenizations. If it is passed, converting the datasets again skips the tokenization of texts that were tokenized before."
+    )
     options = parser.parse_args()
 
+    if options.tokenization_cache is not None:
+        TOKENIZATION_CACHE.use_cache_file(options.tokenization_cache)
+
     generation_class = generation_format_dict.get(options.generation_format)
 
 
@@ -224,6 +235,9 @@ def main():
         elif options.generation_format == "oneie":
             convert_to_oneie(output_name, datasets=datasets)
 
+    TOKENIZATION_CACHE.save()
+    print(f"Tokenization cache: {TOKENIZATION_CACHE.statistics()}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -7,7 +7,8 @@ from typing import List
 from universal_ie.task_format.task_format import TaskFormat
 from universal_ie.utils import tokens_to_str
 from universal_ie.ie_format import Entity, Event, Label, Sentence, Span
-from nltk.tokenize import word_tokenize, PunktSentenceTokenizer
+from nltk.tokenize import PunktSentenceTokenizer
+from universal_ie.tokenization_cache import cached_word_tokenize
 
 
 class TEMPEVAL(TaskFormat):
@@ -25,7 +26,7 @@ class TEMPEVAL(TaskFormat):
             idx = [i for i in range(entity["start"], entity["end"] + 1)]
             ent = Entity(
                     span=Span(
-                        tokens=[word_tokenize(t) for t in entity["text"]],
+                        tokens=[cached_word_tokenize(t) for t in entity["text"]],
                         indexes=idx,
                         text=entity["text"],
                         text_id=self.sent_id
@@ -82,7 +83,7 @@ class TEMPEVALENTITY(TaskFormat):
             idx = entity["offset"]
             ent = Entity(
                 span=Span(
-                    tokens=word_tokenize(entity["text"]),
+                    tokens=cached_word_tokenize(entity["text"]),
                     indexes=idx,
                     text=entity["text"],
                     text_id=self.sent_id
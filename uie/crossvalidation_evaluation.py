@@ -17,6 +17,8 @@ import pandas as pd
 from typing import Dict, List, Tuple, Any
 import difflib
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 
 
@@ -117,10 +119,7 @@ def generate_records(
         decoding_schema="spotasoc",
         map_config=map_config,
     )
-    predict_records = list()
-    for p, text, tokens in zip(predict_val_findings, text_list, token_list):
-        record = sel2record.sel2record(pred=p, text=text, tokens=tokens)
-        predict_records += [record]
+    predict_records = sel2record.sel2record_batch(pred_list=predict_val_findings, text_list=text_list, token_list=token_list)
 
     return predict_records, predict_val_findings
 
@@ -312,6 +311,64 @@ def _generate_negative_cases_analysis(gold_dataset, predict_records, negative_ca
 
 
 
+def _evaluate(gold_entries, predict_records) -> dict:
+    """
+    Evaluates the predictions against the gold entries line by line.
+
+    Args:
+        gold_entries (List[dict]): List of gold entries.
+        predict_records (List[Record]): List of predicted records.
+
+    Returns:
+        dict: Dictionary containing the results of the evaluation.
+    """
+    scorer = TemporalTypeScorer()
+
+    #Format gold and pred to match in structure
+    gold_instance_list = [x["entity"] for x in gold_entries]
+    pred_instance_list = [x["entity"] for x in predict_records]
+
+    gold_instance_list_restructured = scorer.load_gold_list(gold_instance_list)
+    pred_instance_list_restructured = scorer.load_pred_list(pred_instance_list)
+
+    sub_results, negative_case_indexes = scorer.eval_instance_list(
+        gold_instance_list=gold_instance_list_restructured,
+        pred_instance_list=pred_instance_list_restructured
+    )
+    return sub_results, negative_case_indexes
+
+
+
+def _evaluate_model(
+    model_full_name: str,
+    fold: int,
+    model: str,
+    gold_val_entries: List[dict],
+    gold_test_entries: List[dict],
+    predict_val_records: List[Record],
+    predict_val_seq2seq: List[str],
+    predict_test_records: List[Record],
+    predict_test_seq2seq: List[str],
+) -> Tuple[tuple, tuple, dict, dict]:
+    """
+    Scores the val and test predictions of one model and generates their negative cases analysis.
+    Runs in the worker processes of _get_all_model_results.
+
+    Returns:
+        Tuple[tuple, tuple, dict, dict]: The val and test results and the val and test negative cases.
+    """
+    val_results, negative_val_cases_indexes = _evaluate(gold_val_entries, predict_val_records)
+    test_results, negative_test_cases_indexes = _evaluate(gold_test_entries, predict_test_records)
+
+    val_negative_cases = _generate_negative_cases_analysis(gold_val_entries, predict_val_records, negative_val_cases_indexes)
+    test_negative_cases = _generate_negative_cases_analysis(gold_test_entries, predict_test_records, negative_test_cases_indexes)
+
+    model_val_results = (model_full_name, f"fold_{fold}", model, val_results, predict_val_records, predict_val_seq2seq)
+    model_test_results = (model_full_name, f"fold_{fold}", model, test_results, predict_test_records, predict_test_seq2seq)
+    return model_val_results, model_test_results, val_negative_cases, test_negative_cases
+
+
+
 def _get_all_model_results(
     model_directories: List[List[str]],
     gold_directories: List[str],
@@ -319,11 +376,14 @@ def _get_all_model_results(
     gold_test_files: List[str],
     model_full_name: str,
     batch_size: int,
+    num_workers: int = 1,
 ) -> Tuple[List[Tuple[str, str, str, dict, list, list]], List[Tuple[str, str, str, dict, list, list]]]:
     """
     Initialzes each model and predicts on the gold-val and gold-test files for each fold.
     Returns the seq2seq preictions, the record predictions and the resullts for each model.
     The results are based on scoring the predictions with F1, P, R, TP etc.
+    With num_workers > 1 the predictions of each model are scored in a process pool while
+    the next model predicts, the results are still merged in fold and model order.
 
     Args:
         model_directories (List[List[str]]): List of fold lists containing the full filepaths to the models.
@@ -332,6 +392,7 @@ def _get_all_model_results(
         gold_test_files (List[str]): List of full filepaths to the gold test files.
         model_full_name (str): Full name of the model.
         batch_size (int): Batch size to use for the predictions.
+        num_workers (int): Number of processes that score the predictions.
 
     Returns:
         Tuple[List[Tuple[str, str, str, dict, list, list]], List[Tuple[str, str, str, dict, list, list]]]:
@@ -341,6 +402,28 @@ def _get_all_model_results(
     model_directory_val_negative_cases = list()
     model_directory_test_results = list()
     model_directory_test_negative_cases = list()
+
+    executor = None
+    if num_workers > 1:
+        # The main process holds a CUDA context, which can not be shared with forked processes
+        executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _collect(model_results) -> None:
+        model_val_results, model_test_results, val_negative_cases, test_negative_cases = model_results
+        print()
+        print(f"Results for model {model_full_name}_{model_val_results[1]} (val):")
+        pprint.pprint(model_val_results[3])
+        print()
+        print()
+        print(f"Results for model {model_full_name}_{model_test_results[1]} (test):")
+        pprint.pprint(model_test_results[3])
+        print("\n" + "-" * 75)
+        model_directory_val_results.append(model_val_results)
+        model_directory_test_results.append(model_test_results)
+        model_directory_val_negative_cases.append(val_negative_cases)
+        model_directory_test_negative_cases.append(test_negative_cases)
+
+    pending = list()
     for fold, model_directory in enumerate(model_directories):
         #Load gold datasets
         gold_val_entries = read_json_file(gold_val_files[fold])
@@ -372,54 +455,19 @@ def _get_all_model_results(
                 batch_size=batch_size,
             )
 
-            def _evaluate(gold_entries, predict_records) -> dict:
-                """
-                Evaluates the predictions against the gold entries line by line.
-
-                Args:
-                    gold_entries (List[dict]): List of gold entries.
-                    predict_records (List[Record]): List of predicted records.
-
-                Returns:
-                    dict: Dictionary containing the results of the evaluation.
-                """
-                scorer = TemporalTypeScorer()
-
-                #Format gold and pred to match in structure
-                gold_instance_list = [x["entity"] for x in gold_entries]
-                pred_instance_list = [x["entity"] for x in predict_records]
-
-                gold_instance_list_restructured = scorer.load_gold_list(gold_instance_list)
-                pred_instance_list_restructured = scorer.load_pred_list(pred_instance_list)
-
-                sub_results, negative_case_indexes = scorer.eval_instance_list(
-                    gold_instance_list=gold_instance_list_restructured,
-                    pred_instance_list=pred_instance_list_restructured
-                )
-                return sub_results, negative_case_indexes
-
-
-            val_results, negative_val_cases_indexes = _evaluate(gold_val_entries, predict_val_records)
-            test_results, negative_test_cases_indexes = _evaluate(gold_test_entries, predict_test_records)
-            
-            val_negative_cases = _generate_negative_cases_analysis(gold_val_entries, predict_val_records, negative_val_cases_indexes)
-            test_negative_cases = _generate_negative_cases_analysis(gold_test_entries, predict_test_records, negative_test_cases_indexes)
+            arguments = (
+                model_full_name, fold, model, gold_val_entries, gold_test_entries,
+                predict_val_records, predict_val_seq2seq, predict_test_records, predict_test_seq2seq
+            )
+            if executor is None:
+                _collect(_evaluate_model(*arguments))
+            else:
+                pending.append(executor.submit(_evaluate_model, *arguments))
 
-            model_val_results = (model_full_name, f"fold_{fold}", model, val_results, predict_val_records, predict_val_seq2seq)
-            model_test_results = (model_full_name, f"fold_{fold}", model, test_results, predict_test_records, predict_test_seq2seq)
-            
-            print()
-            print(f"Results for model {model_full_name}_fold_{fold} (val):")
-            pprint.pprint(model_val_results[3])
-            print()
-            print()
-            print(f"Results for model {model_full_name}_fold_{fold} (test):")
-            pprint.pprint(model_test_results[3])
-            print("\n" + "-" * 75)
-            model_directory_val_results += [model_val_results]
-            model_directory_test_results += [model_test_results]
-            model_directory_val_negative_cases += [val_negative_cases]
-            model_directory_test_negative_cases += [test_negative_cases]
+    if executor is not None:
+        for future in pending:
+            _collect(future.result())
+        executor.shutdown()
 
     return model_directory_val_results, model_directory_test_results, model_directory_val_negative_cases, model_directory_test_negative_cases
 
@@ -1054,6 +1102,7 @@ def main():
     parser.add_argument("--classes", "-c", type=str) #multi or single
     parser.add_argument("--copy_gold_files", "-g", action="store_true")
     parser.add_argument("--batch_size", "-bs", type=int, default=42)
+    parser.add_argument("--num_workers", "-w", type=int, default=1) #processes for scoring the predictions
     args = parser.parse_args()
 
     model_size = args.model_size
@@ -1063,6 +1112,7 @@ def main():
     model_full_name = f"{args.model_size}_{args.dataset_name}_{args.classes}" #e.g. "base_pate_multi"
     copy_gold_files = args.copy_gold_files
     batch_size = args.batch_size
+    num_workers = args.num_workers
 
     print("Initializing crossvalidation...")
     print("Parsing arguments...")
@@ -1072,6 +1122,7 @@ def main():
     print(f"Predict type: {predict_type}")
     print(f"Copy gold files: {copy_gold_files}")
     print(f"Batch size: {batch_size}")
+    print(f"Number of workers: {num_workers}")
 
     dataset_directory_name = f"{dataset_name}_{predict_type}"
     gold_directories, gold_val_files_paths, gold_test_files_paths = _get_full_gold_paths(base_data_dir, dataset_directory_name)
@@ -1090,7 +1141,8 @@ def main():
         gold_val_files = gold_val_files_paths, 
         gold_test_files = gold_test_files_paths, 
         model_full_name = model_full_name,
-        batch_size = batch_size
+        batch_size = batch_size,
+        num_workers = num_workers
     )
 
     if not os.path.exists(logfiles_output_directory):
@@ -3,6 +3,7 @@
 import json
 import re
 from tqdm import tqdm
+import torch
 import transformers as huggingface_transformers
 from uie.extraction.record_schema import RecordSchema
 from uie.sel2record.record import MapConfig
@@ -10,6 +11,9 @@ from uie.extraction.scorer import *
 from uie.sel2record.sel2record import SEL2Record
 import math
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 split_bracket = re.compile(r"\s*<extra_id_\d>\s*")
@@ -34,25 +38,59 @@ def post_processing(x):
 
 
 class HuggingfacePredictor:
-    def __init__(self, model_path, schema_file, max_source_length=256, max_target_length=192) -> None:
+    def __init__(self, model_path, schema_file, max_source_length=256, max_target_length=192, device=None,
+                 cache_prefix=True) -> None:
         self._tokenizer = huggingface_transformers.T5TokenizerFast.from_pretrained(
             model_path)
         self._model = huggingface_transformers.T5ForConditionalGeneration.from_pretrained(
             model_path)
-        self._model.cuda()
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self._model.to(device)
+        self._model.eval()
         self._schema = RecordSchema.read_from_file(schema_file)
         self._ssi = schema_to_ssi(self._schema)
         self._max_source_length = max_source_length
         self._max_target_length = max_target_length
 
+        # The SSI prefix is the same for every input, so it is tokenized once
+        # and its ids are put in front of the tokenized text.
+        self._ssi_ids = self._tokenizer(self._ssi, add_special_tokens=False)['input_ids']
+        self._cache_prefix = cache_prefix and self._check_prefix_cache()
+
+    def _check_prefix_cache(self):
+        """ Splicing the prefix ids is only used if it tokenizes exactly like the concatenated string """
+        probes = ["Yesterday it rained.", " two  weeks ago", "1998-08-07"]
+        for probe in probes:
+            if self.encode_ids([probe], cache_prefix=True) != self.encode_ids([probe], cache_prefix=False):
+                logger.warning("Cached SSI prefix does not match the full tokenization, disable prefix cache")
+                return False
+        return True
+
+    def encode_ids(self, text, cache_prefix=None):
+        """ Token ids of SSI + text (including </s>), truncated to max_source_length """
+        if cache_prefix is None:
+            cache_prefix = self._cache_prefix
+        if cache_prefix:
+            text_ids = self._tokenizer(text, add_special_tokens=False)['input_ids']
+            input_ids = [self._ssi_ids + x + [self._tokenizer.eos_token_id] for x in text_ids]
+        else:
+            input_ids = self._tokenizer([self._ssi + x for x in text])['input_ids']
+        return [x[:self._max_source_length] for x in input_ids]
+
+    def encode(self, text):
+        return self.pad_ids(self.encode_ids(text))
+
+    def pad_ids(self, input_ids):
+        inputs = self._tokenizer.pad(
+            {'input_ids': input_ids}, padding=True, return_tensors='pt')
+        return inputs.to(self._model.device)
+
     def predict(self, text):
-        text = [self._ssi + x for x in text]
-        inputs = self._tokenizer(
-            text, padding=True, return_tensors='pt').to(self._model.device)
+        return self.predict_ids(self.encode_ids(text))
 
-        inputs['input_ids'] = inputs['input_ids'][:, :self._max_source_length]
-        inputs['attention_mask'] = inputs['attention_mask'][:,
-                                                            :self._max_source_length]
+    def predict_ids(self, input_ids):
+        inputs = self.pad_ids(input_ids)
 
         result = self._model.generate(
             input_ids=inputs['input_ids'],
@@ -62,6 +100,34 @@ class HuggingfacePredictor:
         return self._tokenizer.batch_decode(result, skip_special_tokens=False, clean_up_tokenization_spaces=False)
 
 
+def bucket_batches(lengths, batch_size, max_tokens=0):
+    """ Group instance indices by length into batches
+    Instances are sorted by length, and a batch is closed when it holds
+    batch_size instances or when its padded size (number of instances *
+    longest instance) would exceed max_tokens (0: no token limit).
+    Returns a list of batches of indices into lengths.
+    """
+    batches = list()
+    batch = list()
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # sorted ascending, so the current instance is the longest of the batch
+        padded_size = (len(batch) + 1) * lengths[index]
+        if len(batch) > 0 and (len(batch) >= batch_size or 0 < max_tokens < padded_size):
+            batches += [batch]
+            batch = list()
+        batch += [index]
+    if len(batch) > 0:
+        batches += [batch]
+    return batches
+
+
+def padding_efficiency(lengths, batches):
+    """ Real tokens / padded tokens of the given batches of indices """
+    real = sum(lengths[i] for batch in batches for i in batch)
+    padded = sum(max(lengths[i] for i in batch) * len(batch) for batch in batches)
+    return real / padded if padded > 0 else 1.
+
+
 task_dict = {
     'entity': EntityScorer,
     'relation': RelationScorer,
@@ -80,6 +146,12 @@ def main():
     parser.add_argument('--max_source_length', default=256, type=int)
     parser.add_argument('--max_target_length', default=192, type=int)
     parser.add_argument('--batch_size', default=16, type=int)
+    parser.add_argument('--sort_by_length', action='store_true',
+                        help='Batch inputs of similar tokenized length together')
+    parser.add_argument('--max_tokens', default=0, type=int,
+                        help='With --sort_by_length, maximum padded tokens per batch (0: only --batch_size)')
+    parser.add_argument('--device', default=None,
+                        help='Torch device, e.g. cpu or cuda:0 (default: cuda if available)')
     parser.add_argument('-c', '--config', dest='map_config',
                         help='Offset Re-mapping Config',
                         default='config/offset_map/closest_offset_en.yaml')
@@ -98,6 +170,7 @@ def main():
         schema_file=f"{data_folder}/record.schema",
         max_source_length=options.max_source_length,
         max_target_length=options.max_target_length,
+        device=options.device,
     )
 
     map_config = MapConfig.load_from_yaml(options.map_config)
@@ -114,22 +187,26 @@ def main():
         text_list = [x['text'] for x in read_json_file(gold_filename)]
         token_list = [x['tokens'] for x in read_json_file(gold_filename)]
 
-        batch_num = math.ceil(len(text_list) / options.batch_size)
-
-        predict = list()
-        for index in tqdm(range(batch_num)):
-            start = index * options.batch_size
-            end = index * options.batch_size + options.batch_size
-
-            pred_seq2seq = predictor.predict(text_list[start: end])
-            pred_seq2seq = [post_processing(x) for x in pred_seq2seq]
+        input_ids = predictor.encode_ids(text_list)
+        lengths = [len(x) for x in input_ids]
 
-            predict += pred_seq2seq
-
-        records = list()
-        for p, text, tokens in zip(predict, text_list, token_list):
-            r = sel2record.sel2record(pred=p, text=text, tokens=tokens)
-            records += [r]
+        if options.sort_by_length:
+            batches = bucket_batches(lengths, options.batch_size, options.max_tokens)
+        else:
+            batch_num = math.ceil(len(text_list) / options.batch_size)
+            batches = [list(range(index * options.batch_size, min(len(text_list), (index + 1) * options.batch_size)))
+                       for index in range(batch_num)]
+        print(f"{split}: {len(batches)} batches, padding efficiency "
+              f"{padding_efficiency(lengths, batches) * 100:.1f}% (real tokens / padded tokens)")
+
+        # Predictions are put back at the position of their input
+        predict = [None] * len(text_list)
+        for batch in tqdm(batches):
+            pred_seq2seq = predictor.predict_ids([input_ids[i] for i in batch])
+            for i, pred in zip(batch, pred_seq2seq):
+                predict[i] = post_processing(pred)
+
+        records = sel2record.sel2record_batch(pred_list=predict, text_list=text_list, token_list=token_list)
 
         results = dict()
         for task, scorer in task_dict.items():
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import nltk
+from nltk.tokenize import word_tokenize
+
+from inference import HuggingfacePredictor, bucket_batches, post_processing
+from uie.sel2record.record import MapConfig
+from uie.sel2record.sel2record import SEL2Record
+
+logger = logging.getLogger(__name__)
+
+
+class PendingText:
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class CoalescingExtractor:
+    """
+    Keeps a HuggingfacePredictor and SEL2Record in memory and serves
+    extraction requests from multiple threads. Texts of concurrent
+    requests are collected for at most max_wait_ms, sorted by their
+    tokenized length and split into generate() batches (see
+    bucket_batches), so that short and long inputs are not padded together.
+    At most max_collect texts are collected for one round.
+    """
+
+    def __init__(self, predictor, sel2record, sent_tokenizer, batch_size=16, max_tokens=0, max_wait_ms=10.0,
+                 max_collect=256):
+        self._predictor = predictor
+        self._sel2record = sel2record
+        self._sent_tokenizer = sent_tokenizer
+        self._batch_size = batch_size
+        self._max_tokens = max_tokens
+        self._max_wait = max_wait_ms / 1000
+        self._max_collect = max(max_collect, 1)
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'texts': 0, 'batches': 0, 'busy_seconds': 0.0}
+
+    def start(self):
+        self._worker.start()
+
+    def tokenize(self, text):
+        """
+        Word tokenization used for the offsets of the records, the same as
+        in inference_sentence.py.
+        """
+        return [token for sent in self._sent_tokenizer.tokenize(text) for token in word_tokenize(sent)]
+
+    def prepare(self, instances):
+        """
+        Checks and tokenizes the instances of a request.
+
+        Args:
+            instances (list): Each instance is either a text or a dict with
+                a "text" and optionally its "tokens".
+
+        Returns:
+            list: A PendingText for each instance.
+
+        Raises:
+            ValueError: If an instance is not a text, its "text" is not a
+                string or its "tokens" are not a list of strings.
+        """
+        if not isinstance(instances, list):
+            raise ValueError("texts must be a list")
+        pending = list()
+        for instance in instances:
+            if isinstance(instance, str):
+                instance = {'text': instance}
+            if not isinstance(instance, dict):
+                raise ValueError(f"instance must be a text or an object, not {type(instance).__name__}")
+            text = instance.get('text')
+            if not isinstance(text, str):
+                raise ValueError(f"text must be a string, not {type(text).__name__}")
+            tokens = instance.get('tokens')
+            if tokens is not None and not (isinstance(tokens, list) and all(isinstance(token, str) for token in tokens)):
+                raise ValueError("tokens must be a list of strings")
+            pending += [PendingText(text, tokens or self.tokenize(text))]
+        return pending
+
+    def extract(self, instances):
+        """
+        Args:
+            instances (list): Same as for prepare().
+
+        Returns:
+            list: For each instance a dict with the text, tokens, the
+                generated SEL string and the offset/string records.
+        """
+        return self.submit(self.prepare(instances))
+
+    def submit(self, pending):
+        """
+        Queues the prepared texts and blocks until all of them are predicted.
+        """
+        for item in pending:
+            self._queue.put(item)
+
+        results = list()
+        for item in pending:
+            item.done.wait()
+            if item.error is not None:
+                raise item.error
+            results += [item.result]
+        with self._stats_lock:
+            self.stats['requests'] += 1
+        return results
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.time() + self._max_wait
+        while len(items) < self._max_collect:
+            timeout = deadline - time.time()
+            try:
+                if timeout <= 0:
+                    items += [self._queue.get_nowait()]
+                else:
+                    items += [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                break
+        return items
+
+    def _encode(self, items):
+        """
+        Encodes the texts of the items. If the batch fails, the items are
+        encoded one by one and only the failing ones are finished with
+        their error.
+
+        Returns:
+            tuple: The encoded items and their input ids.
+        """
+        try:
+            return items, self._predictor.encode_ids([item.text for item in items])
+        except Exception:
+            encoded_items, input_ids = list(), list()
+            for item in items:
+                try:
+                    input_ids += self._predictor.encode_ids([item.text])
+                    encoded_items += [item]
+                except Exception as error:
+                    logger.exception("Error while encoding a text")
+                    item.error = error
+                    item.done.set()
+            return encoded_items, input_ids
+
+    def _run(self):
+        while True:
+            items, input_ids = self._encode(self._collect())
+            lengths = [len(x) for x in input_ids]
+
+            for batch_indices in bucket_batches(lengths, self._batch_size, self._max_tokens):
+                batch = [items[i] for i in batch_indices]
+                start_time = time.time()
+                try:
+                    preds = [post_processing(pred) for pred in self._predictor.predict_ids([input_ids[i] for i in batch_indices])]
+                    records = self._sel2record.sel2record_batch(
+                        pred_list=preds,
+                        text_list=[item.text for item in batch],
+                        token_list=[item.tokens for item in batch],
+                    )
+                    for item, pred, record in zip(batch, preds, records):
+                        item.result = {
+                            'text': item.text,
+                            'tokens': item.tokens,
+                            'seq2seq': pred,
+                            'record': record,
+                        }
+                except Exception as error:
+                    logger.exception(f"Error while predicting a batch of {len(batch)} texts")
+                    for item in batch:
+                        item.error = error
+                with self._stats_lock:
+                    self.stats['texts'] += len(batch)
+                    self.stats['batches'] += 1
+                    self.stats['busy_seconds'] += time.time() - start_time
+                for item in batch:
+                    item.done.set()
+
+
+class ExtractionRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /extract  {"texts": ["...", {"text": "...", "tokens": [...]}]}
+    GET  /stats
+    """
+
+    def _send_json(self, code, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.server.extractor.stats)
+        else:
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/extract':
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            texts = json.loads(self.rfile.read(length).decode('utf-8'))['texts']
+            pending = self.server.extractor.prepare(texts)
+        except (ValueError, KeyError, TypeError) as error:
+            self._send_json(400, {'error': f"invalid request: {error}"})
+            return
+        try:
+            results = self.server.extractor.submit(pending)
+        except Exception as error:
+            self._send_json(500, {'error': str(error)})
+            return
+        self._send_json(200, {'results': results})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', '-m', default='./finetuned_models/base/tempeval_multi')
+    parser.add_argument('--schema', default='./etc/temporal_schema')
+    parser.add_argument('--max_source_length', default=256, type=int)
+    parser.add_argument('--max_target_length', default=192, type=int)
+    parser.add_argument('--batch_size', default=16, type=int)
+    parser.add_argument('--max_tokens', default=0, type=int,
+                        help='Maximum padded tokens per generate() batch (0: only --batch_size)')
+    parser.add_argument('--max_wait_ms', default=10.0, type=float,
+                        help='How long to wait for concurrent requests before generating')
+    parser.add_argument('--max_collect', default=256, type=int,
+                        help='Maximum texts that are collected and sorted by length at once')
+    parser.add_argument('--device', default=None,
+                        help='Torch device, e.g. cpu or cuda:0 (default: cuda if available)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', default=8001, type=int)
+    parser.add_argument('-c', '--config', dest='map_config', help='Offset Re-mapping Config',
+                        default='config/offset_map/closest_offset_en.yaml')
+    parser.add_argument('--decoding', default='spotasoc')
+    options = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s', level=logging.INFO)
+
+    predictor = HuggingfacePredictor(
+        model_path=options.model,
+        schema_file=f"{options.schema}/record.schema",
+        max_source_length=options.max_source_length,
+        max_target_length=options.max_target_length,
+        device=options.device,
+    )
+    map_config = MapConfig.load_from_yaml(options.map_config)
+    schema_dict = SEL2Record.load_schema_dict(options.schema)
+    sel2record = SEL2Record(
+        schema_dict=schema_dict,
+        decoding_schema=options.decoding,
+        map_config=map_config,
+    )
+    sent_tokenizer = nltk.data.load("tokenizers/punkt/english.pickle")
+
+    extractor = CoalescingExtractor(
+        predictor=predictor,
+        sel2record=sel2record,
+        sent_tokenizer=sent_tokenizer,
+        batch_size=options.batch_size,
+        max_tokens=options.max_tokens,
+        max_wait_ms=options.max_wait_ms,
+        max_collect=options.max_collect,
+    )
+    extractor.start()
+
+    httpd = ThreadingHTTPServer((options.host, options.port), ExtractionRequestHandler)
+    httpd.extractor = extractor
+    logger.info(f"Serving on http://{options.host}:{options.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Decoding throughput without constraints, with `prefix_allowed_tokens_fn` and with the
+batched ConstraintLogitsProcessor.
+
+Run from the uie directory:
+    PYTHONPATH=. python scripts/benchmark_constraint_decoding.py \
+        --data ../temporal-data/entity/uie-format/tempeval_multi \
+        --model finetuned_models/base/tempeval_multi
+"""
+import argparse
+import json
+import time
+
+import torch
+
+from inference import HuggingfacePredictor
+from uie.seq2seq.constraint_decoder import (
+    get_constraint_decoder,
+    ConstraintLogitsProcessor,
+    generate_with_logits_processor
+)
+
+
+def run(predictor, constraint_decoder, batches, mode, num_beams):
+    model = predictor._model
+    outputs = list()
+    total = 0.
+    with torch.no_grad():
+        for batch in batches:
+            inputs = predictor.pad_ids(batch)
+            gen_kwargs = {
+                'input_ids': inputs['input_ids'],
+                'attention_mask': inputs['attention_mask'],
+                'max_length': predictor._max_target_length,
+                'num_beams': num_beams,
+            }
+            start = time.perf_counter()
+            if mode == 'none':
+                generated = model.generate(**gen_kwargs)
+            else:
+                constraint_decoder.prepare_batch(inputs['input_ids'])
+                if mode == 'prefix_fn':
+                    generated = model.generate(
+                        prefix_allowed_tokens_fn=lambda batch_id, sent: constraint_decoder.batch_constraint_decoding(
+                            batch_id, sent),
+                        **gen_kwargs)
+                else:
+                    processor = ConstraintLogitsProcessor(constraint_decoder, num_beams=num_beams)
+                    generated = generate_with_logits_processor(model, processor, **gen_kwargs)
+            if generated.is_cuda:
+                torch.cuda.synchronize()
+            total += time.perf_counter() - start
+            outputs += generated.tolist()
+    return total, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', '-d', default='../temporal-data/entity/uie-format/tempeval_multi')
+    parser.add_argument('--model', '-m', default='./finetuned_models/base/tempeval_multi')
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--batch_size', default=16, type=int)
+    parser.add_argument('--num_beams', default=1, type=int)
+    parser.add_argument('--max_source_length', default=256, type=int)
+    parser.add_argument('--max_target_length', default=192, type=int)
+    parser.add_argument('--max_instances', default=0, type=int, help='0: all instances of the split')
+    parser.add_argument('--device', default=None)
+    options = parser.parse_args()
+
+    predictor = HuggingfacePredictor(
+        model_path=options.model,
+        schema_file=f"{options.data}/record.schema",
+        max_source_length=options.max_source_length,
+        max_target_length=options.max_target_length,
+        device=options.device,
+    )
+    constraint_decoder = get_constraint_decoder(tokenizer=predictor._tokenizer,
+                                                type_schema=predictor._schema,
+                                                decoding_schema='spotasoc',
+                                                task_name='record')
+
+    text_list = [json.loads(line)['text'] for line in open(f"{options.data}/{options.split}.json")]
+    if options.max_instances > 0:
+        text_list = text_list[:options.max_instances]
+    input_ids = predictor.encode_ids(text_list)
+    batches = [input_ids[index: index + options.batch_size] for index in range(0, len(input_ids), options.batch_size)]
+    print(f"Instances: {len(text_list)}, batch size {options.batch_size}, beams {options.num_beams}")
+
+    # Warm-up
+    run(predictor, constraint_decoder, batches[:1], 'none', options.num_beams)
+
+    results = dict()
+    for mode in ['none', 'prefix_fn', 'processor']:
+        seconds, outputs = run(predictor, constraint_decoder, batches, mode, options.num_beams)
+        results[mode] = outputs
+        print(f"{mode:10s}: {seconds:.2f} s, {len(text_list) / seconds:.1f} sentences/s")
+
+    mismatch = sum(a != b for a, b in zip(results['prefix_fn'], results['processor']))
+    print(f"Identical constrained outputs: {mismatch == 0} ({mismatch} mismatches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Micro-benchmark of SpotAsocPredictParser.decode against the former nltk.Tree based
+decoding on the seq2seq predictions of the 10-fold cross-validation
+(the *_preds_seq2seq.txt files written by crossvalidation_evaluation.py).
+
+Run from the uie directory:
+    PYTHONPATH=. python scripts/benchmark_predict_parser.py \
+        --logfiles_dir output/base_tempeval_multi_crossvalidation_logfiles \
+        --base_data_dir ../temporal-data/entity/my_converted_datasets/uie-format \
+        --dataset_name tempeval_multi
+"""
+import argparse
+from collections import Counter
+import glob
+import json
+import os
+import time
+
+from nltk.tree import ParentedTree
+
+from uie.extraction.constants import type_start, type_end
+from uie.extraction.predict_parser.spotasoc_predict_parser import (
+    SpotAsocPredictParser,
+    add_bracket,
+    brackets,
+    check_well_form,
+    clean_text,
+    convert_bracket,
+    left_bracket,
+    right_bracket,
+)
+from uie.sel2record.sel2record import SEL2Record
+
+
+class NltkSpotAsocPredictParser(SpotAsocPredictParser):
+    """ SpotAsocPredictParser with the former decoding through nltk.tree.ParentedTree """
+
+    def decode(self, gold_list, pred_list, text_list=None, raw_list=None):
+        counter = Counter()
+        well_formed_list = []
+
+        if gold_list is None or len(gold_list) == 0:
+            gold_list = ["%s%s" % (type_start, type_end)] * len(pred_list)
+
+        if text_list is None:
+            text_list = [None] * len(pred_list)
+
+        if raw_list is None:
+            raw_list = [None] * len(pred_list)
+
+        for gold, pred, text, raw_data in zip(gold_list, pred_list, text_list, raw_list):
+            gold = convert_bracket(gold)
+            pred = convert_bracket(pred)
+
+            pred = clean_text(pred)
+
+            try:
+                gold_tree = ParentedTree.fromstring(gold, brackets=brackets)
+            except ValueError:
+                gold_tree = ParentedTree.fromstring(add_bracket(gold), brackets=brackets)
+                counter.update(['gold_tree add_bracket'])
+
+            instance = {
+                'gold': gold,
+                'pred': pred,
+                'gold_tree': gold_tree,
+                'text': text,
+                'raw_data': raw_data
+            }
+
+            counter.update(['gold_tree' for _ in gold_tree])
+
+            instance['gold_spot'], instance['gold_asoc'], instance['gold_record'] = self.get_record_list(
+                sel_tree=instance["gold_tree"],
+                text=instance['text']
+            )
+
+            try:
+                if not check_well_form(pred):
+                    pred = add_bracket(pred)
+                    counter.update(['fixed'])
+
+                pred_tree = ParentedTree.fromstring(pred, brackets=brackets)
+                counter.update(['pred_tree' for _ in pred_tree])
+
+                instance['pred_tree'] = pred_tree
+                counter.update(['well-formed'])
+
+            except ValueError:
+                counter.update(['ill-formed'])
+                instance['pred_tree'] = ParentedTree.fromstring(left_bracket + right_bracket, brackets=brackets)
+
+            instance['pred_spot'], instance['pred_asoc'], instance['pred_record'] = self.get_record_list(
+                sel_tree=instance["pred_tree"],
+                text=instance['text']
+            )
+
+            well_formed_list += [instance]
+
+        return well_formed_list, counter
+
+
+def tree_to_tuple(tree):
+    """ (label, children) of a SELTree or nltk Tree, to compare the parsed trees """
+    if isinstance(tree, str):
+        return tree
+    return tree.label(), [tree_to_tuple(child) for child in tree]
+
+
+def comparable(decoded):
+    well_formed_list, counter = decoded
+    instances = list()
+    for instance in well_formed_list:
+        instance = dict(instance)
+        instance['gold_tree'] = tree_to_tuple(instance['gold_tree'])
+        instance['pred_tree'] = tree_to_tuple(instance['pred_tree'])
+        instances += [instance]
+    return instances, counter
+
+
+def load_prediction_sets(logfiles_dir, base_data_dir, dataset_name):
+    """ (schema folder, predictions, texts) of every val/test prediction file of the folds """
+    prediction_sets = list()
+    for fold in range(10):
+        gold_directory = os.path.join(base_data_dir, f"{dataset_name}_fold_{fold}")
+        for evaluation_type in ["val", "test"]:
+            text_list = [json.loads(line)['text'] for line in open(os.path.join(gold_directory, f"{evaluation_type}.json"))]
+            pattern = os.path.join(logfiles_dir, f"*_fold_{fold}*_{evaluation_type}_preds_seq2seq.txt")
+            for prediction_file in sorted(glob.glob(pattern)):
+                pred_list = [line.strip() for line in open(prediction_file)]
+                assert len(pred_list) == len(text_list)
+                prediction_sets += [(gold_directory, pred_list, text_list)]
+    return prediction_sets
+
+
+def time_decode(parsers, prediction_sets, repeat):
+    best, decoded = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded = [parsers[schema].decode(gold_list=[], pred_list=pred_list, text_list=text_list)
+                   for schema, pred_list, text_list in prediction_sets]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, decoded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfiles_dir', '-l', default='output/base_tempeval_multi_crossvalidation_logfiles')
+    parser.add_argument('--base_data_dir', '-bd', default='../temporal-data/entity/my_converted_datasets/uie-format')
+    parser.add_argument('--dataset_name', '-d', default='tempeval_multi')
+    parser.add_argument('--repeat', default=3, type=int)
+    options = parser.parse_args()
+
+    prediction_sets = load_prediction_sets(options.logfiles_dir, options.base_data_dir, options.dataset_name)
+    num_predictions = sum(len(x[1]) for x in prediction_sets)
+    print(f"Prediction files: {len(prediction_sets)}, predictions: {num_predictions}")
+
+    schemas = set(x[0] for x in prediction_sets)
+    label_constraints = {schema: SEL2Record.load_schema_dict(schema)['record'] for schema in schemas}
+    nltk_parsers = {schema: NltkSpotAsocPredictParser(label_constraint=label_constraints[schema]) for schema in schemas}
+    sel_parsers = {schema: SpotAsocPredictParser(label_constraint=label_constraints[schema]) for schema in schemas}
+
+    nltk_time, nltk_decoded = time_decode(nltk_parsers, prediction_sets, options.repeat)
+    sel_time, sel_decoded = time_decode(sel_parsers, prediction_sets, options.repeat)
+
+    identical = [comparable(x) for x in nltk_decoded] == [comparable(x) for x in sel_decoded]
+    print(f"Identical records and counters: {identical}")
+    print(f"nltk.Tree decode: {nltk_time * 1000:.1f} ms ({num_predictions / nltk_time:.0f} predictions/s)")
+    print(f"SEL parser      : {sel_time * 1000:.1f} ms ({num_predictions / sel_time:.0f} predictions/s, "
+          f"{nltk_time / sel_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Throughput of SEL2Record on the seq2seq predictions of the 10-fold cross-validation
+(the *_preds_seq2seq.txt files written by crossvalidation_evaluation.py).
+
+Run from the uie directory:
+    PYTHONPATH=. python scripts/benchmark_sel2record.py \
+        --logfiles_dir output/base_tempeval_multi_crossvalidation_logfiles \
+        --base_data_dir ../temporal-data/entity/my_converted_datasets/uie-format \
+        --dataset_name tempeval_multi
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from uie.sel2record.record import MapConfig
+from uie.sel2record.sel2record import SEL2Record, task_record_map
+
+
+def load_prediction_sets(logfiles_dir, base_data_dir, dataset_name):
+    """ (schema folder, predictions, texts, tokens) of every val/test prediction file of the folds """
+    prediction_sets = list()
+    for fold in range(10):
+        gold_directory = os.path.join(base_data_dir, f"{dataset_name}_fold_{fold}")
+        for evaluation_type in ["val", "test"]:
+            gold_list = [json.loads(line) for line in open(os.path.join(gold_directory, f"{evaluation_type}.json"))]
+            text_list = [gold['text'] for gold in gold_list]
+            token_list = [gold['tokens'] for gold in gold_list]
+            pattern = os.path.join(logfiles_dir, f"*_fold_{fold}*_{evaluation_type}_preds_seq2seq.txt")
+            for prediction_file in sorted(glob.glob(pattern)):
+                pred_list = [line.strip() for line in open(prediction_file)]
+                assert len(pred_list) == len(text_list)
+                prediction_sets += [(gold_directory, pred_list, text_list, token_list)]
+    return prediction_sets
+
+
+def per_instance(sel2record, pred_list, text_list, token_list):
+    """ One sel2record call per prediction with new record mappers, as before sel2record_batch """
+    records = list()
+    for pred, text, tokens in zip(pred_list, text_list, token_list):
+        sel2record._record_maps = {task: task_record_map[task](map_config=sel2record._map_config)
+                                   for task in task_record_map}
+        records += [sel2record.sel2record(pred=pred, text=text, tokens=tokens)]
+    return records
+
+
+def batched(sel2record, pred_list, text_list, token_list):
+    return sel2record.sel2record_batch(pred_list=pred_list, text_list=text_list, token_list=token_list)
+
+
+def time_function(function, sel2records, prediction_sets, repeat):
+    best, records = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = [function(sel2records[schema], pred_list, text_list, token_list)
+                   for schema, pred_list, text_list, token_list in prediction_sets]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfiles_dir', '-l', default='output/base_tempeval_multi_crossvalidation_logfiles')
+    parser.add_argument('--base_data_dir', '-bd', default='../temporal-data/entity/my_converted_datasets/uie-format')
+    parser.add_argument('--dataset_name', '-d', default='tempeval_multi')
+    parser.add_argument('-c', '--config', dest='map_config', default='config/offset_map/closest_offset_en.yaml')
+    parser.add_argument('--decoding', default='spotasoc')
+    parser.add_argument('--repeat', default=3, type=int)
+    options = parser.parse_args()
+
+    prediction_sets = load_prediction_sets(options.logfiles_dir, options.base_data_dir, options.dataset_name)
+    num_predictions = sum(len(x[1]) for x in prediction_sets)
+    print(f"Prediction files: {len(prediction_sets)}, predictions: {num_predictions}")
+
+    map_config = MapConfig.load_from_yaml(options.map_config)
+    sel2records = {
+        schema: SEL2Record(
+            schema_dict=SEL2Record.load_schema_dict(schema),
+            decoding_schema=options.decoding,
+            map_config=map_config,
+        ) for schema in set(x[0] for x in prediction_sets)
+    }
+
+    per_instance_time, per_instance_records = time_function(per_instance, sel2records, prediction_sets, options.repeat)
+    batched_time, batched_records = time_function(batched, sel2records, prediction_sets, options.repeat)
+
+    print(f"Identical records: {per_instance_records == batched_records}")
+    print(f"sel2record       : {per_instance_time * 1000:.1f} ms ({num_predictions / per_instance_time:.0f} predictions/s)")
+    print(f"sel2record_batch : {batched_time * 1000:.1f} ms ({num_predictions / batched_time:.0f} predictions/s, "
+          f"{per_instance_time / batched_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
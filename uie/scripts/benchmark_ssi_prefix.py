@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Benchmark of the cached SSI prefix in HuggingfacePredictor.
+
+Run from the uie directory:
+    PYTHONPATH=. python scripts/benchmark_ssi_prefix.py \
+        --data ../temporal-data/entity/uie-format/tempeval_multi \
+        --model finetuned_models/base/tempeval_multi
+"""
+import argparse
+import json
+import math
+import time
+
+import torch
+
+from inference import HuggingfacePredictor
+
+
+def time_tokenization(predictor, text_list, batch_size, cache_prefix):
+    input_ids = list()
+    start = time.perf_counter()
+    for index in range(math.ceil(len(text_list) / batch_size)):
+        batch = text_list[index * batch_size: (index + 1) * batch_size]
+        input_ids += predictor.encode_ids(batch, cache_prefix=cache_prefix)
+    return time.perf_counter() - start, input_ids
+
+
+def time_encoder(predictor, input_ids_list, batch_size, skip_prefix):
+    """ Encoder forward time over all batches, optionally without the prefix tokens """
+    prefix_length = len(predictor._ssi_ids)
+    encoder = predictor._model.get_encoder()
+    total = 0.
+    with torch.no_grad():
+        for index in range(math.ceil(len(input_ids_list) / batch_size)):
+            batch = input_ids_list[index * batch_size: (index + 1) * batch_size]
+            if skip_prefix:
+                batch = [x[prefix_length:] for x in batch]
+            inputs = predictor._tokenizer.pad(
+                {'input_ids': batch}, padding=True, return_tensors='pt').to(predictor._model.device)
+            start = time.perf_counter()
+            encoder(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask'])
+            if inputs['input_ids'].is_cuda:
+                torch.cuda.synchronize()
+            total += time.perf_counter() - start
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', '-d', default='../temporal-data/entity/uie-format/tempeval_multi')
+    parser.add_argument('--model', '-m', default='./finetuned_models/base/tempeval_multi')
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--batch_size', default=16, type=int)
+    parser.add_argument('--max_source_length', default=256, type=int)
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--repeat', default=3, type=int)
+    parser.add_argument('--skip_encoder', action='store_true')
+    options = parser.parse_args()
+
+    predictor = HuggingfacePredictor(
+        model_path=options.model,
+        schema_file=f"{options.data}/record.schema",
+        max_source_length=options.max_source_length,
+        device=options.device,
+    )
+    text_list = [json.loads(line)['text'] for line in open(f"{options.data}/{options.split}.json")]
+
+    print(f"SSI prefix: {predictor._ssi!r} ({len(predictor._ssi_ids)} tokens)")
+    print(f"Instances: {len(text_list)}")
+
+    full_time, full_ids = min(
+        (time_tokenization(predictor, text_list, options.batch_size, cache_prefix=False)
+         for _ in range(options.repeat)), key=lambda x: x[0])
+    cached_time, cached_ids = min(
+        (time_tokenization(predictor, text_list, options.batch_size, cache_prefix=True)
+         for _ in range(options.repeat)), key=lambda x: x[0])
+    mismatch = sum(a != b for a, b in zip(full_ids, cached_ids))
+
+    num_tokens = sum(len(x) for x in full_ids)
+    num_prefix_tokens = len(predictor._ssi_ids) * len(full_ids)
+    print(f"Identical input ids: {mismatch == 0} ({mismatch} mismatches)")
+    print(f"Tokenization full    : {full_time * 1000:.1f} ms")
+    print(f"Tokenization cached  : {cached_time * 1000:.1f} ms ({full_time / cached_time:.2f}x)")
+    print(f"Prefix share of encoder input tokens: {num_prefix_tokens / num_tokens * 100:.1f}%")
+
+    if not options.skip_encoder:
+        # The T5 encoder attends bidirectionally, so the prefix states depend on
+        # the text and can not be reused exactly; this is the upper bound of
+        # what removing the prefix from the encoder would save.
+        with_prefix = time_encoder(predictor, full_ids, options.batch_size, skip_prefix=False)
+        without_prefix = time_encoder(predictor, full_ids, options.batch_size, skip_prefix=True)
+        print(f"Encoder with prefix   : {with_prefix * 1000:.1f} ms")
+        print(f"Encoder without prefix: {without_prefix * 1000:.1f} ms "
+              f"({(1 - without_prefix / with_prefix) * 100:.1f}% upper bound saving)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Benchmark of the relaxed span matching of the temporal scorer on the 10-fold
+cross-validation predictions written by crossvalidation_evaluation.py.
+
+Run from the uie directory:
+    PYTHONPATH=. python scripts/benchmark_temporal_scorer.py \
+        --logfiles_dir output/base_tempeval_multi_crossvalidation_logfiles \
+        --base_data_dir ../temporal-data/entity/my_converted_datasets/uie-format \
+        --dataset_name tempeval_multi
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from uie.extraction.scorer import RelaxedSpanIndex, TemporalMetric, TemporalTypeScorer
+
+EVAL_TYPES = ["strict_typespan", "strict_span", "relaxed_typespan", "relaxed_span"]
+
+
+def nested_relaxed_match(pred, gold_list, metric):
+    """ The nested loop matching the index replaced """
+    pred_parts = pred[1].split(" ") if metric == "string" else pred[1]
+    for index, gold in enumerate(gold_list):
+        gold_parts = gold[1].split(" ") if metric == "string" else gold[1]
+        for p_o in pred_parts:
+            for g_o in gold_parts:
+                if p_o == g_o:
+                    return index
+    return -1
+
+
+def relaxed_span_nested(gold_list, pred_list, metric):
+    dup_gold_list = list(gold_list)
+    matches = list()
+    for pred in pred_list:
+        index = nested_relaxed_match(pred, dup_gold_list, metric)
+        matches += [dup_gold_list[index] if index >= 0 else None]
+        if index >= 0:
+            del dup_gold_list[index]
+    return matches
+
+
+def relaxed_span_indexed(gold_list, pred_list, metric):
+    relaxed_index = RelaxedSpanIndex(gold_list, metric)
+    matches = list()
+    for pred in pred_list:
+        index = relaxed_index.first_match(pred[1])
+        matches += [gold_list[index] if index >= 0 else None]
+        if index >= 0:
+            relaxed_index.remove(index)
+    return matches
+
+
+def per_metric_evaluation(gold_instance_list, pred_instance_list):
+    """ One TemporalMetric.count_instance_for_type call per eval type, entity type and metric, one index per sentence """
+    for pred, gold in zip(pred_instance_list, gold_instance_list):
+        relaxed_indexes = {eval_key: RelaxedSpanIndex(gold.get(eval_key, []), eval_key) for eval_key in ['offset', 'string']}
+        for eval_type in EVAL_TYPES:
+            for entity_type in TemporalTypeScorer.entity_types:
+                for eval_key in ['offset', 'string']:
+                    TemporalMetric(entity_type).count_instance_for_type(
+                        gold_list=gold.get(eval_key, []),
+                        pred_list=pred.get(eval_key, []),
+                        eval_type=eval_type,
+                        metric=eval_key,
+                        relaxed_index=relaxed_indexes[eval_key],
+                    )
+
+
+def load_prediction_sets(logfiles_dir, base_data_dir, dataset_name):
+    """ (gold instances, predicted instances) of every val/test prediction file of the folds """
+    prediction_sets = list()
+    for fold in range(10):
+        gold_directory = os.path.join(base_data_dir, f"{dataset_name}_fold_{fold}")
+        for evaluation_type in ["val", "test"]:
+            gold_entries = [json.loads(line) for line in open(os.path.join(gold_directory, f"{evaluation_type}.json"))]
+            gold_instance_list = TemporalTypeScorer.load_gold_list([x["entity"] for x in gold_entries])
+            pattern = os.path.join(logfiles_dir, f"*_fold_{fold}*_{evaluation_type}_preds_record.txt")
+            for prediction_file in sorted(glob.glob(pattern)):
+                predict_records = [json.loads(line) for line in open(prediction_file)]
+                pred_instance_list = TemporalTypeScorer.load_pred_list([x["entity"] for x in predict_records])
+                prediction_sets += [(gold_instance_list, pred_instance_list)]
+    return prediction_sets
+
+
+def best_time(function, repeat):
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings += [time.perf_counter() - start]
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfiles_dir', '-l', default='output/base_tempeval_multi_crossvalidation_logfiles')
+    parser.add_argument('--base_data_dir', '-bd', default='../temporal-data/entity/my_converted_datasets/uie-format')
+    parser.add_argument('--dataset_name', '-d', default='tempeval_multi')
+    parser.add_argument('--repeat', default=3, type=int)
+    options = parser.parse_args()
+
+    prediction_sets = load_prediction_sets(options.logfiles_dir, options.base_data_dir, options.dataset_name)
+    num_sentences = sum(len(gold) for gold, _ in prediction_sets)
+    num_entities = sum(len(x.get('offset', [])) for gold, pred in prediction_sets for x in gold + pred)
+    print(f"Prediction files: {len(prediction_sets)}")
+    print(f"Sentences: {num_sentences}, gold and predicted entities: {num_entities}")
+
+    sentences = [(gold.get(key, []), pred.get(key, []), key)
+                 for gold_list, pred_list in prediction_sets
+                 for gold, pred in zip(gold_list, pred_list)
+                 for key in ['offset', 'string']]
+    mismatch = sum(relaxed_span_nested(*x) != relaxed_span_indexed(*x) for x in sentences)
+    print(f"Identical relaxed matches: {mismatch == 0} ({mismatch} mismatches)")
+
+    nested_time = best_time(lambda: [relaxed_span_nested(*x) for x in sentences], options.repeat)
+    indexed_time = best_time(lambda: [relaxed_span_indexed(*x) for x in sentences], options.repeat)
+    print(f"Relaxed matching nested : {nested_time * 1000:.1f} ms")
+    print(f"Relaxed matching indexed: {indexed_time * 1000:.1f} ms ({nested_time / indexed_time:.2f}x)")
+
+    per_metric_time = best_time(lambda: [per_metric_evaluation(*x) for x in prediction_sets], options.repeat)
+    scorer_time = best_time(lambda: [TemporalTypeScorer.eval_instance_list(*x) for x in prediction_sets], options.repeat)
+    print(f"Per metric evaluation   : {per_metric_time * 1000:.1f} ms")
+    print(f"TemporalTypeScorer      : {scorer_time * 1000:.1f} ms ({per_metric_time / scorer_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -61,10 +61,7 @@ def main():
 
             assert len(gold_text_list) == len(pred_list)
 
-            pred_records = list()
-            for pred, text, tokens in zip(pred_list, gold_text_list, gold_token_list):
-                pred_record = sel2record.sel2record(pred, text, tokens)
-                pred_records += [pred_record]
+            pred_records = sel2record.sel2record_batch(pred_list, gold_text_list, gold_token_list)
 
             with open(os.path.join(pred_folder, record_file), 'w') as output:
                 for record in pred_records:
@@ -2,7 +2,6 @@
 # -*- coding:utf-8 -*-
 from collections import Counter
 import logging
-from nltk.tree import ParentedTree
 import re
 from typing import Tuple, List, Dict
 
@@ -24,6 +23,9 @@ right_bracket = '】'
 brackets = left_bracket + right_bracket
 
 split_bracket = re.compile(r"<extra_id_\d>")
+split_special = re.compile(r"(<extra_id_\d>)")
+sel_token = re.compile(r"[%s]|[^\s%s]+" % (brackets, brackets))
+special_to_bracket = {type_start: left_bracket, type_end: right_bracket}
 
 
 def add_space(text):
@@ -104,6 +106,91 @@ def add_bracket(tree_str):
     return ' '.join(tree_str_list)
 
 
+class SELTree(list):
+    """ Tree of a SEL expression, a list of sub trees and words with a label like nltk.Tree
+    """
+    __slots__ = ('_label',)
+
+    def __init__(self, label, children=()):
+        self._label = label
+        self.extend(children)
+
+    def label(self):
+        return self._label
+
+    def __repr__(self):
+        return '%s(%r, %s)' % (type(self).__name__, self._label, list.__repr__(self))
+
+
+def sel_tokens(text):
+    """ convert_bracket(text).split() in a single pass over the special tokens
+    """
+    parts = split_special.split(text)
+    tokens = list()
+    for index in range(1, len(parts), 2):
+        tokens += [special_to_bracket.get(parts[index], parts[index])]
+        tokens += parts[index + 1].split()
+    return tokens
+
+
+def clean_sel_tokens(tokens):
+    """ clean_text and find_bracket_num on tokens:
+    the tokens up to the first complete tree and their bracket number
+    """
+    count = 0
+    for index, token in enumerate(tokens):
+        if token == left_bracket:
+            count += 1
+        elif token == right_bracket:
+            count -= 1
+        else:
+            continue
+        if count == 0:
+            return tokens[:index + 1], 0
+    return tokens, count
+
+
+def parse_sel_tokens(tokens):
+    """ Parse SEL tokens into a SELTree, as nltk.Tree.fromstring(' '.join(tokens), brackets=brackets)
+    A word following a left bracket is the label of the tree, a single tree is expected.
+    Raise ValueError for ill-formed expressions.
+    """
+    root = list()
+    stack = [root]
+    tree = None
+    read_label = False
+    for index, token in enumerate(tokens):
+        if token == left_bracket:
+            if tree is None and len(root) > 0:
+                raise ValueError('Expected end-of-string at token %s: %s' % (index, tokens))
+            tree = SELTree('')
+            stack[-1].append(tree)
+            stack += [tree]
+            read_label = True
+        elif tree is None:
+            raise ValueError('Expected %s at token %s: %s' % (left_bracket, index, tokens))
+        elif token == right_bracket:
+            stack.pop()
+            tree = stack[-1] if len(stack) > 1 else None
+            read_label = False
+        elif read_label:
+            tree._label = token
+            read_label = False
+        else:
+            tree.append(token)
+    if tree is not None:
+        raise ValueError('Expected %s at end-of-string: %s' % (right_bracket, tokens))
+    if len(root) == 0:
+        raise ValueError('Expected %s at end-of-string: %s' % (left_bracket, tokens))
+    return root[0]
+
+
+def parse_sel(tree_str):
+    """ Parse a bracket SEL string into a SELTree
+    """
+    return parse_sel_tokens(sel_token.findall(tree_str))
+
+
 def get_tree_str(tree):
     """get str from sel tree
     """
@@ -172,17 +259,23 @@ class SpotAsocPredictParser(PredictParser):
         for gold, pred, text, raw_data in zip(gold_list, pred_list, text_list,
                                               raw_list):
             gold = convert_bracket(gold)
-            pred = convert_bracket(pred)
 
-            pred = clean_text(pred)
+            if left_bracket in pred or right_bracket in pred:
+                # Brackets in the generated words are split like in the bracket string
+                pred = clean_text(convert_bracket(pred))
+                pred_tokens = sel_token.findall(pred)
+                fixed_tokens = None if check_well_form(pred) else sel_token.findall(add_bracket(pred))
+            else:
+                pred_tokens, bracket_num = clean_sel_tokens(sel_tokens(pred))
+                pred = ' '.join(pred_tokens)
+                fixed_tokens = None if bracket_num == 0 else pred_tokens + [right_bracket] * bracket_num
 
             try:
-                gold_tree = ParentedTree.fromstring(gold, brackets=brackets)
+                gold_tree = parse_sel(gold)
             except ValueError:
                 logger.warning(f"Ill gold: {gold}")
                 logger.warning(f"Fix gold: {add_bracket(gold)}")
-                gold_tree = ParentedTree.fromstring(
-                    add_bracket(gold), brackets=brackets)
+                gold_tree = parse_sel(add_bracket(gold))
                 counter.update(['gold_tree add_bracket'])
 
             instance = {
@@ -201,11 +294,11 @@ class SpotAsocPredictParser(PredictParser):
             )
 
             try:
-                if not check_well_form(pred):
-                    pred = add_bracket(pred)
+                if fixed_tokens is not None:
+                    pred_tokens = fixed_tokens
                     counter.update(['fixed'])
 
-                pred_tree = ParentedTree.fromstring(pred, brackets=brackets)
+                pred_tree = parse_sel_tokens(pred_tokens)
                 counter.update(['pred_tree' for _ in pred_tree])
 
                 instance['pred_tree'] = pred_tree
@@ -214,10 +307,7 @@ class SpotAsocPredictParser(PredictParser):
             except ValueError:
                 counter.update(['ill-formed'])
                 logger.debug('ill-formed', pred)
-                instance['pred_tree'] = ParentedTree.fromstring(
-                    left_bracket + right_bracket,
-                    brackets=brackets
-                )
+                instance['pred_tree'] = SELTree('')
 
             instance['pred_spot'], instance['pred_asoc'], instance['pred_record'] = self.get_record_list(
                 sel_tree=instance["pred_tree"],
@@ -231,7 +321,7 @@ class SpotAsocPredictParser(PredictParser):
     def get_record_list(self, sel_tree, text=None):
         """ Convert single sel expression to extraction records
         Args:
-            sel_tree (Tree): sel tree
+            sel_tree (SELTree): sel tree
             text (str, optional): _description_. Defaults to None.
         Returns:
             spot_list: list of (spot_type: str, spot_span: str)
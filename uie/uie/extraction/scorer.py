@@ -2,7 +2,7 @@
 # -*- coding:utf-8 -*-
 from collections import defaultdict
 from copy import deepcopy
-from typing import Dict, List, Tuple, Set
+from typing import Dict, Iterable, List, Tuple, Set
 import sys
 
 
@@ -80,40 +80,74 @@ class Metric:
             self.count_instance(gold_list=gold_list, pred_list=pred_list)
 
 
+class RelaxedSpanIndex:
+    """ Gold entities of a sentence indexed by their offsets (or words) for the relaxed span matching
+
+    Every offset/word points to the ascending indexes of the gold entities containing it and a
+    pointer per offset/word skips the removed gold entities, so the first remaining gold entity
+    sharing an offset/word with a prediction is found in the length of the prediction.
+    """
+
+    def __init__(self, gold_list, metric):
+        if metric not in {"offset", "string"}:
+            raise NotImplementedError(f"Metric {metric} not implemented")
+        self.metric = metric
+        self.positions = dict()
+        for index, gold in enumerate(gold_list):
+            for part in self.span_parts(gold[1]):
+                positions = self.positions.setdefault(part, [])
+                # an offset/word can appear twice in one gold entity
+                if not positions or positions[-1] != index:
+                    positions.append(index)
+        self.removed = [False] * len(gold_list)
+        self.starts = dict()
+
+    def span_parts(self, span):
+        return span.split(" ") if self.metric == "string" else span
+
+    def reset(self):
+        """ Restore all removed gold entities """
+        self.removed = [False] * len(self.removed)
+        self.starts = dict()
+
+    def remove(self, index):
+        self.removed[index] = True
+
+    def first_match(self, span):
+        """ Index of the first remaining gold entity sharing an offset/word with the span, -1 if none """
+        first = -1
+        removed = self.removed
+        for part in self.span_parts(span):
+            positions = self.positions.get(part)
+            if positions is None:
+                continue
+            start = self.starts.get(part, 0)
+            while start < len(positions) and removed[positions[start]]:
+                start += 1
+            if start:
+                self.starts[part] = start
+            if start < len(positions) and (first < 0 or positions[start] < first):
+                first = positions[start]
+        return first
+
+
 class TemporalMetric(Metric):
     def __init__(self, temporal_entity_type, verbose=False, match_mode='normal'):
         super().__init__(verbose, match_mode) 
         self.temporal_entity_type = temporal_entity_type
 
-    def _is_rleaxed_span_match_offset(self, pred, gold_list):
-        is_relaxed_match = False
-        pred_offset = pred[1]
-        for index, gold in enumerate(gold_list):
-            gold_offset = gold[1]
-            for p_o in pred_offset:
-                for g_o in gold_offset:
-                    if p_o == g_o:
-                        is_relaxed_match = True
-                        return is_relaxed_match, index
-        index = -1
-        return is_relaxed_match, index
+    def _is_rleaxed_span_match_offset(self, pred, relaxed_index):
+        """ relaxed_index: RelaxedSpanIndex of the gold entities by offset, built once per sentence """
+        index = relaxed_index.first_match(pred[1])
+        return index >= 0, index
     
-    def _is_rleaxed_span_match_string(self, pred, gold_list):
-        is_relaxed_match = False
-        pred_string = pred[1]
-        pred_string_split = pred_string.split(" ")
-        for index, gold in enumerate(gold_list):
-            gold_string = gold[1]
-            gold_string_split = gold_string.split(" ")
-            for p_o in pred_string_split:
-                for g_o in gold_string_split:
-                    if p_o == g_o:
-                        is_relaxed_match = True
-                        return is_relaxed_match, index
-        index = -1
-        return is_relaxed_match, index
-
-    def count_instance_for_type(self, gold_list, pred_list, eval_type, metric):
+    def _is_rleaxed_span_match_string(self, pred, relaxed_index):
+        """ relaxed_index: RelaxedSpanIndex of the gold entities by word, built once per sentence """
+        index = relaxed_index.first_match(pred[1])
+        return index >= 0, index
+
+    def count_instance_for_type(self, gold_list, pred_list, eval_type, metric, relaxed_index=None):
+        """ relaxed_index: optional RelaxedSpanIndex of gold_list for the metric, it is reset before the relaxed matching """
         is_misclassified = False
         for gold in gold_list:
             if gold[0] == self.temporal_entity_type or self.temporal_entity_type == "total":
@@ -122,7 +156,21 @@ class TemporalMetric(Metric):
             if pred[0] == self.temporal_entity_type or self.temporal_entity_type == "total":
                 self.pred_num += 1
 
-        dup_gold_list = deepcopy(gold_list)
+        if eval_type in {"relaxed_span", "relaxed_typespan"}:
+            # matched gold entities are removed from the index
+            if metric == "offset":
+                is_relaxed_span_match = self._is_rleaxed_span_match_offset
+            elif metric == "string":
+                is_relaxed_span_match = self._is_rleaxed_span_match_string
+            else:
+                raise NotImplementedError(f"Metric {metric} not implemented")
+            if relaxed_index is None:
+                relaxed_index = RelaxedSpanIndex(gold_list, metric)
+            else:
+                relaxed_index.reset()
+        else:
+            dup_gold_list = list(gold_list)
+
         if eval_type == "strict_span":
             if (self.temporal_entity_type == "total"):
                 for pred in pred_list:
@@ -138,16 +186,10 @@ class TemporalMetric(Metric):
         elif eval_type == "relaxed_span":
             if (self.temporal_entity_type == "total"):
                 for pred in pred_list:
-                    if metric == "offset":
-                        is_relaxed_match, index = self._is_rleaxed_span_match_offset(pred, dup_gold_list)
-                    elif metric == "string":
-                        is_relaxed_match, index = self._is_rleaxed_span_match_string(pred, dup_gold_list)
-                    else:
-                        raise NotImplementedError(f"Metric {metric} not implemented")
-                    
-                    if is_relaxed_match: 
-                            self.tp += 1
-                            del dup_gold_list[index]
+                    is_relaxed_match, index = is_relaxed_span_match(pred, relaxed_index)
+                    if is_relaxed_match:
+                        self.tp += 1
+                        relaxed_index.remove(index)
                     else:
                         is_misclassified = True
         elif eval_type == "strict_typespan":
@@ -160,18 +202,12 @@ class TemporalMetric(Metric):
                     is_misclassified = True
         elif eval_type == "relaxed_typespan":
             for pred in pred_list:
-                if metric == "offset":
-                    is_relaxed_match, index = self._is_rleaxed_span_match_offset(pred, dup_gold_list)
-                elif metric == "string":
-                    is_relaxed_match, index = self._is_rleaxed_span_match_string(pred, dup_gold_list)
-                else:
-                    raise NotImplementedError(f"Metric {metric} not implemented")
-                
-                if is_relaxed_match: 
+                is_relaxed_match, index = is_relaxed_span_match(pred, relaxed_index)
+                if is_relaxed_match:
                     if pred[0] == self.temporal_entity_type or self.temporal_entity_type == "total":
-                        if pred[0] == dup_gold_list[index][0]:
+                        if pred[0] == gold_list[index][0]:
                             self.tp += 1
-                            del dup_gold_list[index]
+                            relaxed_index.remove(index)
 
                 elif pred[0] == self.temporal_entity_type or self.temporal_entity_type == "total":
                     is_misclassified = True
@@ -302,6 +338,12 @@ class EntityScorer(Scorer):
             gold_instance_list += [gold_instance]
         return gold_instance_list
 
+    @staticmethod
+    def iter_gold_list(gold_list: Iterable[List[Dict]]):
+        """ Lazy version of `load_gold_list`, loads each instance when the iterable reaches it """
+        for gold in gold_list:
+            yield EntityScorer.load_gold_list([gold])[0]
+
     @staticmethod
     def load_pred_list(pred_list: List[Dict]):
         """[summary]
@@ -386,122 +428,155 @@ class EntityScorer(Scorer):
         return results
     
 
+class TemporalMatchTable:
+    """ Matching of the gold and predicted entities of one sentence, shared by all eval types and entity types
+
+    The strict matches do not depend on the entity type that is evaluated, the relaxed matches
+    only through the predictions that may remove a gold entity, so the gold entities are indexed
+    once and each relaxed matching is a cheap replay on the index.
+    Gives the same counts as `TemporalMetric.count_instance_for_type`.
+    """
+
+    def __init__(self, gold_list, pred_list, metric):
+        if metric not in {"offset", "string"}:
+            raise NotImplementedError(f"Metric {metric} not implemented")
+        self.gold_list = gold_list
+        self.pred_list = pred_list
+        self.gold_types = [gold[0] for gold in gold_list]
+        self.pred_types = [pred[0] for pred in pred_list]
+        self.gold_type_count = defaultdict(int)
+        for gold_type in self.gold_types:
+            self.gold_type_count[gold_type] += 1
+        self.pred_type_count = defaultdict(int)
+        for pred_type in self.pred_types:
+            self.pred_type_count[pred_type] += 1
+
+        # Strict matching, a gold entity can be matched by one prediction
+        remaining = defaultdict(int)
+        remaining_span = defaultdict(int)
+        for gold in gold_list:
+            remaining[gold] += 1
+            remaining_span[gold[1]] += 1
+        self.strict_typespan_match = list()
+        self.strict_span_match = list()
+        for pred in pred_list:
+            is_match = remaining[pred] > 0
+            if is_match:
+                remaining[pred] -= 1
+            self.strict_typespan_match += [is_match]
+            is_match = remaining_span[pred[1]] > 0
+            if is_match:
+                remaining_span[pred[1]] -= 1
+            self.strict_span_match += [is_match]
+
+        # Relaxed matching, replayed on the index for every entity type
+        self.relaxed_index = RelaxedSpanIndex(gold_list, metric)
+
+    def num_gold(self, entity_type):
+        return len(self.gold_list) if entity_type == "total" else self.gold_type_count[entity_type]
+
+    def num_pred(self, entity_type):
+        return len(self.pred_list) if entity_type == "total" else self.pred_type_count[entity_type]
+
+    def _relaxed_matching(self, entity_type, typed):
+        """ Replays the relaxed matching of `count_instance_for_type` on the candidates, returns (tp, misclassified) """
+        tp = 0
+        is_misclassified = False
+        relaxed_index = self.relaxed_index
+        relaxed_index.reset()
+        for pred in self.pred_list:
+            pred_type = pred[0]
+            is_counted = entity_type == "total" or pred_type == entity_type
+            index = relaxed_index.first_match(pred[1])
+            if index >= 0:
+                if is_counted and (not typed or pred_type == self.gold_types[index]):
+                    tp += 1
+                    relaxed_index.remove(index)
+            elif is_counted:
+                is_misclassified = True
+        return tp, is_misclassified
+
+    def count(self, eval_type, entity_type):
+        """ (tp, is_misclassified) of this sentence for the eval type and entity type """
+        if eval_type == "strict_typespan":
+            tp = 0
+            is_misclassified = False
+            for pred_type, is_match in zip(self.pred_types, self.strict_typespan_match):
+                if entity_type == "total" or pred_type == entity_type:
+                    if is_match:
+                        tp += 1
+                    else:
+                        is_misclassified = True
+        elif eval_type == "relaxed_typespan":
+            if entity_type != "total" and self.pred_type_count[entity_type] == 0:
+                tp, is_misclassified = 0, False
+            else:
+                tp, is_misclassified = self._relaxed_matching(entity_type, typed=True)
+        elif eval_type in {"strict_span", "relaxed_span"}:
+            # span matching only counts for the total
+            if entity_type != "total":
+                return 0, False
+            if eval_type == "strict_span":
+                tp = sum(self.strict_span_match)
+                is_misclassified = tp < len(self.pred_list)
+            else:
+                tp, is_misclassified = self._relaxed_matching(entity_type, typed=False)
+        else:
+            raise NotImplementedError(f"Eval Type {eval_type} doesn't exist.")
+
+        if entity_type == "total" and len(self.gold_list) > len(self.pred_list):
+            is_misclassified = True
+        return tp, is_misclassified
+
+
 class TemporalTypeScorer(EntityScorer):
+    eval_types = ["strict_typespan", "strict_span", "relaxed_typespan", "relaxed_span"]
+    entity_types = ["total", "tempexp", "date", "time", "duration", "set"]
+
     @staticmethod
     def eval_instance_list(gold_instance_list: List[Dict], pred_instance_list: List[Dict], verbose=False, match_mode='normal'):
-        def generate_metrics(metric_type):
-            val = {
-                'offset': TemporalMetric(temporal_entity_type = metric_type, verbose=verbose, match_mode=match_mode),
-                'string': TemporalMetric(temporal_entity_type = metric_type, verbose=verbose, match_mode=match_mode),
-            }
-            return val 
-        
-        def initiate_metrics():
-            total_metrics = generate_metrics("total")
-            tempexp_metrics = generate_metrics("tempexp")
-            date_metrics = generate_metrics("date")
-            time_metrics = generate_metrics("time")
-            duration_metrics = generate_metrics("duration")
-            set_metrics = generate_metrics("set")
-
-            metrics = {
-                "total": total_metrics,
-                "tempexp": tempexp_metrics,
-                "date": date_metrics,
-                "time": time_metrics,
-                "duration": duration_metrics,
-                "set": set_metrics
-            }
-
-            #Saves all indexes of misclassifications
-            negative_cases: Dict[str, Set[int]] = {
-                "total": set(),
-                "tempexp": set(),
-                "date": set(),
-                "time": set(),
-                "duration": set(),
-                "set": set()
-            }
-            return metrics, negative_cases
-
-        strict_typespan, strict_typespan_negative_cases = initiate_metrics()
-        strict_span, strict_span_negative_cases = initiate_metrics()
-        relaxed_typespan, relaxed_typespan_negative_cases = initiate_metrics()
-        relaxed_span, relaxed_span_negative_cases = initiate_metrics()
+        # eval type -> entity type -> metric -> TemporalMetric
+        metrics = {
+            eval_type: {
+                entity_type: {
+                    'offset': TemporalMetric(temporal_entity_type=entity_type, verbose=verbose, match_mode=match_mode),
+                    'string': TemporalMetric(temporal_entity_type=entity_type, verbose=verbose, match_mode=match_mode),
+                } for entity_type in TemporalTypeScorer.entity_types
+            } for eval_type in TemporalTypeScorer.eval_types
+        }
+        # Saves all indexes of misclassifications
+        negative_cases: Dict[str, Dict[str, Set[int]]] = {
+            eval_type: {entity_type: set() for entity_type in TemporalTypeScorer.entity_types}
+            for eval_type in TemporalTypeScorer.eval_types
+        }
 
         for i, (pred, gold) in enumerate(zip(pred_instance_list, gold_instance_list)):
-            for entity_type, metric in strict_typespan.items():
-                for eval_key in metric:
-                    is_misclassified = metric[eval_key].count_instance_for_type(
-                        gold_list=gold.get(eval_key, []),
-                        pred_list=pred.get(eval_key, []),
-                        eval_type = "strict_typespan",
-                        metric = eval_key
-                    )
-
-                    if is_misclassified:
-                        strict_typespan_negative_cases[entity_type].add(i)
-
-            for entity_type, metric in strict_span.items():
-                for eval_key in metric:
-                    is_misclassified = metric[eval_key].count_instance_for_type(
-                        gold_list=gold.get(eval_key, []),
-                        pred_list=pred.get(eval_key, []),
-                        eval_type = "strict_span",
-                        metric = eval_key
-                    )
-
-                    if is_misclassified:
-                        strict_span_negative_cases[entity_type].add(i)
-
-            for entity_type, metric in relaxed_typespan.items():
-                for eval_key in metric:
-                    is_misclassified = metric[eval_key].count_instance_for_type(
-                        gold_list=gold.get(eval_key, []),
-                        pred_list=pred.get(eval_key, []),
-                        eval_type = "relaxed_typespan",
-                        metric = eval_key
-                    )
-
-                    if is_misclassified:
-                        relaxed_typespan_negative_cases[entity_type].add(i)
-
-            for entity_type, metric in relaxed_span.items():
-                for eval_key in metric:
-                    is_misclassified = metric[eval_key].count_instance_for_type(
-                        gold_list=gold.get(eval_key, []),
-                        pred_list=pred.get(eval_key, []),
-                        eval_type = "relaxed_span",
-                        metric = eval_key
-                    )
-
-                    if is_misclassified:
-                        relaxed_span_negative_cases[entity_type].add(i)
-
-        all_pairs = {}
-        for entity_type, metric in strict_typespan.items():
-            all_pairs["strict_typespan_" + entity_type] = metric
-        for entity_type, metric in strict_span.items():
-            all_pairs["strict_span_" + entity_type] = metric
-        for entity_type, metric in relaxed_typespan.items():
-            all_pairs["relaxed_typespan_" + entity_type] = metric
-        for entity_type, metric in relaxed_span.items():
-            all_pairs["relaxed_span_" + entity_type] = metric
+            for eval_key in ['offset', 'string']:
+                table = TemporalMatchTable(gold_list=gold.get(eval_key, []),
+                                           pred_list=pred.get(eval_key, []),
+                                           metric=eval_key)
+                for entity_type in TemporalTypeScorer.entity_types:
+                    num_gold, num_pred = table.num_gold(entity_type), table.num_pred(entity_type)
+                    for eval_type in TemporalTypeScorer.eval_types:
+                        metric = metrics[eval_type][entity_type][eval_key]
+                        tp, is_misclassified = table.count(eval_type, entity_type)
+                        metric.gold_num += num_gold
+                        metric.pred_num += num_pred
+                        metric.tp += tp
+                        if is_misclassified:
+                            negative_cases[eval_type][entity_type].add(i)
 
         results = dict()
-        for entity_type, metric in all_pairs.items():
-            for eval_key in metric:
-                results.update(metric[eval_key].compute_f1(prefix=entity_type + '_' + eval_key + '_'))
+        for eval_type in TemporalTypeScorer.eval_types:
+            for entity_type in TemporalTypeScorer.entity_types:
+                for eval_key in ['offset', 'string']:
+                    results.update(metrics[eval_type][entity_type][eval_key].compute_f1(
+                        prefix=eval_type + '_' + entity_type + '_' + eval_key + '_'))
 
         all_errors = {}
-        for error_type, negative_cases in strict_typespan_negative_cases.items():
-            all_errors["strict_typespan_" + error_type] = negative_cases
-        for error_type, negative_cases in strict_span_negative_cases.items():
-            all_errors["strict_span_" + error_type] = negative_cases
-        for error_type, negative_cases in relaxed_typespan_negative_cases.items():
-            all_errors["relaxed_typespan_" + error_type] = negative_cases
-        for error_type, negative_cases in relaxed_span_negative_cases.items():
-            all_errors["relaxed_span_" + error_type] = negative_cases
+        for eval_type in TemporalTypeScorer.eval_types:
+            for entity_type in TemporalTypeScorer.entity_types:
+                all_errors[eval_type + "_" + entity_type] = negative_cases[eval_type][entity_type]
 
         return results, all_errors
 
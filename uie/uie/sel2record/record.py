@@ -24,6 +24,30 @@ def match_sublist(the_list, to_match):
     return matched_list
 
 
+class TokenIndex:
+    """ Positions of each token in a sentence, for matching token spans
+
+    `match` returns the same as `match_sublist(tokens, to_match)`, but only compares the
+    spans starting at a position of the first token of `to_match`.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.positions = dict()
+        for index, token in enumerate(tokens):
+            self.positions.setdefault(token, []).append(index)
+
+    def match(self, to_match):
+        len_to_match = len(to_match)
+        if len_to_match == 0:
+            return match_sublist(self.tokens, to_match)
+        matched_list = list()
+        for index in self.positions.get(to_match[0], []):
+            if to_match == self.tokens[index:index + len_to_match]:
+                matched_list += [(index, index + len_to_match - 1)]
+        return matched_list
+
+
 def check_overlap(x, y):
     if x[0] > y[1] or y[0] > x[1]:
         return False
@@ -76,11 +100,29 @@ class MapConfig:
 
 
 class Record:
+    # Maximum number of memoized span tokenizations, the memo is cleared when it is full
+    span_token_cache_size = 100000
+
     def __init__(self, map_config) -> None:
         self._map_config = map_config
+        self._span_token_cache = dict()
+        self._token_index = None
 
     def span_to_token(self, text):
-        return span_to_token(text, span_to_token_strategy=self._map_config.span_to_token)
+        """ Memoized, the returned list must not be changed """
+        if text not in self._span_token_cache:
+            if len(self._span_token_cache) >= self.span_token_cache_size:
+                self._span_token_cache.clear()
+            self._span_token_cache[text] = span_to_token(text, span_to_token_strategy=self._map_config.span_to_token)
+        return self._span_token_cache[text]
+
+    def match_span(self, token_list, text):
+        """ Same as `match_sublist(token_list, self.span_to_token(text))`,
+        the position index of the sentence is kept for the following spans in the same sentence
+        """
+        if self._token_index is None or self._token_index.tokens is not token_list:
+            self._token_index = TokenIndex(token_list)
+        return self._token_index.match(self.span_to_token(text))
 
 
 class EntityRecord(Record):
@@ -140,8 +182,7 @@ class EntityRecord(Record):
             if record_text == "":
                 logger.warning(f"Empty Extraction {pred_record}")
                 continue
-            matched_list = match_sublist(token_list,
-                                         self.span_to_token(record_text))
+            matched_list = self.match_span(token_list, record_text)
             for matched in matched_list:
                 if (record_type, matched) not in entity_matched_set:
                     entity_list += [(record_type,
@@ -170,8 +211,7 @@ class EntityRecord(Record):
                 logger.warning(f"Empty Extraction {pred_record}")
                 continue
 
-            matched_list = match_sublist(token_list,
-                                         self.span_to_token(record_text))
+            matched_list = self.match_span(token_list, record_text)
             for matched in matched_list:
                 flag = False
                 for _, g in entity_matched_set:
@@ -239,8 +279,7 @@ class RelationRecord(Record):
 
             relation = [relation_type]
             for role_type, text_str in record['roles'][:2]:
-                matched_list = match_sublist(token_list,
-                                             self.span_to_token(text_str))
+                matched_list = self.match_span(token_list, text_str)
                 if len(matched_list) == 0:
                     logger.warning("[Cannot reconstruct]: %s %s\n" %
                                    (text_str, token_list))
@@ -269,10 +308,8 @@ class RelationRecord(Record):
 
             arg1_type, arg1_text = record['roles'][0]
             arg2_type, arg2_text = record['roles'][1]
-            arg1_matched_list = match_sublist(token_list,
-                                              self.span_to_token(arg1_text))
-            arg2_matched_list = match_sublist(token_list,
-                                              self.span_to_token(arg2_text))
+            arg1_matched_list = self.match_span(token_list, arg1_text)
+            arg2_matched_list = self.match_span(token_list, arg2_text)
 
             if len(arg1_matched_list) == 0:
                 logger.warning("[Cannot reconstruct]: %s %s\n" %
@@ -352,8 +389,7 @@ class EventRecord(Record):
         for record in instance:
             event_type = record['type']
             trigger = record['trigger']
-            matched_list = match_sublist(token_list,
-                                         self.span_to_token(trigger))
+            matched_list = self.match_span(token_list, trigger)
 
             if len(matched_list) == 0:
                 logger.warning("[Cannot reconstruct]: %s %s\n" %
@@ -378,8 +414,7 @@ class EventRecord(Record):
             }
 
             for role_type, text_str in record['roles']:
-                matched_list = match_sublist(token_list,
-                                             self.span_to_token(text_str))
+                matched_list = self.match_span(token_list, text_str)
                 if len(matched_list) == 0:
                     logger.warning("[Cannot reconstruct]: %s %s\n" %
                                    (text_str, token_list))
@@ -401,8 +436,7 @@ class EventRecord(Record):
         for record in instance:
             event_type = record['type']
             trigger = record['trigger']
-            matched_list = match_sublist(token_list,
-                                         self.span_to_token(trigger))
+            matched_list = self.match_span(token_list, trigger)
 
             if len(matched_list) == 0:
                 logger.warning("[Cannot reconstruct]: %s %s\n" %
@@ -427,8 +461,7 @@ class EventRecord(Record):
             }
 
             for role_type, text_str in record['roles']:
-                matched_list = match_sublist(token_list,
-                                             self.span_to_token(text_str))
+                matched_list = self.match_span(token_list, text_str)
                 if len(matched_list) == 0:
                     logger.warning("[Cannot reconstruct]: %s %s\n" %
                                    (text_str, token_list))
@@ -83,6 +83,11 @@ class SEL2Record:
             label_constraint=schema_dict['record']
         )
         self._map_config = map_config
+        # Record mappers are kept for all predictions, they memoize the span tokenization
+        self._record_maps = {
+            task: task_record_map[task](map_config=self._map_config)
+            for task in task_record_map
+        }
 
     def __repr__(self) -> str:
         return f"## {self._map_config}"
@@ -96,11 +101,24 @@ class SEL2Record:
             text_list=[text],
         )
 
+        return self.graph_to_record(well_formed_list[0], tokens)
+
+    def sel2record_batch(self, pred_list, text_list, token_list):
+        """ sel2record for a batch of predictions, the SEL of all predictions is parsed at once """
+        well_formed_list, counter = self._predict_parser.decode(
+            gold_list=[],
+            pred_list=pred_list,
+            text_list=text_list,
+        )
+        return [self.graph_to_record(graph, tokens)
+                for graph, tokens in zip(well_formed_list, token_list)]
+
+    def graph_to_record(self, graph, tokens):
         # Convert String-level Record to Entity/Relation/Event
         # 将抽取的 Spot-Asoc Record 结构
         # 根据不同的 Schema 转换成 Entity/Relation/Event 结果
         pred_records = proprocessing_graph_record(
-            well_formed_list[0],
+            graph,
             self._schema_dict
         )
 
@@ -108,9 +126,7 @@ class SEL2Record:
         # Mapping String-level record to Offset-level record
         # 将 String 级别的 Record 回标成 Offset 级别的 Record
         for task in task_record_map:
-            record_map = task_record_map[task](
-                map_config=self._map_config,
-            )
+            record_map = self._record_maps[task]
 
             pred[task]['offset'] = record_map.to_offset(
                 instance=pred_records.get(task, []),
@@ -13,7 +13,11 @@ from transformers.trainer_pt_utils import LabelSmoother
 
 from transformers.trainer import *
 
-from uie.seq2seq.constraint_decoder import get_constraint_decoder
+from uie.seq2seq.constraint_decoder import (
+    get_constraint_decoder,
+    ConstraintLogitsProcessor,
+    generate_with_logits_processor
+)
 
 
 @dataclass
@@ -28,6 +32,9 @@ class ConstraintSeq2SeqTrainingArguments(Seq2SeqTrainingArguments):
     save_better_checkpoint: bool = field(default=False,
                                          metadata={"help": "Whether to save better metric checkpoint"})
     start_eval_step: int = field(default=0, metadata={"help": "Start Evaluation after Eval Step"})
+    batched_constraint_decoding: bool = field(
+        default=True,
+        metadata={"help": "Apply Constraint Decoding as one logits mask per step instead of prefix_allowed_tokens_fn."})
 
 
 class ConstraintSeq2SeqTrainer(Seq2SeqTrainer):
@@ -169,9 +176,8 @@ class ConstraintSeq2SeqTrainer(Seq2SeqTrainer):
 
         def prefix_allowed_tokens_fn(batch_id, sent):
             # print(self.tokenizer.convert_ids_to_tokens(inputs['labels'][batch_id]))
-            src_sentence = inputs['input_ids'][batch_id]
-            return self.constraint_decoder.constraint_decoding(src_sentence=src_sentence,
-                                                               tgt_generated=sent)
+            return self.constraint_decoder.batch_constraint_decoding(batch_id=batch_id,
+                                                                     tgt_generated=sent)
 
         if not self.args.predict_with_generate or prediction_loss_only:
             return super().prediction_step(
@@ -183,17 +189,33 @@ class ConstraintSeq2SeqTrainer(Seq2SeqTrainer):
         has_labels = "labels" in inputs
         inputs = self._prepare_inputs(inputs)
 
+        if self.constraint_decoder:
+            # Source indexes are built once per input, cached states are only valid within one generate() call
+            self.constraint_decoder.prepare_batch(inputs['input_ids'])
+
         gen_kwargs = {
             "max_length": self._max_length if self._max_length is not None else self.model.config.max_length,
             "num_beams": self._num_beams if self._num_beams is not None else self.model.config.num_beams,
-            "prefix_allowed_tokens_fn": prefix_allowed_tokens_fn if self.constraint_decoder else None,
         }
 
-        generated_tokens = self.model.generate(
-            inputs["input_ids"],
-            attention_mask=inputs["attention_mask"],
-            **gen_kwargs,
-        )
+        if self.constraint_decoder and self.args.batched_constraint_decoding:
+            num_beam_groups = getattr(self.model.config, 'num_beam_groups', 1) or 1
+            logits_processor = ConstraintLogitsProcessor(self.constraint_decoder,
+                                                         num_beams=gen_kwargs["num_beams"] // num_beam_groups)
+            generated_tokens = generate_with_logits_processor(
+                self.model,
+                logits_processor,
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                **gen_kwargs,
+            )
+        else:
+            gen_kwargs["prefix_allowed_tokens_fn"] = prefix_allowed_tokens_fn if self.constraint_decoder else None
+            generated_tokens = self.model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                **gen_kwargs,
+            )
 
         # in case the batch is shorter than max length, the output should be padded
         if generated_tokens.shape[-1] < gen_kwargs["max_length"]:
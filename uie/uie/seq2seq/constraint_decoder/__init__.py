@@ -4,24 +4,29 @@ from uie.seq2seq.constraint_decoder.spotasoc_constraint_decoder import (
     SpotAsocConstraintDecoder,
     SpotConstraintDecoder
 )
+from uie.seq2seq.constraint_decoder.incremental_constraint_decoder import (
+    IncrementalSpotAsocConstraintDecoder,
+    IncrementalSpotConstraintDecoder
+)
+from uie.seq2seq.constraint_decoder.constraint_logits_processor import (
+    ConstraintLogitsProcessor,
+    generate_with_logits_processor
+)
 
 
-def get_constraint_decoder(tokenizer, type_schema, decoding_schema, task_name='event', source_prefix=None):
+def get_constraint_decoder(tokenizer, type_schema, decoding_schema, task_name='event', source_prefix=None,
+                           incremental=True):
     if decoding_schema == 'spotasoc':
         if len(type_schema.role_list) == 0:
-            task_map = {
-                'entity': SpotConstraintDecoder,
-                'relation': SpotConstraintDecoder,
-                'event': SpotConstraintDecoder,
-                'record': SpotConstraintDecoder,
-            }
+            decoder = IncrementalSpotConstraintDecoder if incremental else SpotConstraintDecoder
         else:
-            task_map = {
-                'entity': SpotAsocConstraintDecoder,
-                'relation': SpotAsocConstraintDecoder,
-                'event': SpotAsocConstraintDecoder,
-                'record': SpotAsocConstraintDecoder,
-            }
+            decoder = IncrementalSpotAsocConstraintDecoder if incremental else SpotAsocConstraintDecoder
+        task_map = {
+            'entity': decoder,
+            'relation': decoder,
+            'event': decoder,
+            'record': decoder,
+        }
     else:
         raise NotImplementedError(
             f'Type Schema {type_schema}, Decoding Schema {decoding_schema}, Task {task_name} do not map to constraint decoder.'
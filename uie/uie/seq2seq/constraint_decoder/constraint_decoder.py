@@ -51,6 +51,35 @@ def generated_search_prefix_tree(generated, prefix_tree, tokenizer):
     return list(tree)
 
 
+class SourceIndex:
+    """ Position map of a source sequence, built once per input
+
+    Matches of a generated span are found from the positions of its first token and
+    extended token by token, so the cost depends on the number of matches instead of
+    the length of the source sentence. Results are the same (and in the same order)
+    as with match_sublist. The sequence and the positions are stored as tuples, so the
+    index can be shared by all the beams of an input.
+    """
+
+    def __init__(self, sequence):
+        self.sequence = tuple(sequence)
+        positions = defaultdict(list)
+        for index, token in enumerate(self.sequence):
+            positions[token] += [index]
+        self.positions = {token: tuple(indices) for token, indices in positions.items()}
+
+    def first_match_ends(self, token):
+        return self.positions.get(token, ())
+
+    def extend_match_ends(self, match_ends, token):
+        sequence = self.sequence
+        return tuple(end + 1 for end in match_ends if end + 1 < len(sequence) and sequence[end + 1] == token)
+
+    def next_tokens(self, match_ends):
+        sequence = self.sequence
+        return [sequence[end + 1] for end in match_ends if end + 1 < len(sequence)]
+
+
 def generated_search_src_sequence(generated, src_sequence, end_sequence_search_tokens=None):
 
     if len(generated) == 0:
@@ -89,3 +118,18 @@ class ConstraintDecoder:
         valid_token_ids = self.get_state_valid_tokens(src_sentence.tolist(), tgt_generated.tolist())
 
         return valid_token_ids
+
+    def prepare_batch(self, input_ids):
+        """ Called once before generate() with the input ids of the batch """
+        self._batch_src_sentences = list()
+        for src_sentence in input_ids:
+            if self.source_prefix_tokenized:
+                # Remove Source Prefix for Generation
+                src_sentence = src_sentence[len(self.source_prefix_tokenized):]
+            self._batch_src_sentences += [src_sentence.tolist()]
+
+    def batch_valid_tokens(self, batch_id: int, tgt_generated: List[int]) -> List[int]:
+        return self.get_state_valid_tokens(self._batch_src_sentences[batch_id], tgt_generated)
+
+    def batch_constraint_decoding(self, batch_id, tgt_generated):
+        return self.batch_valid_tokens(batch_id, tgt_generated.tolist())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+import inspect
+import math
+
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList
+
+
+class ConstraintLogitsProcessor(LogitsProcessor):
+    """ Batched equivalent of passing `constraint_decoding` as `prefix_allowed_tokens_fn`
+
+    PrefixConstrainedLogitsProcessor copies every beam to the host and indexes the mask
+    once per beam. Here the generated ids of all beams are copied in one transfer, the
+    valid tokens of each beam come from the (cached) decoding state of its prefix, and a
+    single boolean mask over the (batch * num_beams, vocab) scores is applied at once.
+    The allowed tokens are identical to `prefix_allowed_tokens_fn`.
+
+    `constraint_decoder.prepare_batch` has to be called with the input ids before generate().
+    """
+
+    def __init__(self, constraint_decoder, num_beams: int):
+        self.constraint_decoder = constraint_decoder
+        self.num_beams = num_beams
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        rows, columns = list(), list()
+        for row, tgt_generated in enumerate(input_ids.tolist()):
+            valid_tokens = self.constraint_decoder.batch_valid_tokens(row // self.num_beams, tgt_generated)
+            rows += [row] * len(valid_tokens)
+            columns += valid_tokens
+
+        mask = torch.zeros_like(scores, dtype=torch.bool)
+        index = torch.tensor([rows, columns], dtype=torch.long).to(scores.device, non_blocking=True)
+        mask[index[0], index[1]] = True
+        return scores.masked_fill(~mask, -math.inf)
+
+
+def generate_with_logits_processor(model, logits_processor, **kwargs):
+    """ model.generate() with an additional logits processor
+
+    Older transformers versions (e.g. 4.6.1 in requirements.txt) have no `logits_processor`
+    argument in generate(), there the processor is appended to the list built by
+    `model._get_logits_processor`.
+    """
+    if 'logits_processor' in inspect.signature(model.generate).parameters:
+        return model.generate(logits_processor=LogitsProcessorList([logits_processor]), **kwargs)
+
+    get_logits_processor = model._get_logits_processor
+
+    def _get_logits_processor(*args, **processor_kwargs):
+        processors = get_logits_processor(*args, **processor_kwargs)
+        processors.append(logits_processor)
+        return processors
+
+    model._get_logits_processor = _get_logits_processor
+    try:
+        return model.generate(**kwargs)
+    finally:
+        del model._get_logits_processor
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+import os
+from typing import List
+
+from uie.seq2seq.constraint_decoder.constraint_decoder import SourceIndex
+from uie.seq2seq.constraint_decoder.spotasoc_constraint_decoder import SpotAsocConstraintDecoder
+
+
+debug = True if 'DEBUG' in os.environ else False
+
+
+class DecodingState:
+    """ Decoding state of one generated prefix, derived from the state of the prefix without its last token
+
+    Bracket counts and the last special token replace the full re-scan of `check_state`.
+    The tokens after the last special token form a segment, which is either a label name
+    (tracked as the current node of the prefix tree) or a text span (tracked as the end
+    positions of its matches in the source sentence).
+    The states form a prefix tree: `children` maps each next token to the state of the longer prefix.
+    """
+    __slots__ = ['start_number', 'end_number', 'num_special', 'first_special_token',
+                 'last_special_index', 'last_special_token', 'length',
+                 'state', 'segment_length', 'tree_node', 'tree_end_reached', 'tree_missing', 'match_ends',
+                 'children']
+
+    def __init__(self):
+        self.start_number = 0
+        self.end_number = 0
+        self.num_special = 0
+        self.first_special_token = None
+        self.last_special_index = -1
+        self.last_special_token = None
+        self.length = 0
+        self.state = None
+        self.segment_length = 0
+        self.tree_node = None
+        self.tree_end_reached = False
+        self.tree_missing = None
+        self.match_ends = None
+        self.children = dict()
+
+    def copy(self):
+        new = DecodingState.__new__(DecodingState)
+        for name in DecodingState.__slots__:
+            setattr(new, name, getattr(self, name))
+        new.children = dict()
+        return new
+
+
+class IncrementalSpotAsocConstraintDecoder(SpotAsocConstraintDecoder):
+    """ SpotAsocConstraintDecoder that carries the decoding state from step to step
+
+    `prefix_allowed_tokens_fn` is called with the full generated sequence of every beam in
+    every step. Instead of re-scanning that sequence, the state of a new sequence is derived
+    from the state of the sequence without its last token, which was computed in the previous
+    step. That state is looked up by the prefix among the sequences of the previous step, so
+    besides hashing the sequence, each step does a constant amount of state updates. The
+    states are kept in a prefix tree with one node per generated token, instead of a tuple
+    per prefix. The valid tokens are identical to SpotAsocConstraintDecoder.
+    """
+    tree_states = {'generate_trigger': 'type_tree', 'generate_role': 'role_tree'}
+    text_states = {'generate_trigger_text', 'generate_role_text'}
+
+    def __init__(self, tokenizer, *args, **kwargs):
+        super().__init__(tokenizer, *args, **kwargs)
+        self._special_token_set = {self.type_start, self.type_end, self.span_start}
+        self.reset()
+
+    def reset(self):
+        """ Clear the cached states, e.g. before each generate() call """
+        self._sources = dict()
+        self._root_states = dict()
+        self._frontiers = dict()
+        self._batch_keys = list()
+
+    def get_source(self, src_sentence) -> SourceIndex:
+        key = tuple(src_sentence)
+        if key not in self._sources:
+            if self.tokenizer.eos_token_id in src_sentence:
+                src_sentence = src_sentence[:src_sentence.index(self.tokenizer.eos_token_id)]
+
+            if self.text_start in src_sentence:
+                src_sentence = src_sentence[src_sentence.index(self.text_start) + 1:]
+            self._sources[key] = SourceIndex(src_sentence + [self.null_span])
+            self._root_states[key] = DecodingState()
+            # Generated sequence => state, for the sequences of the last two lengths
+            self._frontiers[key] = dict()
+        return self._sources[key]
+
+    def prepare_batch(self, input_ids):
+        """ Build the source index of every input once, before generate() """
+        self.reset()
+        for src_sentence in input_ids:
+            if self.source_prefix_tokenized:
+                src_sentence = src_sentence[len(self.source_prefix_tokenized):]
+            src_sentence = src_sentence.tolist()
+            self.get_source(src_sentence)
+            self._batch_keys += [tuple(src_sentence)]
+
+    def batch_valid_tokens(self, batch_id, tgt_generated):
+        key = self._batch_keys[batch_id]
+        source = self._sources[key]
+        state = self.get_generated_state(source, key, tgt_generated)
+        return self.valid_tokens_from_state(state, source, tgt_generated)
+
+    def state_from_counts(self, state: DecodingState):
+        """ Same decision as check_state, from the counts instead of the full sequence """
+        if state.num_special == 0:
+            # check_state fails on the empty special token list as well
+            raise IndexError('list index out of range')
+        if state.num_special == 1 and state.first_special_token != self.type_start:
+            return 'error'
+        if state.start_number == state.end_number:
+            return 'end_generate'
+        if state.start_number == state.end_number + 1:
+            return 'start_first_generation'
+        elif state.start_number == state.end_number + 2:
+            if state.last_special_token == self.span_start:
+                return 'generate_trigger_text'
+            return 'generate_trigger'
+        elif state.start_number == state.end_number + 3:
+            if state.last_special_token == self.span_start:
+                return 'generate_role_text'
+            return 'generate_role'
+        return 'error'
+
+    def advance(self, state: DecodingState, token: int, source: SourceIndex) -> DecodingState:
+        new = state.copy()
+        new.length += 1
+
+        if token in self._special_token_set:
+            if token == self.type_start:
+                new.start_number += 1
+            elif token == self.type_end:
+                new.end_number += 1
+            if new.num_special == 0:
+                new.first_special_token = token
+            new.num_special += 1
+            new.last_special_index = new.length - 1
+            new.last_special_token = token
+
+            new.state = self.state_from_counts(new)
+            new.segment_length = 0
+            new.tree_node = getattr(self, self.tree_states[new.state]) if new.state in self.tree_states else None
+            new.tree_end_reached = False
+            new.tree_missing = None
+            new.match_ends = None
+            return new
+
+        if new.num_special == 0:
+            # no special token yet, the state is only known once there is one
+            return new
+
+        new.segment_length += 1
+        if new.state in self.tree_states:
+            if not new.tree_end_reached and new.tree_missing is None:
+                if token in new.tree_node:
+                    new.tree_node = new.tree_node[token]
+                    new.tree_end_reached = len(new.tree_node) == 1 and self.tree_end in new.tree_node
+                else:
+                    # search_prefix_tree only fails once it is asked for this segment
+                    new.tree_missing = token
+        elif new.state in self.text_states:
+            if new.match_ends is None:
+                new.match_ends = source.first_match_ends(token)
+            else:
+                new.match_ends = source.extend_match_ends(new.match_ends, token)
+        return new
+
+    def child_state(self, state: DecodingState, token: int, source: SourceIndex) -> DecodingState:
+        child = state.children.get(token)
+        if child is None:
+            child = self.advance(state, token, source)
+            state.children[token] = child
+        return child
+
+    def get_generated_state(self, source: SourceIndex, src_key, tgt_generated) -> DecodingState:
+        key = tuple(tgt_generated)
+        length = len(key)
+        if length == 0:
+            return self._root_states[src_key]
+        frontier = self._frontiers[src_key]
+
+        state = frontier.get(length - 1, {}).get(key[:-1])
+        if state is None:
+            # Not generated in the previous step, e.g. the first step: walk down from the root
+            state = self._root_states[src_key]
+            for token in key[:-1]:
+                state = self.child_state(state, token, source)
+        state = self.child_state(state, key[-1], source)
+
+        frontier.setdefault(length, dict())[key] = state
+        for old_length in [x for x in frontier if x < length - 1]:
+            del frontier[old_length]
+        return state
+
+    def tree_valid_tokens(self, state: DecodingState, end_search_tokens: List[int]):
+        """ Same result as search_prefix_tree on the current segment """
+        if state.tree_missing is not None:
+            raise KeyError(state.tree_missing)
+        if state.tree_end_reached:
+            return list(end_search_tokens)
+        valid_token = list(state.tree_node.keys())
+        if self.tree_end in valid_token:
+            valid_token.remove(self.tree_end)
+            valid_token += end_search_tokens
+        return valid_token
+
+    def text_valid_tokens(self, state: DecodingState, source: SourceIndex, end_sequence_search_tokens: List[int]):
+        """ Same result as generated_search_src_sequence on the current segment """
+        if state.segment_length == 0:
+            # All src tokens are valid before generation
+            return list(source.sequence)
+        return source.next_tokens(state.match_ends) + end_sequence_search_tokens
+
+    def get_state_valid_tokens(self, src_sentence, tgt_generated):
+        """
+
+        :param src_sentence:
+        :param tgt_generated:
+        :return:
+            List[str], valid token list
+        """
+        source = self.get_source(src_sentence)
+        state = self.get_generated_state(source, tuple(src_sentence), tgt_generated)
+        return self.valid_tokens_from_state(state, source, tgt_generated)
+
+    def valid_tokens_from_state(self, state: DecodingState, source: SourceIndex, tgt_generated):
+        last_token = tgt_generated[-1]
+        if last_token == self.tokenizer.pad_token_id:
+            state_name = 'start'
+        else:
+            state_name = state.state if state.num_special > 0 else self.state_from_counts(state)
+
+        print("State: %s" % state_name) if debug else None
+
+        if state_name == 'error':
+            print("Decode Error:")
+            print("Src:", self.tokenizer.convert_ids_to_tokens(source.sequence[:-1]))
+            print("Tgt:", self.tokenizer.convert_ids_to_tokens(tgt_generated))
+            valid_tokens = [self.tokenizer.eos_token_id]
+
+        elif state_name == 'start':
+            valid_tokens = [self.type_start]
+
+        elif state_name == 'start_first_generation':
+            valid_tokens = [self.type_start, self.type_end]
+
+        elif state_name == 'generate_trigger':
+
+            if last_token == self.type_start:
+                # Start Event Label
+                return list(self.type_tree.keys())
+
+            elif last_token == self.type_end:
+                # EVENT_TYPE_LEFT: Start a new role
+                # EVENT_TYPE_RIGHT: End this event
+                return [self.type_start, self.type_end]
+            else:
+                valid_tokens = self.tree_valid_tokens(state, end_search_tokens=[self.span_start])
+
+        elif state_name == 'generate_trigger_text':
+
+            if state.segment_length > 0 and last_token == self.null_span:
+                return [self.type_end, self.type_start]
+
+            valid_tokens = self.text_valid_tokens(state, source, [self.type_end, self.type_start])
+
+        elif state_name == 'generate_role_text':
+
+            if state.segment_length > 0 and last_token == self.null_span:
+                return [self.type_end]
+
+            valid_tokens = self.text_valid_tokens(state, source, [self.type_end])
+
+        elif state_name == 'generate_role':
+
+            if last_token == self.type_start:
+                # Start Role Label
+                return list(self.role_tree.keys())
+
+            valid_tokens = self.tree_valid_tokens(state, end_search_tokens=[self.span_start])
+
+        elif state_name == 'end_generate':
+            valid_tokens = [self.tokenizer.eos_token_id]
+
+        else:
+            raise NotImplementedError('State `%s` for %s is not implemented.' % (state_name, self.__class__))
+
+        print("Valid: %s" % self.tokenizer.convert_ids_to_tokens(valid_tokens)) if debug else None
+        return valid_tokens
+
+
+class IncrementalSpotConstraintDecoder(IncrementalSpotAsocConstraintDecoder):
+    """ Incremental version of SpotConstraintDecoder """
+    tree_states = {'generate_span': 'type_tree'}
+    text_states = {'generate_span_text'}
+
+    def state_from_counts(self, state: DecodingState):
+        if state.num_special == 0:
+            raise IndexError('list index out of range')
+        if state.num_special == 1 and state.first_special_token != self.type_start:
+            return 'error'
+        if state.start_number == state.end_number:
+            return 'end_generate'
+        if state.start_number == state.end_number + 1:
+            return 'start_first_generation'
+        elif state.start_number == state.end_number + 2:
+            if state.last_special_token == self.span_start:
+                return 'generate_span_text'
+            return 'generate_span'
+        return 'error'
+
+    def valid_tokens_from_state(self, state: DecodingState, source: SourceIndex, tgt_generated):
+        last_token = tgt_generated[-1]
+        if last_token == self.tokenizer.pad_token_id:
+            state_name = 'start'
+        else:
+            state_name = state.state if state.num_special > 0 else self.state_from_counts(state)
+
+        print("State: %s" % state_name) if debug else None
+
+        if state_name == 'error':
+            print("Decode Error:")
+            print("Src:", self.tokenizer.convert_ids_to_tokens(source.sequence[:-1]))
+            print("Tgt:", self.tokenizer.convert_ids_to_tokens(tgt_generated))
+            valid_tokens = [self.tokenizer.eos_token_id]
+
+        elif state_name == 'start':
+            valid_tokens = [self.type_start]
+
+        elif state_name == 'start_first_generation':
+            valid_tokens = [self.type_start, self.type_end]
+
+        elif state_name == 'generate_span':
+
+            if last_token == self.type_start:
+                # Start Event Label
+                return list(self.type_tree.keys())
+
+            elif last_token == self.type_end:
+                raise RuntimeError('Invalid %s in %s' % (self.type_end, tgt_generated))
+
+            else:
+                valid_tokens = self.tree_valid_tokens(state, end_search_tokens=[self.span_start])
+
+        elif state_name == 'generate_span_text':
+            valid_tokens = self.text_valid_tokens(state, source, [self.type_end])
+
+        elif state_name == 'end_generate':
+            valid_tokens = [self.tokenizer.eos_token_id]
+
+        else:
+            raise NotImplementedError('State `%s` for %s is not implemented.' % (state_name, self.__class__))
+
+        print("Valid: %s" % valid_tokens) if debug else None
+        return valid_tokens